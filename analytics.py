@@ -0,0 +1,688 @@
+"""
+评论数据分析
+
+按块把抓取结果读成列 (NumPy 数组)，用向量化运算计算汇总指标，内存占用与块大小和不同文本/视频的数量相关，
+与评论总数无关:
+
+- 各平台、各视频的评论数、回复数、点赞总数和最大值、平均长度
+- 点赞数最高的评论 (每块用 argpartition 选出候选，再合并)
+- 按文本去重: 不同文本数按向量化计算的 64 位哈希统计 (与进程无关、结果可复现，碰撞概率可以忽略)，
+  重复最多的文本在第二遍读取时按原文核对并精确计数
+- 文本长度分布 (均值、分位数、按 2 的幂分桶的直方图)
+
+支持的输入: JSON Lines (.jsonl)、导出的 JSON 数组 (.json)、压缩分片清单 (.manifest.json)、
+Parquet (.parquet) 和 Arrow (.arrow)，也可以指定目录 (读取其中的 .jsonl、.manifest.json、.parquet 和 .arrow)。
+安装了 pyarrow 时，JSON Lines 由 Arrow 的多线程解析器按块读取，否则逐行解析。
+
+用法:
+    python analytics.py data/youtube --top 20
+    python analytics.py data/tiktok/tiktok_7300000000000000000_20240101_120000.jsonl --output report.json
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+from comment_writer import load_pyarrow
+
+logger = logging.getLogger(__name__)
+
+# 逐行解析时每块的记录数
+CHUNK_ROWS = 200000
+
+# Arrow 解析 JSON Lines 时每块的字节数
+ARROW_BLOCK_SIZE = 16 * 1024 * 1024
+
+# 默认输出的点赞最多的评论数和重复最多的文本数
+TOP_K = 10
+
+# 默认输出的视频数 (按评论数排序)，0 表示全部
+TOP_VIDEOS = 20
+
+# 文本长度直方图的上限 (更长的文本计入最后一个桶，分位数最大为该值)
+LENGTH_CAP = 10000
+
+# 待合并的文本哈希累计超过该数量时合并一次 (按哈希排序去重并累加次数)
+COMPACT_HASHES = 4000000
+
+# 计算文本哈希时每次处理的字节数 (限制临时数组的大小)
+HASH_BLOCK_BYTES = 4 * 1024 * 1024
+
+# 目录中读取的文件类型
+INPUT_SUFFIXES = (".jsonl", ".manifest.json", ".parquet", ".arrow")
+
+# JSON 数组中对象之间的分隔 (空白和逗号)
+ARRAY_SEPARATORS = re.compile(r"[\s,]*")
+
+# 输入中的字段 (JSON Lines 按此 schema 解析，多余字段忽略)
+FIELDS = ("id", "parent_id", "platform", "video_id", "text", "like_count")
+
+
+def video_from_path(path):
+    """
+    根据输出文件名推断视频ID (记录中没有 video_id 时使用)
+
+    youtube_<视频ID>_<日期>_<时间>.jsonl 和 tiktok_<视频ID>_<日期>_<时间>.jsonl 得到视频ID，
+    其他文件名 (如旧版的 tiktok_<时间戳>.jsonl) 使用文件名本身。
+    """
+    name = os.path.basename(path)
+    for suffix in INPUT_SUFFIXES + (".json",):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    parts = name.split("_")
+    if len(parts) >= 4 and parts[0] in ("youtube", "tiktok"):
+        return "_".join(parts[1:-2])
+    return name
+
+
+def expand_inputs(paths):
+    """展开输入路径 (目录中按文件名排序读取支持的文件类型)"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in sorted(names) if name.endswith(INPUT_SUFFIXES))
+        else:
+            files.append(path)
+    return files
+
+
+class ColumnChunk:
+    """
+    一块评论的列
+
+    likes、lengths、is_reply 为 NumPy 数组；platforms/videos 为 (每行的编码, 编码对应的名称)；
+    texts 为文本列表或 Arrow 字符串数组 (用于计算哈希)。rows(indices) 取回指定行的完整记录，只用于输出少量结果。
+    """
+
+    __slots__ = ("likes", "lengths", "is_reply", "platforms", "videos", "texts", "_rows")
+
+    def __init__(self, likes, lengths, is_reply, platforms, videos, texts, rows):
+        self.likes = likes
+        self.lengths = lengths
+        self.is_reply = is_reply
+        self.platforms = platforms
+        self.videos = videos
+        self.texts = texts
+        self._rows = rows
+
+    def __len__(self):
+        return len(self.likes)
+
+    def rows(self, indices):
+        return self._rows(indices)
+
+    def text(self, index):
+        """第 index 行的文本"""
+        text = self.texts[index]
+        return text.as_py() if hasattr(text, "as_py") else text
+
+
+def _encode_values(values, default):
+    """把字符串列表编码为 (int32 编码数组, 名称列表)，None 使用 default"""
+    lookup = {}
+    codes = np.fromiter((lookup.setdefault(value, len(lookup)) for value in values), dtype=np.int32,
+                        count=len(values))
+    labels = [default if value is None else str(value) for value in lookup]
+    return codes, labels
+
+
+def _int_or_zero(value):
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def chunk_from_records(records, default_video):
+    """由评论字典列表生成 ColumnChunk (逐行解析的输入)"""
+    count = len(records)
+    texts = [record.get("text") for record in records]
+    likes = np.fromiter((_int_or_zero(record.get("like_count")) for record in records), dtype=np.int64, count=count)
+    lengths = np.fromiter((len(text) if isinstance(text, str) else 0 for text in texts), dtype=np.int64, count=count)
+    is_reply = np.fromiter((record.get("parent_id") is not None for record in records), dtype=bool, count=count)
+    platforms = _encode_values([record.get("platform") for record in records], "unknown")
+    videos = _encode_values([record.get("video_id") for record in records], default_video)
+    return ColumnChunk(likes, lengths, is_reply, platforms, videos, texts,
+                       lambda indices: [records[index] for index in indices])
+
+
+def _encode_arrow(column, count, default):
+    if column is None:
+        return np.zeros(count, dtype=np.int32), [default]
+    import pyarrow.compute as pc
+
+    encoded = pc.dictionary_encode(column.cast("string"))
+    labels = encoded.dictionary.to_pylist()
+    codes = pc.fill_null(encoded.indices, len(labels)).to_numpy(zero_copy_only=False).astype(np.int32, copy=False)
+    return codes, labels + [default]
+
+
+def chunk_from_arrow(batch, default_video):
+    """由 Arrow RecordBatch 生成 ColumnChunk (数值、长度和编码都在 Arrow 中向量化计算)"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    count = batch.num_rows
+    names = batch.schema.names
+
+    def column(name):
+        return batch.column(names.index(name)) if name in names else None
+
+    likes = column("like_count")
+    if likes is None:
+        likes = np.zeros(count, dtype=np.int64)
+    else:
+        likes = pc.fill_null(likes.cast(pa.int64()), 0).to_numpy(zero_copy_only=False)
+    text = column("text")
+    if text is None:
+        text = pa.nulls(count, pa.string())
+    text = text.cast(pa.string())
+    lengths = pc.fill_null(pc.utf8_length(text), 0).to_numpy(zero_copy_only=False).astype(np.int64, copy=False)
+    parent = column("parent_id")
+    if parent is None:
+        is_reply = np.zeros(count, dtype=bool)
+    else:
+        is_reply = pc.is_valid(parent).to_numpy(zero_copy_only=False)
+    return ColumnChunk(likes, lengths, is_reply, _encode_arrow(column("platform"), count, "unknown"),
+                       _encode_arrow(column("video_id"), count, default_video), text,
+                       lambda indices: batch.take(pa.array(indices, type=pa.int64())).to_pylist())
+
+
+def _iter_jsonl_records(path, skip=0):
+    """逐行读取 JSON Lines，跳过前 skip 条有效记录和无法解析的行"""
+    with open(path, "rb") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                logger.warning(f"跳过无法解析的行 {path}:{line_no}")
+                continue
+            if skip:
+                skip -= 1
+                continue
+            yield record
+
+
+def iter_json_array(path, buffer_size=1024 * 1024):
+    """增量读取 JSON 数组文件中的对象 (不把整个文件读入内存)"""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = f.read(buffer_size).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"不是 JSON 数组: {path}")
+        position = 1
+        eof = False
+        while True:
+            position = ARRAY_SEPARATORS.match(buffer, position).end()
+            if buffer.startswith("]", position):
+                return
+            try:
+                record, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # 缓冲区中剩下的是不完整的对象，读入下一段后重新解析
+                more = f.read(buffer_size)
+                eof = not more
+                buffer = buffer[position:] + more
+                position = 0
+                continue
+            yield record
+
+
+def _chunked(records, default_video, chunk_rows):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= chunk_rows:
+            yield chunk_from_records(batch, default_video)
+            batch = []
+    if batch:
+        yield chunk_from_records(batch, default_video)
+
+
+def _iter_jsonl_arrow(path, default_video, chunk_rows):
+    import pyarrow as pa
+    import pyarrow.json as pa_json
+
+    schema = pa.schema([(name, pa.int64() if name == "like_count" else pa.string()) for name in FIELDS])
+    rows = 0
+    try:
+        reader = pa_json.open_json(
+            path,
+            read_options=pa_json.ReadOptions(block_size=ARROW_BLOCK_SIZE),
+            parse_options=pa_json.ParseOptions(explicit_schema=schema, unexpected_field_behavior="ignore"))
+        for batch in reader:
+            rows += batch.num_rows
+            yield chunk_from_arrow(batch, default_video)
+        return
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        # 字段类型不一致 (如旧版输出中数字形式的ID) 或最后一行被截断时，从出错的位置改为逐行解析
+        logger.debug(f"Arrow 无法解析 {path} ({str(e)})，从第 {rows + 1} 条记录开始逐行解析")
+    yield from _chunked(_iter_jsonl_records(path, skip=rows), default_video, chunk_rows)
+
+
+def iter_chunks(path, chunk_rows=CHUNK_ROWS, use_arrow=True):
+    """
+    按块读取一个输入文件
+
+    Args:
+        path: 输入文件路径
+        chunk_rows: 逐行解析时每块的记录数
+        use_arrow: 安装了 pyarrow 时是否用 Arrow 解析 JSON Lines
+
+    Yields:
+        ColumnChunk
+    """
+    default_video = video_from_path(path)
+    if path.endswith((".parquet", ".arrow")):
+        if not load_pyarrow():
+            raise RuntimeError("读取 parquet/arrow 格式需要安装 pyarrow: pip install pyarrow")
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if path.endswith(".parquet"):
+            batches = pq.ParquetFile(path).iter_batches(batch_size=chunk_rows)
+        else:
+            reader = pa.ipc.open_file(path)
+            batches = (reader.get_batch(index) for index in range(reader.num_record_batches))
+        for batch in batches:
+            yield chunk_from_arrow(batch, default_video)
+    elif path.endswith(".manifest.json"):
+        from shard_writer import read_shards
+
+        yield from _chunked(read_shards(path), default_video, chunk_rows)
+    elif path.endswith(".json"):
+        yield from _chunked(iter_json_array(path), default_video, chunk_rows)
+    elif use_arrow and load_pyarrow():
+        yield from _iter_jsonl_arrow(path, default_video, chunk_rows)
+    else:
+        yield from _chunked(_iter_jsonl_records(path), default_video, chunk_rows)
+
+
+def _mix64(values):
+    """splitmix64 的混合函数 (uint64 数组，乘法按 2^64 取模)"""
+    values = values ^ (values >> np.uint64(30))
+    values *= np.uint64(0xBF58476D1CE4E5B9)
+    values ^= values >> np.uint64(27)
+    values *= np.uint64(0x94D049BB133111EB)
+    values ^= values >> np.uint64(31)
+    return values
+
+
+def _hash_utf8(offsets, data):
+    """
+    按 Arrow 字符串列的布局 (偏移数组 + UTF-8 字节) 计算每个字符串的 64 位哈希
+
+    每个字符串按 8 字节分成若干个字 (最后一个字高位补 0)，通过步长为 1 的视图一次取出全部字；
+    每个字与它在字符串中的序号一起混合后按字符串求和 (前缀和相减)，再与长度一起混合一次。
+    全部是 NumPy 数组运算，每次处理不超过 HASH_BLOCK_BYTES 字节，临时数组的大小有上限。
+
+    Returns:
+        (uint64 哈希数组, 空字符串的布尔掩码)
+    """
+    count = len(offsets) - 1
+    hashes = np.empty(count, dtype=np.uint64)
+    start = 0
+    while start < count:
+        end = int(np.searchsorted(offsets, offsets[start] + HASH_BLOCK_BYTES, side="right")) - 1
+        end = min(max(end, start + 1), count)
+        block_offsets = offsets[start:end + 1] - offsets[start]
+        lengths = np.diff(block_offsets)
+        words = (lengths + 7) >> 3
+        word_offsets = np.zeros(len(words) + 1, dtype=np.int64)
+        np.cumsum(words, out=word_offsets[1:])
+        # 每个字在字符串中的序号和剩余字节数
+        index = np.arange(word_offsets[-1], dtype=np.int64) - np.repeat(word_offsets[:-1], words)
+        remaining = np.minimum(np.repeat(lengths, words) - 8 * index, 8)
+
+        size = int(block_offsets[-1])
+        padded = np.zeros(size + 8, dtype=np.uint8)
+        padded[:size] = data[offsets[start]:offsets[end]]
+        # 从任意字节位置开始的 8 字节小端整数
+        windows = np.ndarray((size + 1,), dtype="<u8", buffer=padded, strides=(1,))
+        values = windows[np.repeat(block_offsets[:-1], words) + 8 * index].astype(np.uint64)
+        shift = ((8 - remaining) * 8).astype(np.uint64)
+        values = (values << shift) >> shift
+        mixed = _mix64(values + index.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15))
+
+        sums = np.zeros(len(mixed) + 1, dtype=np.uint64)
+        np.cumsum(mixed, out=sums[1:])
+        hashes[start:end] = _mix64((sums[word_offsets[1:]] - sums[word_offsets[:-1]])
+                                   ^ _mix64(lengths.astype(np.uint64)))
+        start = end
+    return hashes, np.diff(offsets) == 0
+
+
+def text_hashes(texts):
+    """
+    计算文本的 64 位哈希，None 和空字符串记为 0
+
+    texts 为 Arrow 字符串数组时直接读取它的偏移和数据缓冲区，不转换为 Python 对象；
+    文本列表 (逐行解析的输入) 先编码为同样的布局。哈希只取决于文本的 UTF-8 编码，
+    不同进程和不同机器上结果相同。0 保留给空文本和缺失的文本 (不参与去重)，哈希恰好为 0 的文本记为 1。
+    """
+    if isinstance(texts, list):
+        encoded = [text.encode("utf-8", "surrogatepass") if isinstance(text, str) else b"" for text in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+        hashes, empty = _hash_utf8(offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8))
+    else:
+        import pyarrow as pa
+
+        if isinstance(texts, pa.ChunkedArray):
+            texts = texts.combine_chunks()
+        _, offsets_buffer, data_buffer = texts.buffers()
+        offset_type = np.int64 if pa.types.is_large_string(texts.type) else np.int32
+        offsets = np.frombuffer(offsets_buffer, dtype=offset_type)[texts.offset:texts.offset + len(texts) + 1]
+        data = np.frombuffer(data_buffer, dtype=np.uint8) if data_buffer is not None else np.zeros(0, np.uint8)
+        hashes, empty = _hash_utf8(offsets.astype(np.int64), data)
+        if texts.null_count:
+            empty |= texts.is_null().to_numpy(zero_copy_only=False)
+    hashes[hashes == 0] = 1
+    hashes[empty] = 0
+    return hashes.view(np.int64)
+
+
+class GroupStats:
+    """按编码分组的累计统计 (评论数、回复数、点赞总数和最大值、文本总长度)"""
+
+    def __init__(self):
+        self.names = {}
+        self.records = np.zeros(0, dtype=np.int64)
+        self.replies = np.zeros(0, dtype=np.int64)
+        self.like_sum = np.zeros(0, dtype=np.int64)
+        self.like_max = np.zeros(0, dtype=np.int64)
+        self.length_sum = np.zeros(0, dtype=np.int64)
+
+    def _grow(self, size):
+        if size <= len(self.records):
+            return
+        for name in ("records", "replies", "like_sum", "like_max", "length_sum"):
+            array = getattr(self, name)
+            grown = np.zeros(max(size, len(array) * 2), dtype=np.int64)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+
+    def add(self, encoded, chunk):
+        """累加一块评论 (encoded 为该块的 (编码, 名称))"""
+        codes, labels = encoded
+        # 块内编码映射到全局编码 (只对不同的名称做一次字典查找)
+        mapping = np.fromiter((self.names.setdefault(label, len(self.names)) for label in labels),
+                              dtype=np.int64, count=len(labels))
+        codes = mapping[codes]
+        size = len(self.names)
+        self._grow(size)
+        self.records[:size] += np.bincount(codes, minlength=size)
+        self.replies[:size] += np.bincount(codes, weights=chunk.is_reply, minlength=size).astype(np.int64)
+        self.like_sum[:size] += np.bincount(codes, weights=chunk.likes, minlength=size).astype(np.int64)
+        self.length_sum[:size] += np.bincount(codes, weights=chunk.lengths, minlength=size).astype(np.int64)
+        np.maximum.at(self.like_max, codes, chunk.likes)
+
+    def report(self, limit=0):
+        """按评论数从多到少输出各组的统计，limit > 0 时只输出前 limit 组"""
+        size = len(self.names)
+        labels = list(self.names)
+        order = np.argsort(-self.records[:size], kind="stable")
+        # 只出现在块的默认名称中、没有任何记录的组不输出
+        order = order[self.records[order] > 0]
+        if limit:
+            order = order[:limit]
+        result = {}
+        for index in order:
+            records = int(self.records[index])
+            result[labels[index]] = {
+                "records": records,
+                "replies": int(self.replies[index]),
+                "like_sum": int(self.like_sum[index]),
+                "like_max": int(self.like_max[index]),
+                "mean_length": round(float(self.length_sum[index]) / records, 2) if records else 0.0,
+            }
+        return result
+
+
+class CommentAnalyzer:
+    """
+    逐块累计评论的汇总指标
+
+    每块评论加入时只做向量化运算；跨块需要保留的状态为各组的统计数组、点赞最多的 top_k 条候选记录、
+    长度直方图和文本哈希的计数 (按哈希排序、定期合并)，与评论总数无关。
+    """
+
+    def __init__(self, top_k=TOP_K):
+        self.top_k = top_k
+        self.records = 0
+        self.replies = 0
+        self.platforms = GroupStats()
+        self.videos = GroupStats()
+        self.length_histogram = np.zeros(LENGTH_CAP + 1, dtype=np.int64)
+        self._top = []  # (点赞数, 序号, 记录)
+        self._hashes = np.zeros(0, dtype=np.int64)  # 已合并的不同文本哈希 (有序)
+        self._hash_counts = np.zeros(0, dtype=np.int64)
+        self._pending = []  # 待合并的哈希数组
+        self._pending_size = 0
+
+    def add(self, chunk):
+        """加入一块评论"""
+        if not len(chunk):
+            return
+        self.records += len(chunk)
+        self.replies += int(np.count_nonzero(chunk.is_reply))
+        self.platforms.add(chunk.platforms, chunk)
+        self.videos.add(chunk.videos, chunk)
+        self.length_histogram += np.bincount(np.minimum(chunk.lengths, LENGTH_CAP), minlength=LENGTH_CAP + 1)
+        self._add_top(chunk)
+
+        hashes = text_hashes(chunk.texts)
+        self._pending.append(hashes[hashes != 0])
+        self._pending_size += len(self._pending[-1])
+        if self._pending_size >= COMPACT_HASHES:
+            self._compact()
+
+    def _add_top(self, chunk):
+        if self.top_k <= 0:
+            return
+        likes = chunk.likes
+        if len(likes) > self.top_k:
+            candidates = np.argpartition(-likes, self.top_k - 1)[:self.top_k]
+        else:
+            candidates = np.arange(len(likes))
+        # 低于当前第 k 名的候选不需要取回记录
+        if len(self._top) >= self.top_k:
+            candidates = candidates[likes[candidates] > self._top[-1][0]]
+        if not len(candidates):
+            return
+        candidates = candidates.tolist()
+        for index, record in zip(candidates, chunk.rows(candidates)):
+            self._top.append((int(likes[index]), self.records - len(chunk) + index, record))
+        self._top.sort(key=lambda item: (-item[0], item[1]))
+        del self._top[self.top_k:]
+
+    def _compact(self):
+        """合并待处理的哈希: 排序去重并累加出现次数"""
+        if not self._pending:
+            return
+        pending = np.concatenate(self._pending)
+        self._pending = []
+        self._pending_size = 0
+        hashes, counts = np.unique(pending, return_counts=True)
+        if len(self._hashes):
+            hashes = np.concatenate([self._hashes, hashes])
+            counts = np.concatenate([self._hash_counts, counts])
+            hashes, inverse = np.unique(hashes, return_inverse=True)
+            counts = np.bincount(inverse, weights=counts, minlength=len(hashes)).astype(np.int64)
+        self._hashes, self._hash_counts = hashes, counts
+
+    def duplicate_hashes(self, limit):
+        """出现次数最多的 limit 个重复文本的 (哈希数组, 次数数组)"""
+        self._compact()
+        repeated = np.flatnonzero(self._hash_counts > 1)
+        if limit and len(repeated) > limit:
+            repeated = repeated[np.argsort(-self._hash_counts[repeated], kind="stable")[:limit]]
+        else:
+            repeated = repeated[np.argsort(-self._hash_counts[repeated], kind="stable")]
+        return self._hashes[repeated], self._hash_counts[repeated]
+
+    def length_report(self):
+        histogram = self.length_histogram
+        total = int(histogram.sum())
+        if not total:
+            return {"mean": 0.0, "p50": 0, "p90": 0, "p99": 0, "max": 0, "histogram": {}}
+        cumulative = np.cumsum(histogram)
+        lengths = np.arange(len(histogram))
+
+        def percentile(q):
+            return int(np.searchsorted(cumulative, q * total, side="left"))
+
+        # 按 2 的幂分桶: 0, 1, 2-3, 4-7, ...
+        edges = [0, 1]
+        while edges[-1] * 2 <= LENGTH_CAP:
+            edges.append(edges[-1] * 2)
+        buckets = np.add.reduceat(histogram, edges)
+        labels = ["0"] + [f"{start}-{end - 1}" if end - 1 > start else str(start)
+                          for start, end in zip(edges[1:], edges[2:] + [LENGTH_CAP + 1])]
+        labels[-1] = f"{edges[-1]}+"
+        return {
+            "mean": round(float((histogram * lengths).sum()) / total, 2),
+            "p50": percentile(0.5),
+            "p90": percentile(0.9),
+            "p99": percentile(0.99),
+            "max": int(lengths[histogram > 0][-1]),
+            "histogram": {label: int(count) for label, count in zip(labels, buckets) if count},
+        }
+
+    def report(self, top_videos=TOP_VIDEOS):
+        self._compact()
+        unique_texts = len(self._hashes)
+        texts = int(self._hash_counts.sum())
+        return {
+            "records": self.records,
+            "top_level": self.records - self.replies,
+            "replies": self.replies,
+            "platforms": self.platforms.report(),
+            "videos": self.videos.report(top_videos),
+            "video_count": int(np.count_nonzero(self.videos.records)),
+            "top_liked": [record for _, _, record in self._top],
+            "duplicates": {
+                # 不同文本数按 64 位哈希统计
+                "hash": "mix64",
+                "texts": texts,
+                "unique_texts": unique_texts,
+                "duplicate_records": texts - unique_texts,
+            },
+            "text_length": self.length_report(),
+        }
+
+
+def find_texts(files, hashes, chunk_rows=CHUNK_ROWS, use_arrow=True):
+    """
+    再读一遍输入，取回给定哈希对应的文本并按原文精确计数
+
+    每个哈希以第一次遇到的文本为准，之后哈希相同的文本逐条与之比较，原文相同才计数；
+    原文不同 (哈希碰撞) 的哈希记录在 collisions 中。
+
+    Returns:
+        ({哈希: [文本, 出现次数]}, 发生碰撞的哈希集合)
+    """
+    found = {}
+    collisions = set()
+    wanted = np.asarray(hashes, dtype=np.int64)
+    for path in files:
+        for chunk in iter_chunks(path, chunk_rows, use_arrow):
+            chunk_hashes = text_hashes(chunk.texts)
+            for index in np.flatnonzero(np.isin(chunk_hashes, wanted)).tolist():
+                value = int(chunk_hashes[index])
+                text = chunk.text(index)
+                entry = found.setdefault(value, [text, 0])
+                if entry[0] == text:
+                    entry[1] += 1
+                else:
+                    collisions.add(value)
+    return found, collisions
+
+
+def analyze(paths, top_k=TOP_K, top_duplicates=TOP_K, top_videos=TOP_VIDEOS, chunk_rows=CHUNK_ROWS, use_arrow=True):
+    """
+    分析一个或多个抓取结果
+
+    Args:
+        paths: 输入文件或目录列表
+        top_k: 输出点赞最多的评论数
+        top_duplicates: 输出重复最多的文本数 (需要再读一遍输入取回文本并按原文核对次数，为 0 时跳过)
+        top_videos: 输出的视频数 (按评论数排序)，0 表示全部
+        chunk_rows: 逐行解析时每块的记录数
+        use_arrow: 安装了 pyarrow 时是否用 Arrow 解析 JSON Lines
+
+    Returns:
+        报告字典
+    """
+    started = time.perf_counter()
+    files = expand_inputs(paths)
+    analyzer = CommentAnalyzer(top_k)
+    for path in files:
+        for chunk in iter_chunks(path, chunk_rows, use_arrow):
+            analyzer.add(chunk)
+        logger.debug(f"已读取 {path}，累计 {analyzer.records} 条评论")
+
+    report = analyzer.report(top_videos)
+    if top_duplicates:
+        hashes, _ = analyzer.duplicate_hashes(top_duplicates)
+        texts, collisions = find_texts(files, hashes, chunk_rows, use_arrow) if len(hashes) else ({}, set())
+        if collisions:
+            logger.warning(f"{len(collisions)} 个文本哈希发生碰撞，重复文本的次数已按原文核对")
+        top = [{"text": texts[int(value)][0], "count": texts[int(value)][1]}
+               for value in hashes.tolist() if int(value) in texts]
+        # 按原文核对后的次数重新排序，核对后不再重复的文本不输出
+        top.sort(key=lambda item: -item["count"])
+        report["duplicates"]["top"] = [item for item in top if item["count"] > 1]
+        report["duplicates"]["hash_collisions"] = len(collisions)
+    report["files"] = files
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def main(argv=None, prog=None):
+    """
+    命令行入口
+
+    Args:
+        argv: 命令行参数 (不含程序名)，为 None 时使用 sys.argv[1:]
+        prog: 帮助信息中显示的程序名
+    """
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(prog=prog, description="评论数据分析: 各平台/视频汇总、点赞最多的评论、重复文本、长度分布")
+    parser.add_argument("paths", nargs="+", help="输入文件或目录 (.jsonl、.json、.manifest.json、.parquet、.arrow)")
+    parser.add_argument("--top", type=int, default=TOP_K, help="输出点赞最多的评论数")
+    parser.add_argument("--duplicates", type=int, default=TOP_K, help="输出重复最多的文本数 (0 表示不输出，省去第二遍读取)")
+    parser.add_argument("--videos", type=int, default=TOP_VIDEOS, help="输出评论最多的视频数 (0 表示全部)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="逐行解析时每块的记录数")
+    parser.add_argument("--no-arrow", action="store_true", help="不使用 pyarrow 解析 JSON Lines")
+    parser.add_argument("--output", type=str, default=None, help="报告输出文件 (默认打印到标准输出)")
+    args = parser.parse_args(argv)
+
+    files = expand_inputs(args.paths)
+    if not files:
+        logger.error("没有找到可以分析的文件")
+        return 1
+    report = analyze(files, args.top, args.duplicates, args.videos, args.chunk_rows, not args.no_arrow)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        logger.info(f"已分析 {report['records']} 条评论 ({report['seconds']} 秒)，报告已保存到 {args.output}")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
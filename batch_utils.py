@@ -0,0 +1,40 @@
+import json
+import os
+import sys
+
+
+def read_video_list(source):
+    """
+    读取视频列表
+
+    Args:
+        source: 文件路径，或 "-" 表示从标准输入读取
+
+    Returns:
+        去重后的 URL/ID 列表 (保持原始顺序)，忽略空行和以 # 开头的注释行
+    """
+    if source == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+
+    videos = []
+    seen = set()
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line in seen:
+            continue
+        seen.add(line)
+        videos.append(line)
+    return videos
+
+
+def write_manifest(manifest_path, manifest):
+    """原子地写入批量抓取清单"""
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
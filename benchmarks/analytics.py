@@ -0,0 +1,163 @@
+"""
+数据分析基准测试
+
+生成合成的评论数据 (JSON Lines，安装了 pyarrow 时另存一份 Parquet)，分别用 Arrow 解析、逐行解析和 Parquet
+输入运行 analytics.analyze，输出机器可读的 JSON 指标 (记录/秒、耗时、峰值内存)。
+每种方式在独立的子进程中运行，峰值内存互不影响。
+
+用法:
+    python benchmarks/analytics.py
+    python benchmarks/analytics.py --records 5000000 --output analytics_bench.json
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+# 读取方式: (输入文件, 是否用 Arrow 解析 JSON Lines)
+MODES = {
+    "jsonl_arrow": ("comments.jsonl", True),
+    "jsonl_python": ("comments.jsonl", False),
+    "parquet": ("comments.parquet", True),
+}
+
+# 合成数据中重复文本的比例
+DUPLICATE_RATIO = 0.2
+
+
+def synthetic_records(count, videos, seed=0):
+    """生成合成的评论记录 (约 1/4 为回复，部分文本重复)"""
+    rng = random.Random(seed)
+    words = ["好看", "great", "video", "哈哈", "first", "太棒了", "lol", "同意", "music", "谢谢分享"]
+    common = [" ".join(rng.choices(words, k=rng.randint(1, 4))) for _ in range(200)]
+    parent_id = None
+    for index in range(count):
+        video = f"video{rng.randrange(videos):05d}"
+        if rng.random() < DUPLICATE_RATIO:
+            text = rng.choice(common)
+        else:
+            text = f"{' '.join(rng.choices(words, k=rng.randint(1, 30)))} #{index}"
+        is_reply = parent_id is not None and rng.random() < 0.25
+        comment_id = f"c{index}"
+        yield {
+            "id": comment_id,
+            "parent_id": parent_id if is_reply else None,
+            "platform": "youtube" if index % 3 else "tiktok",
+            "video_id": video,
+            "author": f"user{rng.randrange(100000)}",
+            "text": text,
+            "like_count": int(rng.paretovariate(1.2)) - 1,
+            "published_at": "2024-01-01T00:00:00Z",
+        }
+        if not is_reply:
+            parent_id = comment_id
+
+
+def write_inputs(work_dir, count, videos):
+    """写入 JSON Lines (和 Parquet)，返回各文件的大小"""
+    jsonl_path = os.path.join(work_dir, MODES["jsonl_arrow"][0])
+    with open(jsonl_path, "w", encoding="utf-8") as f:
+        for record in synthetic_records(count, videos):
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    sizes = {"jsonl": os.path.getsize(jsonl_path)}
+
+    try:
+        import pyarrow.json
+        import pyarrow.parquet
+    except ImportError:
+        return sizes
+    parquet_path = os.path.join(work_dir, MODES["parquet"][0])
+    pyarrow.parquet.write_table(pyarrow.json.read_json(jsonl_path), parquet_path)
+    sizes["parquet"] = os.path.getsize(parquet_path)
+    return sizes
+
+
+def peak_rss_bytes():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_mode(path, use_arrow, top_duplicates):
+    """在当前进程中运行一次分析 (由子进程调用)，返回指标"""
+    import analytics
+
+    started = time.perf_counter()
+    report = analytics.analyze([path], top_duplicates=top_duplicates, use_arrow=use_arrow)
+    seconds = time.perf_counter() - started
+    return {
+        "records": report["records"],
+        "seconds": round(seconds, 3),
+        "records_per_second": round(report["records"] / seconds) if seconds else None,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "unique_texts": report["duplicates"]["unique_texts"],
+    }
+
+
+def run_child(mode, work_dir, top_duplicates):
+    command = [sys.executable, os.path.abspath(__file__), "--child", mode, "--work-dir", work_dir,
+               "--duplicates", str(top_duplicates)]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "failed"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="analytics.py 基准测试")
+    parser.add_argument("--records", type=int, default=1000000, help="合成的评论数")
+    parser.add_argument("--videos", type=int, default=5000, help="合成数据中的视频数")
+    parser.add_argument("--duplicates", type=int, default=10, help="输出重复最多的文本数 (0 表示跳过第二遍读取)")
+    parser.add_argument("--mode", action="append", choices=list(MODES), help="只运行指定的读取方式 (可重复)")
+    parser.add_argument("--output", type=str, default=None, help="结果输出文件 (默认打印到标准输出)")
+    parser.add_argument("--child", type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        file_name, use_arrow = MODES[args.child]
+        print(json.dumps(run_mode(os.path.join(args.work_dir, file_name), use_arrow, args.duplicates)))
+        return 0
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="scraper-analytics-") as work_dir:
+        started = time.perf_counter()
+        sizes = write_inputs(work_dir, args.records, args.videos)
+        generate_seconds = time.perf_counter() - started
+        for mode in args.mode or list(MODES):
+            if mode == "parquet" and "parquet" not in sizes:
+                results[mode] = {"error": "未安装 pyarrow"}
+                continue
+            results[mode] = run_child(mode, work_dir, args.duplicates)
+
+    report = {
+        "python": sys.version.split()[0],
+        "records": args.records,
+        "videos": args.videos,
+        "input_bytes": sizes,
+        "generate_seconds": round(generate_seconds, 3),
+        "modes": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0 if all("error" not in result for result in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import asyncio
+import random
+
+from stub_tiktok import SIGNATURE_PARAM, fake_signature
+
+# TikTok 每次请求返回的评论数
+PAGE_SIZE = 20
+
+# 保存真正的 asyncio.sleep (基准测试会替换 asyncio.sleep 以统计休眠时间)
+_real_sleep = asyncio.sleep
+
+
+def synthetic_tiktok_fixture(comments=1000, seed=42):
+    """
+    生成确定性的 TikTok 评论数据 (字段与 TikTokApi v6 的原始评论字典一致)
+
+    Returns:
+        {"comments": [原始评论字典], "replies": {评论ID: [原始回复字典]}}
+    """
+    rng = random.Random(seed)
+    fixture = {"comments": [], "replies": {}}
+    for i in range(comments):
+        cid = str(7300000000000000000 + i)
+        roll = rng.random()
+        reply_count = 0 if roll < 0.75 else rng.randint(1, 10) if roll < 0.97 else rng.randint(20, 80)
+        fixture["comments"].append(_raw_comment(rng, cid, i, reply_count))
+        if reply_count:
+            fixture["replies"][cid] = [_raw_comment(rng, f"{cid}{j:04d}", j, 0) for j in range(reply_count)]
+    return fixture
+
+
+def _raw_comment(rng, cid, index, reply_count):
+    return {
+        "cid": cid,
+        "text": " ".join(rng.choice(("wow", "nice", "lol", "omg", "so", "cute", "哈哈")) for _ in range(rng.randint(1, 20))),
+        "digg_count": rng.randint(0, 10000),
+        "create_time": 1700000000 + index,
+        "reply_comment_total": reply_count,
+        "user": {"unique_id": f"user{index}", "uid": str(index), "sec_uid": f"sec{index}"},
+    }
+
+
+class FakeComment:
+    """模拟 TikTokApi v6 的 Comment 对象 (as_dict 为原始字典属性)"""
+
+    def __init__(self, source, raw):
+        self.source = source
+        self.as_dict = raw
+        self.id = raw["cid"]
+        self.text = raw["text"]
+        self.likes_count = raw["digg_count"]
+
+    async def replies(self, count=20, cursor=0, **kwargs):
+        replies = self.source.fixture["replies"].get(self.id, [])
+        for start in range(cursor, min(len(replies), cursor + count), PAGE_SIZE):
+            await self.source.request()
+            for raw in replies[start:start + PAGE_SIZE]:
+                yield FakeComment(self.source, raw)
+
+
+class FakeVideo:
+    def __init__(self, source):
+        self.source = source
+
+    async def comments(self, count=20, cursor=0, **kwargs):
+        comments = self.source.fixture["comments"]
+        end = min(len(comments), cursor + count)
+        for start in range(cursor, end, PAGE_SIZE):
+            await self.source.request()
+            for raw in comments[start:min(start + PAGE_SIZE, end)]:
+                yield FakeComment(self.source, raw)
+
+
+class FakeTikTokSource:
+    """
+    模拟的 TikTok 数据源
+
+    调用后返回一个类似 TikTokApi 的对象，可作为 TikTokSessionPool 的 api_factory。
+    每次翻页 (评论或回复) 计为一次请求，并可模拟固定的网络延迟。
+    指定 base_url 时，会话的 base_url 指向该地址 (直接 HTTP 模式请求本地的 StubTikTokServer)。
+    """
+
+    def __init__(self, fixture, latency=0.0, base_url=None):
+        self.fixture = fixture
+        self.latency = latency
+        self.base_url = base_url
+        self.requests = 0
+        self.signatures = 0  # 直接 HTTP 模式下签名的 URL 数
+
+    async def request(self):
+        self.requests += 1
+        await _real_sleep(self.latency)
+
+    def __call__(self):
+        return FakeTikTokApi(self)
+
+
+class FakeSession:
+    """模拟 TikTokApi v6 的浏览器会话 (只包含直接 HTTP 模式复制的字段)"""
+
+    def __init__(self, base_url=None):
+        self.base_url = base_url
+        self.params = {"aid": "1988", "device_id": "7300000000000000001"}
+        self.headers = {"User-Agent": "Mozilla/5.0 (benchmark)"}
+        self.ms_token = None
+
+
+class FakeTikTokApi:
+    def __init__(self, source):
+        self.source = source
+        self.sessions = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.sessions = []
+
+    async def create_sessions(self, num_sessions=1, **kwargs):
+        self.sessions.extend(FakeSession(self.source.base_url) for _ in range(num_sessions))
+
+    async def get_session_cookies(self, session):
+        return {"msToken": "benchmark-ms-token", "ttwid": "benchmark"}
+
+    async def sign_url(self, url, session_index=0, **kwargs):
+        """与 TikTokApi v6 的 sign_url 相同: 在 URL 末尾加上 X-Bogus"""
+        self.source.signatures += 1
+        query = url.split("?", 1)[1] if "?" in url else ""
+        return f"{url}{'&' if '?' in url else '?'}{SIGNATURE_PARAM}={fake_signature(query)}"
+
+    def video(self, url=None, **kwargs):
+        return FakeVideo(self.source)
+
+    def comment(self, data=None):
+        return FakeComment(self.source, data)
@@ -0,0 +1,293 @@
+"""
+离线回放基准测试
+
+使用本地模拟的 YouTube API 服务器和模拟的 TikTok 数据源，端到端运行两个爬虫的 get_comments，
+输出机器可读的 JSON 指标 (评论/秒、每千条评论的请求数、写入字节数、峰值内存、休眠时间)。
+每个场景在独立的子进程中运行，峰值内存互不影响。
+
+用法:
+    python benchmarks/run.py
+    python benchmarks/run.py --scenario youtube --youtube-threads 5000 --output bench.json
+    python benchmarks/run.py --baseline bench.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+# 模拟的数据源需要在替换 time.sleep / asyncio.sleep 之前导入，模拟的网络延迟才是真实的等待
+from fake_tiktok import FakeTikTokSource, synthetic_tiktok_fixture  # noqa: E402
+from stub_tiktok import StubTikTokServer  # noqa: E402
+from stub_youtube import StubYouTubeServer, load_fixture, synthetic_youtube_fixture  # noqa: E402
+
+SCENARIOS = ("youtube", "tiktok", "tiktok_http")
+
+# 回归检查的指标及方向 (1 表示越大越好，-1 表示越小越好)
+REGRESSION_METRICS = {
+    "comments_per_second": 1,
+    "requests_per_1000_comments": -1,
+    "bytes_written_per_comment": -1,
+    "peak_rss_bytes": -1,
+    "sleep_seconds": -1,
+}
+
+
+class SleepRecorder:
+    """
+    替换 time.sleep 和 asyncio.sleep，只记录请求的休眠时间而不真正等待
+
+    爬虫中的随机休眠和限速等待会被统计为 sleep_seconds，基准测试本身只测量代码路径的开销。
+    同时替换 time.monotonic 为虚拟时钟: 每次休眠都把时钟向前推进休眠的时长，
+    令牌桶据此补充令牌，限速等待不会因为时间没有流逝而不断累积。
+    """
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.calls = 0
+        self._offset = 0.0
+        self._lock = threading.Lock()
+        self._real_async_sleep = asyncio.sleep
+        self._real_monotonic = time.monotonic
+
+    def monotonic(self):
+        return self._real_monotonic() + self._offset
+
+    def _record(self, seconds):
+        seconds = max(0.0, seconds or 0.0)
+        with self._lock:
+            self.seconds += seconds
+            self.calls += 1
+            self._offset += seconds
+
+    def install(self):
+        real_async_sleep = self._real_async_sleep
+        time.monotonic = self.monotonic
+
+        def sleep(seconds):
+            self._record(seconds)
+
+        async def async_sleep(seconds, result=None):
+            self._record(seconds)
+            return await real_async_sleep(0, result)
+
+        time.sleep = sleep
+        asyncio.sleep = async_sleep
+        return self
+
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def peak_rss_bytes():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def build_metrics(comments, top_level, seconds, requests, bytes_written, sleeper, **extra):
+    metrics = {
+        "comments": comments,
+        "top_level_comments": top_level,
+        "wall_seconds": round(seconds, 4),
+        "comments_per_second": round(comments / seconds, 1) if seconds else None,
+        "requests": requests,
+        "requests_per_1000_comments": round(sum(requests.values()) * 1000 / comments, 2) if comments else None,
+        "bytes_written": bytes_written,
+        "bytes_written_per_comment": round(bytes_written / comments, 2) if comments else None,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "sleep_seconds": round(sleeper.seconds, 3),
+        "sleep_calls": sleeper.calls,
+    }
+    metrics.update(extra)
+    return metrics
+
+
+def run_youtube(args, sleeper):
+    import youtube_comments_scraper as scraper
+    from youtube_client import YouTubeClient
+    from youtube_key_pool import ApiKeyPool
+
+    fixture = load_fixture(args.fixture) if args.fixture else synthetic_youtube_fixture(args.youtube_threads, seed=args.seed)
+    stats = {}
+    with StubYouTubeServer(fixture) as server:
+        client = YouTubeClient(api_base=server.api_base)
+        key_pool = ApiKeyPool(["benchmark-key"], daily_budget=10 ** 9, state_file=None, client=client)
+        started = time.perf_counter()
+        scraper.get_comments(fixture["video_id"], count=len(fixture["threads"]), key_pool=key_pool,
+                             reply_workers=args.reply_workers, output_format=args.format, stats=stats)
+        seconds = time.perf_counter() - started
+        requests = dict(server.requests)
+        bytes_received = server.bytes_sent
+    if stats.get("error"):
+        raise RuntimeError(f"YouTube 场景失败: {stats['error']}")
+    return build_metrics(stats["total_comments"], stats["comment_count"], seconds, requests,
+                         directory_size("data"), sleeper, bytes_received=bytes_received)
+
+
+def run_tiktok(args, sleeper, server=None):
+    import tiktok_comments_scraper as scraper
+    from rate_limiter import AsyncThrottle
+    from tiktok_session_pool import TikTokSessionPool
+
+    fixture = server.fixture if server else synthetic_tiktok_fixture(args.tiktok_comments, seed=args.seed)
+    source = FakeTikTokSource(fixture, latency=args.tiktok_latency, base_url=server.base_url if server else None)
+    stats = {}
+
+    async def crawl():
+        async with TikTokSessionPool(num_sessions=1, sleep_after=0, api_factory=source) as pool:
+            started = time.perf_counter()
+            await scraper.get_comments("https://www.tiktok.com/@benchmark/video/7300000000000000000",
+                                       count=len(fixture["comments"]), pool=pool, stats=stats,
+                                       throttle=AsyncThrottle.for_tiktok(), output_format=args.format,
+                                       reply_concurrency=args.reply_workers, http_mode=server is not None)
+            return time.perf_counter() - started
+
+    seconds = asyncio.run(crawl())
+    if stats.get("error"):
+        raise RuntimeError(f"TikTok 场景失败: {stats['error']}")
+    requests = {"pages": source.requests}
+    if server:
+        # 直接 HTTP 模式: pages 为回退到浏览器路径的请求数
+        requests.update(server.requests)
+    return build_metrics(stats["total_comments"], stats["comment_count"], seconds,
+                         requests, directory_size("data"), sleeper)
+
+
+def run_tiktok_http(args, sleeper):
+    fixture = synthetic_tiktok_fixture(args.tiktok_comments, seed=args.seed)
+    with StubTikTokServer(fixture, latency=args.tiktok_latency, reject_after=args.tiktok_reject_after) as server:
+        return run_tiktok(args, sleeper, server)
+
+
+def run_child(args):
+    """在当前进程中运行一个场景 (在临时目录中写出文件)，把指标以 JSON 打印到标准输出"""
+    random.seed(args.seed)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    sleeper = SleepRecorder()
+    if not args.real_sleep:
+        sleeper.install()
+
+    with tempfile.TemporaryDirectory(prefix="scraper-bench-") as work_dir:
+        os.chdir(work_dir)
+        runner = {"youtube": run_youtube, "tiktok": run_tiktok, "tiktok_http": run_tiktok_http}[args.child]
+        metrics = runner(args, sleeper)
+        os.chdir(ROOT_DIR)
+    print(json.dumps(metrics))
+
+
+def child_command(args, scenario):
+    command = [sys.executable, os.path.abspath(__file__), "--child", scenario,
+               "--youtube-threads", str(args.youtube_threads), "--tiktok-comments", str(args.tiktok_comments),
+               "--tiktok-latency", str(args.tiktok_latency), "--reply-workers", str(args.reply_workers),
+               "--format", args.format, "--seed", str(args.seed)]
+    if args.tiktok_reject_after is not None:
+        command += ["--tiktok-reject-after", str(args.tiktok_reject_after)]
+    if args.fixture:
+        command += ["--fixture", os.path.abspath(args.fixture)]
+    if args.real_sleep:
+        command.append("--real-sleep")
+    if args.verbose:
+        command.append("--verbose")
+    return command
+
+
+def find_regressions(results, baseline, tolerance):
+    """与基线结果比较，返回超过容差的指标变化"""
+    regressions = []
+    for scenario, metrics in results.items():
+        base = baseline.get("scenarios", {}).get(scenario)
+        if not base:
+            continue
+        for name, direction in REGRESSION_METRICS.items():
+            current, previous = metrics.get(name), base.get(name)
+            if current is None or not previous:
+                continue
+            change = (current - previous) / previous
+            if change * direction < -tolerance:
+                regressions.append({"scenario": scenario, "metric": name, "baseline": previous,
+                                    "current": current, "change": round(change, 4)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="评论爬虫离线基准测试")
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all", help="要运行的场景")
+    parser.add_argument("--youtube-threads", type=int, default=2000, help="YouTube 场景的评论线程数")
+    parser.add_argument("--tiktok-comments", type=int, default=1000, help="TikTok 场景的主评论数")
+    parser.add_argument("--tiktok-latency", type=float, default=0.0, help="模拟的 TikTok 单次请求延迟 (秒)")
+    parser.add_argument("--tiktok-reject-after", type=int, default=None,
+                        help="tiktok_http 场景: 模拟服务器成功响应多少次之后返回验证码页面 (测试回退到浏览器)")
+    parser.add_argument("--reply-workers", type=int, default=8, help="并发获取回复的线程数/协程数")
+    parser.add_argument("--format", choices=["jsonl", "parquet", "arrow", "jsonl.gz", "jsonl.zst"], default="jsonl",
+                        help="输出格式")
+    parser.add_argument("--fixture", type=str, default=None, help="录制的 YouTube 评论数据 (JSON)")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--real-sleep", action="store_true", help="真正执行爬虫中的休眠 (默认只记录)")
+    parser.add_argument("--output", type=str, default=None, help="结果输出文件 (默认打印到标准输出)")
+    parser.add_argument("--baseline", type=str, default=None, help="用于回归检查的基线结果文件")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="回归检查允许的相对变化")
+    parser.add_argument("--verbose", action="store_true", help="显示爬虫日志")
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return 0
+
+    scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+    results = {}
+    for scenario in scenarios:
+        completed = subprocess.run(child_command(args, scenario), capture_output=True, text=True, cwd=ROOT_DIR)
+        if completed.returncode != 0:
+            sys.stderr.write(completed.stderr)
+            raise SystemExit(f"场景 {scenario} 运行失败")
+        results[scenario] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {name: getattr(args, name) for name in
+                   ("youtube_threads", "tiktok_comments", "tiktok_latency", "tiktok_reject_after", "reply_workers",
+                    "format", "seed", "real_sleep", "fixture")},
+        "scenarios": results,
+    }
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            report["regressions"] = find_regressions(results, json.load(f), args.tolerance)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
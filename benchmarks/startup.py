@@ -0,0 +1,113 @@
+"""
+启动时间基准测试
+
+多次运行 scrape.py 的 --help 和空运行 (空的视频列表)，记录每种情况的中位耗时，
+减去空解释器 (python -c pass) 的启动时间后与预算比较，同时检查是否加载了不需要的重量级依赖。
+
+用法:
+    python benchmarks/startup.py
+    python benchmarks/startup.py --repeat 20 --budget 0.15 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+SCRAPE = os.path.join(ROOT_DIR, "scrape.py")
+
+# 查看帮助和空运行都不应该加载的依赖
+HEAVY_MODULES = ("TikTokApi", "playwright", "googleapiclient", "pkg_resources", "pyarrow", "requests",
+                 "sqlite3", "http.server")
+
+# 场景: scrape.py 的参数 ({empty} 替换为空的视频列表文件)
+CASES = {
+    "help": ["--help"],
+    "tiktok_help": ["tiktok", "--help"],
+    "youtube_help": ["youtube", "--help"],
+    "batch_help": ["batch", "tiktok", "{empty}", "--help"],
+    "tiktok_noop": ["batch", "tiktok", "{empty}"],
+    "youtube_noop": ["batch", "youtube", "{empty}"],
+}
+
+# 每种情况允许的额外启动时间 (秒，不含解释器本身的启动时间)
+DEFAULT_BUDGET = 0.2
+
+
+def child_env():
+    env = dict(os.environ)
+    # 空运行不应该读取 .env 或访问网络，这里给一个占位密钥让 YouTube 越过密钥检查
+    env.setdefault("YOUTUBE_API_KEYS", "startup-benchmark-key")
+    return env
+
+
+def run_timed(command, cwd, env):
+    started = time.perf_counter()
+    subprocess.run(command, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def loaded_heavy_modules(args, cwd, env):
+    """在子进程中运行一次，返回加载了的重量级依赖"""
+    code = ("import sys; sys.path.insert(0, {root!r}); import scrape\n"
+            "try:\n    scrape.main({args!r})\nexcept SystemExit:\n    pass\n"
+            "print('heavy_modules=' + ','.join(m for m in {heavy!r} if m in sys.modules))"
+            ).format(root=ROOT_DIR, args=args, heavy=HEAVY_MODULES)
+    completed = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True)
+    line = [line for line in completed.stdout.splitlines() if line.startswith("heavy_modules=")][-1]
+    return [name for name in line.split("=", 1)[1].split(",") if name]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="scrape.py 启动时间基准测试")
+    parser.add_argument("--repeat", type=int, default=10, help="每种情况的运行次数 (取中位数)")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET,
+                        help="每种情况允许的额外启动时间 (秒，不含解释器启动)")
+    parser.add_argument("--output", type=str, default=None, help="结果输出文件 (默认打印到标准输出)")
+    args = parser.parse_args()
+
+    env = child_env()
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="scraper-startup-") as work_dir:
+        empty = os.path.join(work_dir, "empty.txt")
+        open(empty, "w").close()
+
+        baseline = statistics.median(run_timed([sys.executable, "-c", "pass"], work_dir, env)
+                                     for _ in range(args.repeat))
+        for name, case in CASES.items():
+            case = [arg.format(empty=empty) for arg in case]
+            seconds = statistics.median(run_timed([sys.executable, SCRAPE] + case, work_dir, env)
+                                        for _ in range(args.repeat))
+            heavy = loaded_heavy_modules(case, work_dir, env)
+            overhead = seconds - baseline
+            results[name] = {
+                "args": case,
+                "seconds": round(seconds, 4),
+                "overhead_seconds": round(overhead, 4),
+                "heavy_modules": heavy,
+                "within_budget": overhead <= args.budget and not heavy,
+            }
+
+    report = {
+        "python": sys.version.split()[0],
+        "repeat": args.repeat,
+        "budget_seconds": args.budget,
+        "interpreter_seconds": round(baseline, 4),
+        "cases": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0 if all(case["within_budget"] for case in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# TikTok 每次请求返回的评论数
+PAGE_SIZE = 20
+
+# 保存真正的 time.sleep (基准测试会替换 time.sleep 以统计休眠时间)
+_real_sleep = time.sleep
+
+# 请求被拒绝时返回的页面 (与 TikTok 的验证码页面一样不是 JSON)
+CAPTCHA_PAGE = b"<html><body><div id=\"captcha-verify-container\"></div></body></html>"
+
+# 签名参数名
+SIGNATURE_PARAM = "X-Bogus"
+
+
+def fake_signature(query):
+    """模拟的 X-Bogus: 对签名参数之前的查询字符串做摘要 (FakeTikTokApi.sign_url 使用同样的算法)"""
+    return hashlib.md5(query.encode("utf-8")).hexdigest()[:24]
+
+
+def split_signature(query):
+    """把查询字符串拆成 (签名之前的部分, 签名)，没有签名时签名为 None"""
+    marker = f"&{SIGNATURE_PARAM}="
+    if marker not in query:
+        return query, None
+    base, signature = query.rsplit(marker, 1)
+    return base, signature
+
+
+class StubTikTokServer:
+    """
+    在本地端口上模拟 TikTok 网页版的评论列表 (/api/comment/list/) 和回复列表 (/api/comment/list/reply/) 接口
+
+    数据来自 synthetic_tiktok_fixture，游标为偏移量。可以模拟固定的网络延迟，
+    以及从第 N 次请求开始返回验证码页面 (用于测试改用浏览器的回退路径)。
+    与 TikTok 一样，没有签名或签名与查询字符串不符的请求得到空响应。
+    """
+
+    def __init__(self, fixture, host="127.0.0.1", port=0, latency=0.0, reject_after=None, require_signature=True):
+        """
+        Args:
+            fixture: synthetic_tiktok_fixture 的返回值
+            host: 监听地址
+            port: 监听端口 (0 表示随机端口)
+            latency: 每次请求的模拟延迟 (秒)
+            reject_after: 成功响应多少次之后开始拒绝请求，为 None 时从不拒绝
+            require_signature: 是否检查 X-Bogus 签名
+        """
+        self.fixture = fixture
+        self.latency = latency
+        self.reject_after = reject_after
+        self.require_signature = require_signature
+        self.requests = {"comment_list": 0, "reply_list": 0, "rejected": 0, "unsigned": 0}
+        self.bytes_sent = 0
+        self._served = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _admit(self):
+        """记录一次请求，返回是否接受 (False 表示应返回验证码页面)"""
+        with self._lock:
+            if self.reject_after is not None and self._served >= self.reject_after:
+                self.requests["rejected"] += 1
+                return False
+            self._served += 1
+            return True
+
+    def _record(self, endpoint, size):
+        with self._lock:
+            self.requests[endpoint] += 1
+            self.bytes_sent += size
+
+    def handle(self, path, params):
+        """返回 (状态码, 接口名称, 响应字典)"""
+        cursor = int(params.get("cursor") or 0)
+        count = int(params.get("count") or PAGE_SIZE)
+        if path.rstrip("/") == "/api/comment/list":
+            items = self.fixture["comments"]
+            endpoint = "comment_list"
+        elif path.rstrip("/") == "/api/comment/list/reply":
+            items = self.fixture["replies"].get(params.get("comment_id"), [])
+            endpoint = "reply_list"
+        else:
+            return 404, None, {"status_code": 404, "status_msg": "not found"}
+        if not params.get("msToken"):
+            return 200, endpoint, {"status_code": 10201, "status_msg": "missing msToken"}
+        page = items[cursor:cursor + count]
+        return 200, endpoint, {
+            "status_code": 0,
+            "comments": page,
+            "cursor": cursor + len(page),
+            "has_more": 1 if cursor + len(page) < len(items) else 0,
+            "total": len(items),
+        }
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # 响应头和正文分两次写出，关闭 Nagle 算法避免每次请求额外等待延迟确认
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {name: values[0] for name, values in parse_qs(url.query).items()}
+                if stub.latency:
+                    _real_sleep(stub.latency)
+                base, signature = split_signature(url.query)
+                if stub.require_signature and signature != fake_signature(base):
+                    with stub._lock:
+                        stub.requests["unsigned"] += 1
+                    status, endpoint, payload = 200, None, b""
+                    content_type = "application/json; charset=UTF-8"
+                elif stub._admit():
+                    status, endpoint, body = stub.handle(url.path, params)
+                    payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                    content_type = "application/json; charset=UTF-8"
+                else:
+                    status, endpoint, payload = 200, None, CAPTCHA_PAGE
+                    content_type = "text/html; charset=UTF-8"
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                if endpoint:
+                    stub._record(endpoint, len(payload))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
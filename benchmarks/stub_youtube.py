@@ -0,0 +1,178 @@
+import gzip
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# commentThreads 响应中每个线程最多内联的回复数 (与 YouTube API 一致)
+INLINE_REPLIES = 5
+
+
+def synthetic_youtube_fixture(threads=2000, video_id="benchVideo1", seed=42):
+    """
+    生成确定性的 YouTube 评论数据
+
+    回复数的分布接近真实视频: 大部分线程没有回复，少量线程有上百条回复。
+
+    Returns:
+        {"video_id": ..., "threads": [线程条目], "replies": {线程ID: [回复条目]}}
+    """
+    rng = random.Random(seed)
+    fixture = {"video_id": video_id, "threads": [], "replies": {}}
+    for i in range(threads):
+        thread_id = f"Ug{i:010d}"
+        roll = rng.random()
+        if roll < 0.70:
+            reply_count = 0
+        elif roll < 0.90:
+            reply_count = rng.randint(1, 5)
+        elif roll < 0.98:
+            reply_count = rng.randint(6, 30)
+        else:
+            reply_count = rng.randint(100, 300)
+        fixture["threads"].append({
+            "id": thread_id,
+            "snippet": {
+                "totalReplyCount": reply_count,
+                "topLevelComment": {
+                    "id": thread_id,
+                    "snippet": {
+                        "textDisplay": _text(rng),
+                        "likeCount": rng.randint(0, 5000),
+                        "publishedAt": f"2024-01-{1 + i % 28:02d}T00:00:00Z",
+                    },
+                },
+            },
+        })
+        if reply_count:
+            fixture["replies"][thread_id] = [
+                {
+                    "id": f"{thread_id}.r{j}",
+                    "snippet": {
+                        "textDisplay": _text(rng),
+                        "likeCount": rng.randint(0, 100),
+                        "parentId": thread_id,
+                        "publishedAt": f"2024-02-{1 + j % 28:02d}T00:00:00Z",
+                    },
+                }
+                for j in range(reply_count)
+            ]
+    return fixture
+
+
+def _text(rng):
+    words = ("great", "video", "thanks", "lol", "this", "is", "so", "good", "why", "the", "music", "我", "喜欢")
+    return " ".join(rng.choice(words) for _ in range(rng.randint(3, 40)))
+
+
+def load_fixture(path):
+    """读取录制的评论数据 (结构同 synthetic_youtube_fixture 的返回值)"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class StubYouTubeServer:
+    """
+    在本地端口上模拟 commentThreads.list、comments.list 和 videos.list
+
+    分页游标为偏移量，支持 gzip 和 HTTP/1.1 长连接，并统计请求数和发送的字节数。
+    """
+
+    def __init__(self, fixture, host="127.0.0.1", port=0):
+        self.fixture = fixture
+        self.requests = {"commentThreads": 0, "comments": 0, "videos": 0}
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def api_base(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/youtube/v3"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _record(self, resource, size):
+        with self._lock:
+            self.requests[resource] = self.requests.get(resource, 0) + 1
+            self.bytes_sent += size
+
+    def handle(self, resource, params):
+        """返回 (状态码, 响应字典)"""
+        fixture = self.fixture
+        offset = int(params.get("pageToken") or 0)
+        page_size = int(params.get("maxResults") or 20)
+        if resource == "commentThreads":
+            if params.get("videoId") != fixture["video_id"]:
+                return 404, {"error": {"errors": [{"reason": "videoNotFound"}], "message": "not found"}}
+            threads = fixture["threads"][offset:offset + page_size]
+            items = []
+            for thread in threads:
+                item = {"id": thread["id"], "snippet": thread["snippet"]}
+                replies = fixture["replies"].get(thread["id"], [])
+                if replies and "replies" in params.get("part", ""):
+                    item["replies"] = {"comments": replies[:INLINE_REPLIES]}
+                items.append(item)
+            response = {"items": items}
+            if offset + page_size < len(fixture["threads"]):
+                response["nextPageToken"] = str(offset + page_size)
+            return 200, response
+        if resource == "comments":
+            replies = fixture["replies"].get(params.get("parentId"), [])
+            response = {"items": replies[offset:offset + page_size]}
+            if offset + page_size < len(replies):
+                response["nextPageToken"] = str(offset + page_size)
+            return 200, response
+        if resource == "videos":
+            total = len(fixture["threads"]) + sum(len(replies) for replies in fixture["replies"].values())
+            items = [
+                {"id": video_id, "statistics": {"commentCount": str(total)}}
+                for video_id in params.get("id", "").split(",") if video_id == fixture["video_id"]
+            ]
+            return 200, {"items": items}
+        return 404, {"error": {"errors": [{"reason": "notFound"}], "message": resource}}
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # 响应头和正文分两次写出，关闭 Nagle 算法避免每次请求额外等待延迟确认
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                resource = url.path.rstrip("/").rsplit("/", 1)[-1]
+                params = {name: values[0] for name, values in parse_qs(url.query).items()}
+                status, body = stub.handle(resource, params)
+                payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=UTF-8")
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    payload = gzip.compress(payload, compresslevel=6)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                stub._record(resource, len(payload))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
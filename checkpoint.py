@@ -0,0 +1,110 @@
+import glob
+import json
+import logging
+import os
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# 检查点文件后缀 (与输出文件放在一起)
+CHECKPOINT_SUFFIX = ".ckpt.json"
+
+
+def checkpoint_path_for(output_path):
+    """返回输出文件对应的检查点文件路径"""
+    return output_path + CHECKPOINT_SUFFIX
+
+
+def save_checkpoint(output_path, platform, video_id, cursor, comment_count, total_comments,
+                    output_offset, completed=False, **extra):
+    """
+    原子地写入检查点 (先写临时文件再替换)
+
+    Args:
+        output_path: 输出文件路径
+        platform: 平台名称 ("tiktok" 或 "youtube")
+        video_id: 视频ID
+        cursor: 继续抓取所需的分页游标 (YouTube 的 nextPageToken 或 TikTok 的 cursor)
+        comment_count: 已写入的主评论数
+        total_comments: 已写入的评论总数 (包含回复)
+        output_offset: 与游标对应的输出文件字节位置，恢复时截断到这里
+        completed: 抓取是否已经完成
+        extra: 其他需要记录的字段
+    """
+    state = {
+        "platform": platform,
+        "video_id": video_id,
+        "output_file": output_path,
+        "cursor": cursor,
+        "comment_count": comment_count,
+        "total_comments": total_comments,
+        "output_offset": output_offset,
+        "completed": completed,
+        "updated_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    state.update(extra)
+
+    path = checkpoint_path_for(output_path)
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.error(f"保存检查点失败: {str(e)}")
+    return state
+
+
+def load_checkpoint(output_path):
+    """读取输出文件对应的检查点，不存在或损坏时返回 None"""
+    path = checkpoint_path_for(output_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"读取检查点失败: {path} ({str(e)})")
+        return None
+
+
+def find_checkpoint(save_dir, platform, video_id):
+    """
+    在保存目录中查找指定视频最近更新的检查点
+
+    Returns:
+        检查点字典，找不到时返回 None
+    """
+    candidates = []
+    for path in glob.glob(os.path.join(save_dir, "*" + CHECKPOINT_SUFFIX)):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except Exception:
+            continue
+        if state.get("platform") == platform and state.get("video_id") == video_id:
+            candidates.append((os.path.getmtime(path), state))
+
+    if not candidates:
+        return None
+    candidates.sort(key=lambda c: c[0])
+    return candidates[-1][1]
+
+
+def truncate_output(output_path, offset):
+    """
+    将输出文件截断到检查点记录的位置
+
+    检查点之后写入的记录属于尚未完成的分页，恢复抓取时会重新获取，截断可避免重复。
+    """
+    if not os.path.exists(output_path):
+        return
+    size = os.path.getsize(output_path)
+    if size > offset:
+        with open(output_path, "r+b") as f:
+            f.truncate(offset)
+        logger.info(f"已截断输出文件中检查点之后的 {size - offset} 字节")
+    elif size < offset:
+        logger.warning(f"输出文件比检查点记录的位置短 ({size} < {offset})，部分已抓取的评论可能丢失")
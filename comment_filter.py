@@ -0,0 +1,140 @@
+"""
+评论关键词过滤
+
+在分页抓取循环中按评论文本过滤，只写出 (计数、保存、入库) 匹配的评论:
+
+- 主评论和回复分别判断；有回复匹配时，不匹配的主评论也作为上下文写出 (不计入 --max-matches)，
+  输出中每条回复的 parent_id 都能找到对应的主评论 (见 comment_stream.select_thread)
+
+- 关键词按字面匹配 (默认不区分大小写)，多个关键词合并为一个按前缀树展开的正则表达式，
+  每条文本只扫描一遍，关键词很多时也不会逐个尝试
+- 也可以直接给出正则表达式，与关键词合并在同一个表达式中
+- skip_unmatched_replies 为 True 时，主评论不匹配的线程不再单独请求回复 (YouTube 内联返回的回复仍会检查)，
+  可以省下大部分回复请求；代价是不匹配的线程下匹配的回复可能被漏掉
+
+过滤器本身不保存状态，批量模式下可以在多个线程/任务之间共享。
+"""
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# 关键词文件中表示正则表达式的前缀
+PATTERN_PREFIX = "re:"
+
+
+def _trie_pattern(words):
+    """
+    把关键词列表转换为前缀树形式的正则表达式
+
+    只需要判断文本中是否出现任一关键词，某个关键词是另一个的前缀时较长的那个可以省略
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node):
+        if "" in node:
+            return ""
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items())]
+        if len(branches) == 1:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")"
+
+    return build(trie) if trie else None
+
+
+def read_keywords_file(path):
+    """
+    读取关键词文件 (每行一个，忽略空行和 # 开头的注释，re: 开头的行是正则表达式)
+
+    Returns:
+        (关键词列表, 正则表达式列表)
+    """
+    keywords = []
+    patterns = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith(PATTERN_PREFIX):
+                patterns.append(line[len(PATTERN_PREFIX):])
+            else:
+                keywords.append(line)
+    return keywords, patterns
+
+
+class CommentFilter:
+    """按关键词和正则表达式匹配评论文本"""
+
+    def __init__(self, keywords=(), patterns=(), ignore_case=True, skip_unmatched_replies=False):
+        """
+        Args:
+            keywords: 关键词列表 (按字面匹配)
+            patterns: 正则表达式列表
+            ignore_case: 是否不区分大小写
+            skip_unmatched_replies: 主评论不匹配时是否跳过该线程的回复请求
+        """
+        keywords = [keyword for keyword in keywords if keyword]
+        if ignore_case:
+            keywords = [keyword.lower() for keyword in keywords]
+        self.keywords = sorted(set(keywords))
+        self.patterns = [pattern for pattern in patterns if pattern]
+        if not self.keywords and not self.patterns:
+            raise ValueError("过滤器至少需要一个关键词或正则表达式")
+        self.ignore_case = ignore_case
+        self.skip_unmatched_replies = skip_unmatched_replies
+
+        parts = [f"(?:{pattern})" for pattern in self.patterns]
+        if self.keywords:
+            parts.insert(0, _trie_pattern(self.keywords))
+        try:
+            self._regex = re.compile("|".join(parts), re.IGNORECASE if ignore_case else 0)
+        except re.error as e:
+            raise ValueError(f"无效的正则表达式: {str(e)}")
+
+    def match(self, text):
+        """文本是否包含任一关键词或匹配任一正则表达式"""
+        return bool(text) and self._regex.search(text) is not None
+
+    def fetch_replies(self, text):
+        """是否需要请求主评论为 text 的线程的回复"""
+        return not self.skip_unmatched_replies or self.match(text)
+
+    def describe(self):
+        parts = []
+        if self.keywords:
+            parts.append(f"{len(self.keywords)} 个关键词")
+        if self.patterns:
+            parts.append(f"{len(self.patterns)} 个正则表达式")
+        return "、".join(parts)
+
+
+def load_comment_filter(keywords=(), patterns=(), keywords_file=None, ignore_case=True,
+                        skip_unmatched_replies=False):
+    """
+    根据命令行参数创建过滤器，没有任何关键词和正则表达式时返回 None
+
+    Args:
+        keywords: 关键词列表
+        patterns: 正则表达式列表
+        keywords_file: 关键词文件路径 (格式见 read_keywords_file)
+        ignore_case: 是否不区分大小写
+        skip_unmatched_replies: 主评论不匹配时是否跳过该线程的回复请求
+    """
+    keywords = list(keywords or ())
+    patterns = list(patterns or ())
+    if keywords_file:
+        file_keywords, file_patterns = read_keywords_file(keywords_file)
+        keywords.extend(file_keywords)
+        patterns.extend(file_patterns)
+    if not keywords and not patterns:
+        return None
+    comment_filter = CommentFilter(keywords, patterns, ignore_case, skip_unmatched_replies)
+    logger.info(f"启用评论过滤: {comment_filter.describe()}"
+                + (" (跳过不匹配线程的回复请求)" if skip_unmatched_replies else ""))
+    return comment_filter
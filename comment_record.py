@@ -0,0 +1,48 @@
+class CommentRecord:
+    """
+    精简的评论记录
+
+    使用 __slots__ 存储，没有每个实例的 __dict__，大量评论驻留内存时占用远小于字典。
+    支持 record["text"] 和 record.get("text") 的读取方式，与原来的字典记录兼容。
+    """
+
+    __slots__ = ("text", "like_count", "platform", "id", "parent_id", "user", "create_time")
+
+    # 为 None 时不写入输出的可选字段
+    OPTIONAL_FIELDS = ("user", "create_time")
+
+    def __init__(self, text, like_count, platform, id=None, parent_id=None, user=None, create_time=None):
+        self.text = text
+        self.like_count = like_count
+        self.platform = platform
+        self.id = id
+        self.parent_id = parent_id
+        self.user = user
+        self.create_time = create_time
+
+    def as_dict(self):
+        """转换为输出文件中的字典格式 (省略为 None 的可选字段)"""
+        data = {
+            "text": self.text,
+            "like_count": self.like_count,
+            "platform": self.platform,
+            "id": self.id,
+            "parent_id": self.parent_id,
+        }
+        for name in self.OPTIONAL_FIELDS:
+            value = getattr(self, name)
+            if value is not None:
+                data[name] = value
+        return data
+
+    def __getitem__(self, name):
+        if name not in self.__slots__:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def get(self, name, default=None):
+        value = getattr(self, name, None) if name in self.__slots__ else None
+        return default if value is None else value
+
+    def __repr__(self):
+        return f"CommentRecord({self.as_dict()!r})"
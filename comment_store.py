@@ -0,0 +1,144 @@
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# 默认数据库路径
+DEFAULT_DB_PATH = os.path.join("data", "comments.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS comments (
+    platform TEXT NOT NULL,
+    comment_id TEXT NOT NULL,
+    video_id TEXT,
+    parent_id TEXT,
+    text TEXT,
+    like_count INTEGER,
+    create_time TEXT,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    PRIMARY KEY (platform, comment_id)
+);
+CREATE INDEX IF NOT EXISTS idx_comments_video ON comments (platform, video_id);
+"""
+
+UPSERT_SQL = """
+INSERT INTO comments (platform, comment_id, video_id, parent_id, text, like_count, create_time, first_seen, last_seen)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (platform, comment_id) DO UPDATE SET
+    text = excluded.text,
+    like_count = excluded.like_count,
+    last_seen = excluded.last_seen
+"""
+
+# 一次 IN 查询最多带多少个参数 (SQLite 默认上限为 999)
+QUERY_CHUNK = 500
+
+
+class CommentStore:
+    """
+    基于 SQLite 的评论存储
+
+    以 (平台, 评论ID) 为主键去重，重复抓取时更新点赞数和最后出现时间，并记录父评论ID。
+    写入先缓存在内存中，调用 flush() 时批量提交，与输出文件的落盘节奏一致。线程安全。
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._pending = []
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def add(self, platform, video_id, record, create_time=None):
+        """
+        缓存一条评论记录 (没有 id 的记录会被忽略)
+
+        Args:
+            platform: 平台名称
+            video_id: 视频ID
+            record: 评论数据 (id, parent_id, text, like_count, create_time)
+            create_time: 记录中没有 create_time 时使用的创建时间
+        """
+        comment_id = record.get("id")
+        if comment_id is None:
+            return
+        now = datetime.now().isoformat(timespec="seconds")
+        row = (
+            platform,
+            str(comment_id),
+            video_id,
+            record.get("parent_id"),
+            record.get("text"),
+            record.get("like_count"),
+            record.get("create_time", create_time),
+            now,
+            now,
+        )
+        with self._lock:
+            self._pending.append(row)
+
+    def flush(self):
+        """提交缓存的记录，返回本次写入的条数"""
+        with self._lock:
+            rows, self._pending = self._pending, []
+            if not rows:
+                return 0
+            try:
+                self._conn.executemany(UPSERT_SQL, rows)
+                self._conn.commit()
+            except Exception as e:
+                logger.error(f"写入评论数据库失败: {str(e)}")
+                self._conn.rollback()
+                return 0
+            return len(rows)
+
+    def known_ids(self, platform, comment_ids):
+        """返回给定ID中已经存储过的ID集合"""
+        comment_ids = [str(comment_id) for comment_id in comment_ids]
+        known = set()
+        with self._lock:
+            for start in range(0, len(comment_ids), QUERY_CHUNK):
+                chunk = comment_ids[start:start + QUERY_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                cursor = self._conn.execute(
+                    f"SELECT comment_id FROM comments WHERE platform = ? AND comment_id IN ({placeholders})",
+                    [platform] + chunk,
+                )
+                known.update(row[0] for row in cursor)
+        return known
+
+    def count(self, platform=None, video_id=None):
+        """统计已存储的评论数"""
+        sql = "SELECT COUNT(*) FROM comments WHERE 1 = 1"
+        params = []
+        if platform:
+            sql += " AND platform = ?"
+            params.append(platform)
+        if video_id:
+            sql += " AND video_id = ?"
+            params.append(video_id)
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()[0]
+
+    def close(self):
+        """提交剩余记录并关闭数据库"""
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
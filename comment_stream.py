@@ -0,0 +1,613 @@
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+import metrics
+from comment_record import CommentRecord
+from config import TIKTOK_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# 统一的评论记录字段
+RECORD_FIELDS = ("platform", "id", "parent_id", "video_id", "text", "like_count", "create_time")
+
+# 抓取全部 TikTok 评论时传给 video.comments() 的数量
+ALL_COMMENTS = 10 ** 9
+
+
+def make_record(platform, comment_id, parent_id, video_id, text, like_count, create_time=None):
+    """生成统一格式的评论记录 (两个平台字段一致，主评论的 parent_id 为 None)"""
+    return {
+        "platform": platform,
+        "id": comment_id,
+        "parent_id": parent_id,
+        "video_id": video_id,
+        "text": text,
+        "like_count": like_count,
+        "create_time": create_time,
+    }
+
+
+class CommentPage:
+    """
+    一页评论
+
+    records 按主评论在前、其回复紧随其后的顺序排列；
+    cursor 为继续抓取下一页所需的游标 (YouTube 的 pageToken 或 TikTok 的 cursor)，没有下一页时为 None。
+    """
+
+    __slots__ = ("records", "cursor")
+
+    def __init__(self, records, cursor):
+        self.records = records
+        self.cursor = cursor
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+
+class CommentThread:
+    """
+    一个评论线程中要输出的评论
+
+    records 为 (CommentRecord, 发布时间) 列表，主评论在前、回复紧随其后，被过滤器排除的评论不在其中；
+    matches 为其中匹配过滤条件的评论数 (没有过滤器时等于 len(records))；
+    reply_count 为获取到的回复数 (过滤前)。
+    """
+
+    __slots__ = ("records", "matches", "reply_count")
+
+    def __init__(self, records, matches, reply_count=0):
+        self.records = records
+        self.matches = matches
+        self.reply_count = reply_count
+
+
+def select_thread(top, replies, comment_filter=None):
+    """
+    按过滤器挑选一个线程中要输出的评论
+
+    主评论和回复分别判断；有回复匹配时，即使主评论不匹配也作为上下文一起输出 (不计入 matches)，
+    输出中的回复总能找到 parent_id 对应的主评论。主评论和回复都不匹配时整个线程不输出。
+
+    Args:
+        top: 主评论的 (CommentRecord, 发布时间)
+        replies: 回复的 (CommentRecord, 发布时间) 列表
+        comment_filter: 可选的 CommentFilter
+
+    Returns:
+        CommentThread
+    """
+    if comment_filter is None:
+        return CommentThread([top] + replies, 1 + len(replies), len(replies))
+    top_matched = comment_filter.match(top[0].text)
+    matched_replies = [entry for entry in replies if comment_filter.match(entry[0].text)]
+    if not top_matched and not matched_replies:
+        return CommentThread([], 0, len(replies))
+    return CommentThread([top] + matched_replies, int(top_matched) + len(matched_replies), len(replies))
+
+
+class ThreadPage:
+    """
+    一页评论线程 (迭代得到 CommentThread)
+
+    cursor 为下一页的游标，没有下一页时为 None；last 为 True 时不会再请求下一页
+    (没有下一页、已达到数量上限或增量模式遇到已存储的评论)。
+    """
+
+    __slots__ = ("threads", "cursor", "last")
+
+    def __init__(self, threads, cursor, last):
+        self.threads = threads
+        self.cursor = cursor
+        self.last = last
+
+    def __iter__(self):
+        return self.threads
+
+
+class YouTubeThreadReader:
+    """
+    逐页读取 YouTube 视频的评论线程 (youtube_comments_scraper.get_comments 和 stream_youtube_pages 共用)
+
+    回复请求和下一页评论线程的预取都提交到有界线程池中并发执行，结果仍按评论线程的原始顺序交付。
+    """
+
+    def __init__(self, video_id, key_pool, limiter=None, count=None, include_replies=True,
+                 sort_by="relevance", reply_workers=None, comment_filter=None, known_ids=None,
+                 max_results=None):
+        """
+        Args:
+            video_id: 视频ID
+            key_pool: ApiKeyPool
+            limiter: 共享的 RateLimiter
+            count: 最多读取的主评论数，为 None 时读取全部
+            include_replies: 是否包含回复
+            sort_by: 排序方式 ('relevance' 或 'time')
+            reply_workers: 并发获取回复的线程数
+            comment_filter: 可选的 CommentFilter
+            known_ids: 增量模式下查询已存储评论ID的函数 (参数为ID列表，返回其中已存储的ID集合)，
+                遇到第一个已存储的评论线程即停止
+            max_results: 每页请求的评论线程数 (默认为 min(100, count))
+        """
+        self.video_id = video_id
+        self.key_pool = key_pool
+        self.limiter = limiter
+        self.count = count
+        self.include_replies = include_replies
+        self.reply_workers = reply_workers
+        self.comment_filter = comment_filter
+        self.known_ids = known_ids
+        if max_results is None:
+            max_results = 100 if count is None else min(100, count)
+        self.comment_kwargs = {
+            'part': 'snippet,replies',  # 同时返回内联回复，回复较少的线程无需额外请求
+            'videoId': video_id,
+            'maxResults': max(1, max_results),  # YouTube API一次最多返回100条
+            'order': sort_by,  # 'relevance' 或 'time'
+            'textFormat': 'plainText'
+        }
+        self.inline_threads = 0  # 直接使用内联回复的线程数
+        self.skipped_threads = 0  # 主评论不匹配而跳过回复请求的线程数
+        self.reached_known = False
+        self.stopped = False
+
+    def stop(self):
+        """停止提交新的回复和翻页请求 (例如写出的评论已经够数)，之后的 pages() 迭代随即结束"""
+        self.stopped = True
+
+    def pages(self, page_token=None):
+        """
+        逐页生成 ThreadPage (同步生成器)
+
+        调用方迭代完当前页的线程之后才会继续读取；生成器关闭时取消尚未开始的请求，避免继续消耗配额。
+        评论线程请求失败时抛出 YouTubeApiError，配额用完时抛出 QuotaExhausted。
+        """
+        import youtube_comments_scraper as scraper
+
+        workers = max(1, self.reply_workers or scraper.REPLY_WORKERS)
+        executor = ThreadPoolExecutor(max_workers=workers)
+        # 回复请求只提前提交到调用方之后 window 个线程，调用方停止时最多浪费这么多个请求
+        window = workers * 2
+        self._pending = []
+        self._next_page = executor.submit(scraper.fetch_comment_threads, self.key_pool, self.comment_kwargs,
+                                          page_token, self.limiter)
+        produced = 0
+        try:
+            while self._next_page is not None and not self.stopped:
+                response = self._next_page.result()
+                self._next_page = None
+                items = response.get('items') or []
+                if not items:
+                    if not produced:
+                        logger.info("该视频没有评论或评论已被禁用")
+                    return
+
+                # 避免超过要求的评论数
+                if self.count is not None:
+                    items = items[:self.count - produced]
+
+                # 增量模式: 从第一个已存储的评论线程开始，之后的评论都已抓取过
+                if self.known_ids is not None and items:
+                    known = self.known_ids([scraper.thread_comment_id(item) for item in items])
+                    for index, item in enumerate(items):
+                        if scraper.thread_comment_id(item) in known:
+                            items = items[:index]
+                            self.reached_known = True
+                            logger.info(f"遇到已存储的评论线程，增量抓取结束 (本页新增 {index} 条主评论)")
+                            break
+                produced += len(items)
+
+                next_page_token = response.get('nextPageToken')
+                has_next = (bool(next_page_token) and (self.count is None or produced < self.count)
+                            and not self.reached_known)
+                yield ThreadPage(self._threads(executor, window, items, next_page_token if has_next else None),
+                                 next_page_token, not has_next)
+                self._pending = [f for f in self._pending if not f.done()]
+        finally:
+            # 取消尚未开始的请求，避免中断后继续消耗配额
+            for future in self._pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def _submit(self, executor, func, *args):
+        future = executor.submit(func, *args)
+        self._pending.append(future)
+        return future
+
+    def _replies_for(self, executor, item):
+        """
+        内联回复已完整的线程直接返回内联数据，其余线程把回复请求提交到线程池
+
+        Returns:
+            回复条目列表、Future 或 None (不需要回复)
+        """
+        import youtube_comments_scraper as scraper
+
+        if not self.include_replies:
+            return None
+        snippet = item.get('snippet', {})
+        total_reply_count = snippet.get('totalReplyCount')
+        if total_reply_count is None:
+            logger.warning(f"评论线程 {item.get('id')} 缺少 totalReplyCount，不获取回复")
+            return None
+        if total_reply_count == 0:
+            return None
+        replies = scraper.get_inline_replies(item)
+        if replies is not None:
+            self.inline_threads += 1
+            return replies
+        if self.comment_filter is not None and not self.comment_filter.fetch_replies(
+                snippet.get('topLevelComment', {}).get('snippet', {}).get('textDisplay')):
+            # 主评论不匹配的线程不再请求回复
+            self.skipped_threads += 1
+            return None
+        return self._submit(executor, scraper.fetch_replies, self.key_pool, item['id'], self.limiter)
+
+    def _threads(self, executor, window, items, next_page_token):
+        """
+        按原始顺序生成一页中的 CommentThread
+
+        回复请求随调用方的进度提前提交 window 个线程；本页的回复请求都提交之后才预取下一页，
+        下一页的请求与本页最后几个线程的回复请求同时进行。每次提交前都检查 stopped。
+        """
+        from youtube_key_pool import QuotaExhausted
+        import youtube_comments_scraper as scraper
+
+        replies_for = {}
+        submitted = 0
+        for index, item in enumerate(items):
+            while submitted < min(index + window, len(items)) and not self.stopped:
+                replies_for[submitted] = self._replies_for(executor, items[submitted])
+                submitted += 1
+                if submitted == len(items) and next_page_token:
+                    self._next_page = self._submit(executor, scraper.fetch_comment_threads, self.key_pool,
+                                                   self.comment_kwargs, next_page_token, self.limiter)
+            if self.stopped:
+                return
+
+            try:
+                comment_info = item['snippet']['topLevelComment']['snippet']
+                top = (CommentRecord(comment_info['textDisplay'], comment_info['likeCount'], "youtube",
+                                     id=scraper.thread_comment_id(item)),
+                       comment_info.get('publishedAt'))
+            except KeyError as e:
+                logger.warning(f"处理评论时出错: {str(e)}")
+                continue
+
+            replies = []
+            try:
+                reply_items = replies_for.pop(index, None) or []
+                if not isinstance(reply_items, list):
+                    reply_items = reply_items.result()
+                for reply_item in reply_items:
+                    reply_info = reply_item['snippet']
+                    replies.append((CommentRecord(reply_info['textDisplay'], reply_info['likeCount'], "youtube",
+                                                  id=reply_item.get('id'),
+                                                  parent_id=reply_info.get('parentId', item['id'])),
+                                    reply_info.get('publishedAt')))
+            except QuotaExhausted:
+                raise
+            except Exception as e:
+                logger.warning(f"获取评论回复时出错: {str(e)}")
+            yield select_thread(top, replies, self.comment_filter)
+
+
+def stream_youtube_pages(video_url, count=None, include_replies=True, sort_by="relevance",
+                         key_pool=None, limiter=None, page_token=None, reply_workers=None,
+                         comment_filter=None):
+    """
+    逐页生成 YouTube 视频的评论 (同步生成器)
+
+    与 get_comments 使用同一个 YouTubeThreadReader：同一页内需要单独请求的回复并发获取，
+    只预取下一页，内存占用与单页大小相关，与视频的评论总数无关。
+
+    Args:
+        video_url: YouTube视频URL或ID
+        count: 最多生成的主评论数，为 None 时抓取全部
+        include_replies: 是否包含回复
+        sort_by: 排序方式 ('relevance' 或 'time')
+        key_pool: 共享的 ApiKeyPool，为 None 时按配置新建
+        limiter: 共享的 RateLimiter
+        page_token: 从指定的分页游标继续
+        reply_workers: 并发获取回复的线程数
+        comment_filter: 可选的 CommentFilter，只生成文本匹配的评论
+
+    Yields:
+        CommentPage
+    """
+    import youtube_comments_scraper as scraper
+    from youtube_key_pool import ApiKeyPool
+
+    video_id = scraper.get_video_id_from_url(video_url)
+    if not scraper.validate_video_id(video_id):
+        raise ValueError(f"无法从URL中提取视频ID: {video_url}")
+    if key_pool is None:
+        key_pool = ApiKeyPool(config.YOUTUBE_API_KEYS, config.YOUTUBE_DAILY_QUOTA)
+
+    reader = YouTubeThreadReader(video_id, key_pool, limiter, count, include_replies, sort_by,
+                                 reply_workers, comment_filter)
+    pages = reader.pages(page_token)
+    try:
+        for page in pages:
+            records = [make_record("youtube", record.id, record.parent_id, video_id, record.text,
+                                   record.like_count, published)
+                       for thread in page for record, published in thread.records]
+            metrics.record_comments("youtube", len(records))
+            yield CommentPage(records, page.cursor)
+    finally:
+        pages.close()
+
+
+def stream_youtube_comments(video_url, **kwargs):
+    """逐条生成 YouTube 视频的评论记录 (参数同 stream_youtube_pages)"""
+    for page in stream_youtube_pages(video_url, **kwargs):
+        yield from page.records
+
+
+async def astream_youtube_pages(video_url, **kwargs):
+    """
+    stream_youtube_pages 的异步版本
+
+    每一页在线程池中获取，不会阻塞事件循环；调用方处理完当前页之前不会请求下一页。
+    """
+    loop = asyncio.get_running_loop()
+    pages = stream_youtube_pages(video_url, **kwargs)
+    done = object()
+    try:
+        while True:
+            page = await loop.run_in_executor(None, next, pages, done)
+            if page is done:
+                return
+            yield page
+    finally:
+        pages.close()
+
+
+async def astream_youtube_comments(video_url, **kwargs):
+    """逐条异步生成 YouTube 视频的评论记录"""
+    async for page in astream_youtube_pages(video_url, **kwargs):
+        for record in page.records:
+            yield record
+
+
+class TikTokThreadReader:
+    """
+    逐个读取 TikTok 视频的评论线程 (tiktok_comments_scraper.get_comments 和 stream_tiktok_pages 共用)
+
+    主评论最多预读 lookahead 条，预读的主评论立即开始获取回复 (并发数由 reply_concurrency 限制)，
+    线程按原始顺序交付。
+    """
+
+    def __init__(self, video, session_kwargs, throttle, count=None, include_replies=True,
+                 reply_concurrency=4, lookahead=TIKTOK_PAGE_SIZE, include_user_info=False,
+                 include_create_time=False, comment_filter=None, debug_mode=False):
+        """
+        Args:
+            video: TikTokApi 的视频对象 (或 tiktok_http.HttpVideo)
+            session_kwargs: 评论和回复请求使用的会话参数
+            throttle: AsyncThrottle 节流器
+            count: 最多读取的主评论数，为 None 时读取全部
+            include_replies: 是否包含回复
+            reply_concurrency: 同时获取回复的评论数量
+            lookahead: 最多预读 (并提前获取回复) 的主评论数
+            include_user_info: 记录中是否包含用户信息
+            include_create_time: 记录中是否包含评论创建时间
+            comment_filter: 可选的 CommentFilter
+            debug_mode: 是否输出第一条评论和回复的详细信息
+        """
+        self.video = video
+        self.session_kwargs = session_kwargs
+        self.throttle = throttle
+        self.count = count
+        self.include_replies = include_replies
+        self.lookahead = max(1, lookahead)
+        self.include_user_info = include_user_info
+        self.include_create_time = include_create_time
+        self.comment_filter = comment_filter
+        self.debug_mode = debug_mode
+        self.reply_semaphore = asyncio.Semaphore(max(1, reply_concurrency))
+        self.consumed = 0  # 已交付的主评论数
+        self.exhausted = False  # 是否已读完全部评论 (交付最后一个线程之前设置)
+        self.skipped_threads = 0  # 主评论不匹配而跳过回复请求的线程数
+        self.stopped = False
+
+    def stop(self):
+        """不再读取评论和提交回复请求 (例如写出的评论已经够数)，之后的 threads() 迭代随即结束"""
+        self.stopped = True
+
+    def build_record(self, obj, parent_id=None):
+        """将评论或回复对象转换为 (CommentRecord, 创建时间)"""
+        from tiktok_fields import extractor
+
+        # 字段路径按对象类型解析一次并缓存，之后每条评论只需几次字典查找
+        fields = extractor.extract(obj)
+        record = CommentRecord(fields["text"], fields["like_count"], "tiktok", id=fields["id"],
+                               parent_id=parent_id)
+        if self.include_user_info:
+            record.user = fields["user"]
+        if self.include_create_time:
+            record.create_time = fields["create_time"]
+        return record, fields["create_time"]
+
+    async def threads(self, cursor=0):
+        """
+        逐个生成 CommentThread (异步生成器)
+
+        consumed 为已交付的主评论数，从 cursor + consumed 继续即可接着读取；
+        生成器关闭时取消预读主评论尚未完成的回复请求。
+
+        Args:
+            cursor: 从指定的评论游标继续
+        """
+        # TikTokApi 默认只返回 20 条评论，抓取全部时传入一个足够大的数量
+        comments_kwargs = {"count": ALL_COMMENTS if self.count is None else self.count, **self.session_kwargs}
+        if cursor:
+            comments_kwargs["cursor"] = cursor
+
+        queue = deque()  # 预读的 (主评论, 获取回复的任务)
+        read = 0
+        limited = False
+        try:
+            async for comment in metrics.timed_aiter(self.video.comments(**comments_kwargs), "tiktok", "comments"):
+                # 每收到一页主评论报告一次正常响应，并按整页的预算等待，之后才会请求下一页
+                if read % TIKTOK_PAGE_SIZE == 0:
+                    self.throttle.on_success()
+                    await self.throttle.wait("comment", TIKTOK_PAGE_SIZE)
+                queue.append((comment, asyncio.ensure_future(self._fetch_replies(comment, read == 0))))
+                read += 1
+                if self.count is not None and read >= self.count:
+                    limited = True
+                    break
+                while len(queue) >= self.lookahead:
+                    yield await self._next_thread(queue)
+                    if self.stopped:
+                        return
+            self.exhausted = not limited
+            while queue:
+                yield await self._next_thread(queue)
+                if self.stopped:
+                    return
+            if not read and not cursor:
+                # 第一页就是空页: 视频没有评论，或者请求被 TikTok 限制
+                logger.warning("没有获取到任何评论 (视频没有评论或请求被限制)")
+                self.throttle.on_throttle("empty_page")
+        finally:
+            # 取消尚未交付的线程的回复请求，避免停止后继续请求
+            tasks = [task for _, task in queue]
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _next_thread(self, queue):
+        """等待最早预读的主评论的回复，组成 CommentThread"""
+        comment, task = queue[0]
+        replies = await task
+        queue.popleft()
+        first = self.consumed == 0
+        self.consumed += 1
+        try:
+            if self.debug_mode and first:
+                self._debug_comment(comment)
+            return select_thread(self.build_record(comment), replies, self.comment_filter)
+        except Exception as e:
+            logger.warning(f"处理评论时出错: {str(e)}")
+            return CommentThread([], 0, len(replies))
+
+    async def _fetch_replies(self, comment, debug_first=False):
+        """获取一条评论的全部回复，多条评论的回复可以并发获取"""
+        from tiktok_fields import extractor
+        from tiktok_session_pool import is_challenge_error
+
+        replies = []
+        if not (self.include_replies and (extractor.get(comment, "reply_count") or 0) > 0):
+            return replies
+        if self.comment_filter is not None and not self.comment_filter.fetch_replies(extractor.get(comment, "text")):
+            # 主评论不匹配的线程不再请求回复
+            self.skipped_threads += 1
+            return replies
+
+        parent_id = extractor.get(comment, "id")
+        async with self.reply_semaphore:
+            try:
+                # 回复之前按回复请求的预算等待
+                await self.throttle.wait("reply")
+                async for reply in metrics.timed_aiter(comment.replies(**self.session_kwargs), "tiktok", "replies"):
+                    if self.debug_mode and debug_first and not replies:
+                        from tiktok_comments_scraper import debug_object
+                        debug_object(reply, "第一条回复")
+                    replies.append(self.build_record(reply, parent_id))
+            except Exception as e:
+                logger.warning(f"获取评论回复时出错: {str(e)}")
+                if is_challenge_error(e):
+                    self.throttle.on_throttle("captcha")
+                return replies
+        if replies:
+            self.throttle.on_success()
+        else:
+            # 回复数包含已删除、隐藏或地区限制的回复，有回复数却拿到空页很常见，不作为限流信号
+            logger.debug(f"评论 {parent_id} 的回复数大于 0，但没有获取到回复")
+        return replies
+
+    @staticmethod
+    def _debug_comment(comment):
+        """输出第一条评论的详细信息以帮助分析"""
+        import json
+        from tiktok_comments_scraper import debug_object
+
+        debug_object(comment, "第一条评论")
+        if hasattr(comment, 'as_dict'):
+            try:
+                logger.debug(f"评论的as_dict()输出: {json.dumps(comment.as_dict(), indent=2)}")
+            except Exception as e:
+                logger.debug(f"无法将评论转为字典: {str(e)}")
+
+
+async def stream_tiktok_pages(video_url, count=None, include_replies=True, pool=None, throttle=None,
+                              reply_concurrency=4, cursor=0, page_size=TIKTOK_PAGE_SIZE, http_mode=False,
+                              comment_filter=None, **pool_kwargs):
+    """
+    逐页生成 TikTok 视频的评论 (异步生成器)
+
+    与 get_comments 使用同一个 TikTokThreadReader：最多预读 page_size 条主评论并提前获取它们的回复，
+    每攒够 page_size 个线程交付一页；调用方取走当前页之前不会继续请求评论，内存占用与单页大小相关。
+
+    Args:
+        video_url: TikTok 视频 URL
+        count: 最多生成的主评论数，为 None 时抓取全部
+        include_replies: 是否包含回复
+        pool: 共享的 TikTokSessionPool，为 None 时临时创建一个单会话的会话池
+        throttle: AsyncThrottle 节流器，为 None 时使用 TikTok 默认配置
+        reply_concurrency: 同时获取回复的评论数量
+        cursor: 从指定的评论游标继续
+        page_size: 每页的主评论数
+        http_mode: 是否直接通过 HTTP 分页请求评论和回复 (被拒绝时改用浏览器)
+        comment_filter: 可选的 CommentFilter，只生成文本匹配的评论
+        pool_kwargs: 临时创建会话池时的参数 (ms_tokens, headless, browser_type 等)
+
+    Yields:
+        CommentPage
+    """
+    # 只有使用 TikTok 时才导入 TikTokApi
+    from rate_limiter import AsyncThrottle
+    from tiktok_comments_scraper import get_video_id_from_url, use_http_video
+    from tiktok_session_pool import lease_session
+
+    if throttle is None:
+        throttle = AsyncThrottle.for_tiktok()
+    video_id = get_video_id_from_url(video_url) or video_url
+
+    async with lease_session(pool, num_sessions=1, **pool_kwargs) as lease:
+        video = lease.api.video(url=video_url)
+        if http_mode:
+            video = await use_http_video(lease, video, video_id)
+        reader = TikTokThreadReader(video, lease.request_kwargs, throttle, count, include_replies,
+                                    reply_concurrency, page_size, comment_filter=comment_filter)
+
+        def build_page(threads, next_cursor):
+            records = [make_record("tiktok", record.id, record.parent_id, video_id, record.text,
+                                   record.like_count, create_time)
+                       for thread in threads for record, create_time in thread.records]
+            lease.record(len(records))
+            metrics.record_comments("tiktok", len(records))
+            return CommentPage(records, next_cursor)
+
+        threads = reader.threads(cursor)
+        batch = []
+        try:
+            async for thread in threads:
+                batch.append(thread)
+                if len(batch) >= page_size:
+                    yield build_page(batch, cursor + reader.consumed)
+                    batch = []
+        finally:
+            await threads.aclose()
+        if batch:
+            # 已读完全部评论时最后一页的游标为 None
+            yield build_page(batch, None if reader.exhausted else cursor + reader.consumed)
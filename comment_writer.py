@@ -0,0 +1,372 @@
+import json
+import logging
+import os
+import time
+
+import metrics
+from comment_record import CommentRecord
+from thread_index import ThreadIndexWriter
+
+# 列式输出是可选功能，只有使用 parquet/arrow 格式时才导入 pyarrow (导入需要较长时间)
+pa = None
+pq = None
+
+logger = logging.getLogger(__name__)
+
+# 支持的输出格式及对应的文件扩展名 (压缩分片格式为清单文件的扩展名，见 shard_writer.py)
+OUTPUT_FORMATS = {"jsonl": ".jsonl", "parquet": ".parquet", "arrow": ".arrow",
+                  "jsonl.gz": ".manifest.json", "jsonl.zst": ".manifest.json"}
+
+# 压缩分片格式对应的压缩方式
+SHARD_FORMATS = {"jsonl.gz": "gzip", "jsonl.zst": "zstd"}
+
+# platform 列的固定字典 (Arrow IPC 文件要求所有 record batch 使用同一个字典)
+PLATFORMS = ("tiktok", "youtube")
+
+# 列式输出每个 row group (record batch) 至少包含的行数，避免产生过多的小 row group
+ROW_GROUP_ROWS = 1000
+
+
+def load_pyarrow():
+    """按需导入 pyarrow，未安装时返回 False"""
+    global pa, pq
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            return False
+        pa, pq = pyarrow, pyarrow.parquet
+    return True
+
+
+def jsonl_path_for(file_path):
+    """根据输出文件名得到对应的 JSON Lines 文件路径 (.json -> .jsonl)"""
+    root, ext = os.path.splitext(file_path)
+    if ext == ".jsonl":
+        return file_path
+    if ext == ".json":
+        return root + ".jsonl"
+    return file_path + ".jsonl"
+
+
+def output_path_for(file_path, output_format="jsonl"):
+    """根据输出文件名和输出格式得到实际的输出文件路径"""
+    if output_format == "jsonl":
+        return jsonl_path_for(file_path)
+    suffix = OUTPUT_FORMATS[output_format]
+    if file_path.endswith(suffix):
+        return file_path
+    root, ext = os.path.splitext(file_path)
+    if ext in (".json", ".jsonl"):
+        file_path = root
+    return file_path + suffix
+
+
+def pretty_json_path_for(file_path):
+    """根据 JSON Lines 文件路径得到最终美化 JSON 的路径 (.jsonl -> .json)"""
+    root, ext = os.path.splitext(file_path)
+    if ext == ".jsonl":
+        return root + ".json"
+    return file_path + ".json"
+
+
+class JsonlCommentWriter:
+    """
+    以追加方式逐条写入评论的 JSON Lines 写入器
+
+    每条评论序列化为一行，写入成本与评论数量成线性关系；
+    调用 flush() 时才执行 fsync，由调用方决定批量落盘的频率。
+    进程崩溃时最多丢失最后一批未 fsync 的记录，最后一行若被截断，读取时会被跳过。
+    同时生成线程索引 (见 thread_index.py)，调用方需要先写主评论、紧接着写它的回复。
+    """
+
+    def __init__(self, file_path, append=False, fsync=True, thread_index=True):
+        """
+        Args:
+            file_path: 输出文件路径 (.jsonl)
+            append: 是否追加到已有文件 (否则清空重写)
+            fsync: flush() 时是否调用 os.fsync 强制落盘
+            thread_index: 是否生成线程索引 (file_path + ".tidx")
+        """
+        self.file_path = file_path
+        self.fsync = fsync
+        self.count = 0  # 本次写入的记录数
+        self.pending = 0  # 上次 flush 之后写入的记录数
+        self.serialize_seconds = 0.0  # 上次 flush 之后序列化花费的时间
+
+        file_dir = os.path.dirname(file_path)
+        if file_dir:
+            os.makedirs(file_dir, exist_ok=True)
+
+        self._file = open(file_path, "ab" if append else "wb")
+        self._position = self._file.tell()  # 下一行的起始位置，避免每条记录都调用 tell()
+        self.thread_index = ThreadIndexWriter(file_path, append=append, fsync=fsync) if thread_index else None
+
+    @property
+    def closed(self):
+        """文件是否已关闭"""
+        return self._file.closed
+
+    @property
+    def offset(self):
+        """当前文件写入位置 (字节)"""
+        return self._file.tell()
+
+    def write(self, record):
+        """写入一条评论记录 (字典或 CommentRecord)"""
+        started = time.perf_counter()
+        if isinstance(record, CommentRecord):
+            record = record.as_dict()
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+        self._file.write(line)
+        if self.thread_index is not None:
+            self.thread_index.add(record, self._position, len(line))
+        self._position += len(line)
+        self.serialize_seconds += time.perf_counter() - started
+        self.count += 1
+        self.pending += 1
+
+    def write_many(self, records):
+        """写入多条评论记录"""
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        """将缓冲区写入磁盘，返回本次落盘的记录数"""
+        flushed = self.pending
+        started = time.perf_counter()
+        self._file.flush()
+        if self.fsync and flushed:
+            os.fsync(self._file.fileno())
+        # 索引只记录已落盘的线程
+        if self.thread_index is not None:
+            self.thread_index.flush()
+        # 序列化时间按批汇总到指标，避免每条评论都加锁
+        metrics.record_phase("io", time.perf_counter() - started)
+        metrics.record_phase("serialize", self.serialize_seconds)
+        self.serialize_seconds = 0.0
+        self.pending = 0
+        return flushed
+
+    def close(self):
+        """刷新并关闭文件"""
+        if self._file.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._file.close()
+            if self.thread_index is not None:
+                self.thread_index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ColumnarCommentWriter:
+    """
+    以 Parquet 或 Arrow IPC 格式写入评论的列式写入器
+
+    评论先追加到按列组织的缓冲区中，flush() 时把缓冲的行写成一个 row group
+    (Arrow 格式为一个 record batch)。platform 列使用字典编码，like_count 为 int64。
+    文件尾部的元数据在 close() 时写入，因此不支持追加写入和断点续抓。
+    """
+
+    def __init__(self, file_path, output_format="parquet", row_group_rows=ROW_GROUP_ROWS):
+        """
+        Args:
+            file_path: 输出文件路径 (.parquet 或 .arrow)
+            output_format: "parquet" 或 "arrow"
+            row_group_rows: 每个 row group 至少包含的行数，不足时 flush() 继续缓冲
+        """
+        if not load_pyarrow():
+            raise RuntimeError("输出 parquet/arrow 格式需要安装 pyarrow: pip install pyarrow")
+        if output_format not in ("parquet", "arrow"):
+            raise ValueError(f"不支持的列式输出格式: {output_format}")
+
+        self.file_path = file_path
+        self.output_format = output_format
+        self.row_group_rows = row_group_rows
+        self.count = 0  # 本次写入的记录数
+        self.pending = 0  # 缓冲区中尚未写出的记录数
+        self.row_groups = 0
+        self.serialize_seconds = 0.0  # 上次写出 row group 之后缓冲记录花费的时间
+        self._closed = False
+
+        file_dir = os.path.dirname(file_path)
+        if file_dir:
+            os.makedirs(file_dir, exist_ok=True)
+
+        self.schema = pa.schema([
+            ("platform", pa.dictionary(pa.int8(), pa.string())),
+            ("id", pa.string()),
+            ("parent_id", pa.string()),
+            ("text", pa.string()),
+            ("like_count", pa.int64()),
+            ("create_time", pa.string()),
+            ("user", pa.string()),
+        ])
+        if output_format == "parquet":
+            self._writer = pq.ParquetWriter(file_path, self.schema, use_dictionary=["platform"],
+                                            compression="zstd")
+        else:
+            self._sink = pa.OSFile(file_path, "wb")
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+        self._platforms = pa.array(PLATFORMS, type=pa.string())
+        self._columns = {name: [] for name in self.schema.names}
+
+    @property
+    def closed(self):
+        return self._closed
+
+    @property
+    def offset(self):
+        """列式文件不支持按字节位置截断，始终返回 None"""
+        return None
+
+    def write(self, record):
+        """写入一条评论记录 (字典或 CommentRecord)"""
+        started = time.perf_counter()
+        columns = self._columns
+        columns["platform"].append(record.get("platform"))
+        columns["id"].append(_optional_str(record.get("id")))
+        columns["parent_id"].append(_optional_str(record.get("parent_id")))
+        columns["text"].append(record.get("text"))
+        columns["like_count"].append(_optional_int(record.get("like_count")))
+        columns["create_time"].append(_optional_str(record.get("create_time")))
+        columns["user"].append(record.get("user"))
+        self.serialize_seconds += time.perf_counter() - started
+        self.count += 1
+        self.pending += 1
+
+    def write_many(self, records):
+        """写入多条评论记录"""
+        for record in records:
+            self.write(record)
+
+    def _write_batch(self):
+        started = time.perf_counter()
+        arrays = []
+        for field in self.schema:
+            values = self._columns[field.name]
+            if pa.types.is_dictionary(field.type):
+                indices = pa.array([PLATFORMS.index(value) for value in values], type=pa.int8())
+                arrays.append(pa.DictionaryArray.from_arrays(indices, self._platforms))
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        self._writer.write_batch(pa.record_batch(arrays, schema=self.schema))
+        self._columns = {name: [] for name in self.schema.names}
+        self.row_groups += 1
+        # 构建列数组和编码压缩都计为序列化时间
+        metrics.record_phase("serialize", self.serialize_seconds + time.perf_counter() - started)
+        self.serialize_seconds = 0.0
+
+    def flush(self, force=False):
+        """
+        把缓冲区写成一个 row group，返回本次写出的记录数
+
+        Args:
+            force: 缓冲的行数不足 row_group_rows 时是否也写出
+        """
+        flushed = self.pending
+        if not flushed or (flushed < self.row_group_rows and not force):
+            return 0
+        self._write_batch()
+        self.pending = 0
+        return flushed
+
+    def close(self):
+        """写出剩余的记录和文件尾部元数据"""
+        if self._closed:
+            return
+        try:
+            self.flush(force=True)
+        finally:
+            self._writer.close()
+            if self.output_format == "arrow":
+                self._sink.close()
+            self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _optional_str(value):
+    return None if value is None else str(value)
+
+
+def _optional_int(value):
+    try:
+        return None if value is None else int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def open_comment_writer(file_path, output_format="jsonl", append=False, shard_size=None, shard_records=None):
+    """
+    按输出格式创建评论写入器
+
+    Args:
+        file_path: 输出文件路径
+        output_format: OUTPUT_FORMATS 中的格式
+        append: 是否追加到已有文件 (只有 jsonl 支持)
+        shard_size: 压缩分片格式每个分片压缩后的大小上限 (字节)，为 None 时使用默认值
+        shard_records: 压缩分片格式每个分片的记录数上限，为 None 时不限
+    """
+    if output_format == "jsonl":
+        return JsonlCommentWriter(file_path, append=append)
+    if append:
+        raise ValueError(f"{output_format} 格式不支持追加写入")
+    if output_format in SHARD_FORMATS:
+        from shard_writer import SHARD_BYTES, ShardedCommentWriter
+
+        return ShardedCommentWriter(file_path, SHARD_FORMATS[output_format],
+                                    max_bytes=shard_size or SHARD_BYTES, max_records=shard_records)
+    return ColumnarCommentWriter(file_path, output_format)
+
+
+def read_jsonl(file_path):
+    """逐条读取 JSON Lines 文件中的评论，跳过空行和被截断的行"""
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"跳过无法解析的行 {file_path}:{line_no}")
+
+
+def export_pretty_json(jsonl_path, json_path=None):
+    """
+    将 JSON Lines 文件转换为带缩进的 JSON 数组文件
+
+    逐条流式写出，不会把整个文件读入内存。先写临时文件再原子替换，
+    避免导出中断时留下半个 JSON 文件。
+
+    Returns:
+        (json_path, 导出的评论数)
+    """
+    if json_path is None:
+        json_path = pretty_json_path_for(jsonl_path)
+
+    tmp_path = json_path + ".tmp"
+    exported = 0
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        out.write("[")
+        for record in read_jsonl(jsonl_path):
+            out.write(",\n  " if exported else "\n  ")
+            body = json.dumps(record, ensure_ascii=False, indent=2)
+            out.write(body.replace("\n", "\n  "))
+            exported += 1
+        out.write("\n]\n" if exported else "]\n")
+    os.replace(tmp_path, json_path)
+    return json_path, exported
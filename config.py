@@ -1,7 +1,56 @@
-from dotenv import load_dotenv
 import os
+from functools import lru_cache
 
-load_dotenv()
+# TikTok 每次请求返回的评论数 (网页版接口固定为 20，节流、分页和请求计时都按此计算)
+TIKTOK_PAGE_SIZE = 20
 
-YOUTUBE_API_KEY = os.environ.get("YOUTUBE_API_KEY")
-TIKTOK_MS_TOKEN = os.environ.get("TIKTOK_MS_TOKEN")
+# 可以通过 config.<名称> 读取的配置项
+CONFIG_NAMES = ("YOUTUBE_API_KEY", "YOUTUBE_API_KEYS", "YOUTUBE_DAILY_QUOTA", "TIKTOK_MS_TOKEN", "TIKTOK_MS_TOKENS")
+
+
+def _split_list(value):
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+@lru_cache(maxsize=None)
+def load_config():
+    """
+    读取 .env 文件和环境变量
+
+    只在第一次访问配置项时读取一次，之后使用缓存的结果，
+    导入模块本身 (以及查看帮助等不需要密钥的操作) 不会读取 .env 文件。
+
+    Returns:
+        {配置项名称: 值}
+    """
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    youtube_api_key = os.environ.get("YOUTUBE_API_KEY")
+    # 密钥池使用的多个 YouTube API 密钥 (逗号分隔)，未设置时使用 YOUTUBE_API_KEY
+    youtube_api_keys = _split_list(os.environ.get("YOUTUBE_API_KEYS"))
+    if not youtube_api_keys and youtube_api_key:
+        youtube_api_keys = [youtube_api_key]
+
+    tiktok_ms_token = os.environ.get("TIKTOK_MS_TOKEN")
+    # 会话池使用的多个 ms_token (逗号分隔)，未设置时使用 TIKTOK_MS_TOKEN
+    tiktok_ms_tokens = _split_list(os.environ.get("TIKTOK_MS_TOKENS"))
+    if not tiktok_ms_tokens and tiktok_ms_token:
+        tiktok_ms_tokens = [tiktok_ms_token]
+
+    return {
+        "YOUTUBE_API_KEY": youtube_api_key,
+        "YOUTUBE_API_KEYS": youtube_api_keys,
+        # 每个 YouTube API 密钥的每日配额
+        "YOUTUBE_DAILY_QUOTA": int(os.environ.get("YOUTUBE_DAILY_QUOTA", "10000")),
+        "TIKTOK_MS_TOKEN": tiktok_ms_token,
+        "TIKTOK_MS_TOKENS": tiktok_ms_tokens,
+    }
+
+
+def __getattr__(name):
+    # 兼容 from config import YOUTUBE_API_KEYS 等写法，访问时才读取配置
+    if name in CONFIG_NAMES:
+        return load_config()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
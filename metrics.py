@@ -0,0 +1,352 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from config import TIKTOK_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# 请求延迟直方图的桶上界 (秒)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# JSON 指标文件的默认写入间隔 (秒)
+METRICS_INTERVAL = 10.0
+
+# 指标名 -> (类型, 说明)
+METRICS = {
+    "scraper_request_seconds": ("histogram", "API 请求延迟 (按平台和接口)"),
+    "scraper_requests_total": ("counter", "API 请求数 (按平台、接口和结果)"),
+    "scraper_retries_total": ("counter", "网络错误后的重试次数"),
+    "scraper_sleep_seconds_total": ("counter", "主动休眠的秒数 (按平台和原因)"),
+    "scraper_throttled_total": ("counter", "收到的限流信号数 (按平台和原因)"),
+    "scraper_phase_seconds_total": ("counter", "各阶段耗时 (network/sleep/serialize/io)"),
+    "scraper_bytes_received_total": ("counter", "接收的响应字节数 (压缩后)"),
+    "scraper_comments_total": ("counter", "写出的评论数 (包含回复)"),
+    "youtube_quota_units_total": ("counter", "消耗的 YouTube API 配额单位 (按方法)"),
+    "tiktok_http_rejections_total": ("counter", "直接 HTTP 请求被拒绝的次数 (按接口)"),
+    "scraper_comments_per_second": ("gauge", "自进程启动以来的平均评论速度"),
+}
+
+
+class MetricsRegistry:
+    """
+    线程安全的进程内指标注册表
+
+    计数器和直方图都以 (指标名, 标签) 为键，标签为排序后的 (名称, 值) 元组。
+    可渲染为 Prometheus 文本格式，或导出为 JSON 快照。
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._counters = {}  # (指标名, 标签) -> 值
+        self._histograms = {}  # (指标名, 标签) -> [各桶计数, 总和, 次数]
+
+    def inc(self, name, value=1, **labels):
+        """计数器加上 value"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """在直方图中记录一次观测值"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def reset(self):
+        """清空所有指标"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.started = time.time()
+
+    def total(self, name, **labels):
+        """计数器中标签匹配的所有值之和"""
+        wanted = set(labels.items())
+        with self._lock:
+            return sum(value for (metric, key), value in self._counters.items()
+                       if metric == name and wanted <= set(key))
+
+    def comments_per_second(self):
+        """每个平台自启动以来的平均评论速度"""
+        elapsed = max(time.time() - self.started, 1e-9)
+        with self._lock:
+            rates = {}
+            for (metric, key), value in self._counters.items():
+                if metric == "scraper_comments_total":
+                    platform = dict(key).get("platform", "")
+                    rates[platform] = rates.get(platform, 0) + value
+        return {platform: value / elapsed for platform, value in rates.items()}
+
+    def snapshot(self):
+        """导出全部指标为可 JSON 序列化的字典"""
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = [
+                {"name": name, "labels": dict(labels), "buckets": dict(zip(map(str, self.buckets), counts)),
+                 "sum": round(total, 6), "count": count}
+                for (name, labels), (counts, total, count) in sorted(self._histograms.items())
+            ]
+        return {
+            "timestamp": time.time(),
+            "uptime_seconds": round(time.time() - self.started, 3),
+            "comments_per_second": {platform: round(rate, 2) for platform, rate in self.comments_per_second().items()},
+            "counters": counters,
+            "histograms": histograms,
+        }
+
+    def render_prometheus(self):
+        """渲染为 Prometheus 文本格式"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(counts), total, count))
+                                for key, (counts, total, count) in self._histograms.items())
+        lines = []
+        described = set()
+
+        def describe(name):
+            if name in described:
+                return
+            described.add(name)
+            metric_type, help_text = METRICS.get(name, ("untyped", name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+        for (name, labels), value in counters:
+            describe(name)
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), (counts, total, count) in histograms:
+            describe(name)
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} {bucket_count}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        for platform, rate in sorted(self.comments_per_second().items()):
+            describe("scraper_comments_per_second")
+            lines.append(f"scraper_comments_per_second{_format_labels((('platform', platform),))} {_format_value(rate)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+# 进程内共享的指标
+registry = MetricsRegistry()
+
+
+def observe_request(platform, endpoint, seconds, status="ok"):
+    """记录一次 API 请求的延迟和结果"""
+    registry.observe("scraper_request_seconds", seconds, platform=platform, endpoint=endpoint)
+    registry.inc("scraper_requests_total", platform=platform, endpoint=endpoint, status=status)
+    registry.inc("scraper_phase_seconds_total", seconds, phase="network")
+
+
+def record_sleep(platform, reason, seconds):
+    """记录一次主动休眠 (随机休息、限速等待、退避)"""
+    if seconds <= 0:
+        return
+    registry.inc("scraper_sleep_seconds_total", seconds, platform=platform, reason=reason)
+    registry.inc("scraper_phase_seconds_total", seconds, phase="sleep")
+
+
+def record_retry(platform, endpoint):
+    registry.inc("scraper_retries_total", platform=platform, endpoint=endpoint)
+
+
+def record_phase(phase, seconds):
+    """记录某个阶段的耗时 (serialize: 序列化评论, io: 落盘)"""
+    if seconds > 0:
+        registry.inc("scraper_phase_seconds_total", seconds, phase=phase)
+
+
+def record_bytes(platform, size):
+    registry.inc("scraper_bytes_received_total", size, platform=platform)
+
+
+def record_comments(platform, count):
+    """记录写出的评论数 (由爬虫按页汇总后调用，避免每条评论都加锁)"""
+    if count > 0:
+        registry.inc("scraper_comments_total", count, platform=platform)
+
+
+def record_quota(method, units):
+    registry.inc("youtube_quota_units_total", units, method=method)
+
+
+async def timed_aiter(aiterable, platform, endpoint, page_size=TIKTOK_PAGE_SIZE):
+    """
+    包装按页请求的异步迭代器 (如 TikTokApi 的 video.comments())，按页记录请求延迟
+
+    迭代器每次翻页时才真正发出请求，因此把每 page_size 条数据的等待时间之和记为一次请求。
+
+    Args:
+        aiterable: 异步可迭代对象
+        platform: 平台名称
+        endpoint: 接口名称 (如 "comments"、"replies")
+        page_size: 每页的条数
+    """
+    iterator = aiterable.__aiter__()
+    waited = 0.0
+    items = 0
+    while True:
+        started = time.perf_counter()
+        try:
+            item = await iterator.__anext__()
+        except StopAsyncIteration:
+            if items:
+                observe_request(platform, endpoint, waited + time.perf_counter() - started)
+            return
+        waited += time.perf_counter() - started
+        items += 1
+        if items >= page_size:
+            observe_request(platform, endpoint, waited)
+            waited, items = 0.0, 0
+        yield item
+
+
+def summary(metrics_registry=None):
+    """一行文字概括各阶段耗时和请求数 (抓取结束时写入日志)"""
+    metrics_registry = metrics_registry or registry
+    phases = {phase: metrics_registry.total("scraper_phase_seconds_total", phase=phase)
+              for phase in ("network", "sleep", "serialize", "io")}
+    requests = metrics_registry.total("scraper_requests_total")
+    retries = metrics_registry.total("scraper_retries_total")
+    quota = metrics_registry.total("youtube_quota_units_total")
+    return (f"请求 {requests} 次 (重试 {retries} 次, 配额 {quota} 单位), 网络 {phases['network']:.1f} 秒, "
+            f"休眠 {phases['sleep']:.1f} 秒, 序列化 {phases['serialize']:.2f} 秒, 落盘 {phases['io']:.2f} 秒")
+
+
+class MetricsExporter:
+    """
+    指标导出器
+
+    可以定期把 JSON 快照原子地写入文件，并/或在本地端口上提供 Prometheus 文本格式
+    (GET /metrics) 和 JSON 格式 (GET /metrics.json) 的指标。两者都在后台守护线程中运行。
+    """
+
+    def __init__(self, file_path=None, port=None, interval=METRICS_INTERVAL, host="127.0.0.1",
+                 metrics_registry=None):
+        """
+        Args:
+            file_path: JSON 指标文件路径，为 None 时不写文件
+            port: HTTP 端口，为 None 时不启动 HTTP 服务 (0 表示随机端口)
+            interval: 写入 JSON 文件的间隔 (秒)
+            host: HTTP 服务监听的地址
+            metrics_registry: 导出的 MetricsRegistry，默认为进程内共享的 registry
+        """
+        self.file_path = file_path
+        self.port = port
+        self.interval = interval
+        self.host = host
+        self.registry = metrics_registry or registry
+        self._stop = threading.Event()
+        self._writer_thread = None
+        self._server = None
+
+    @property
+    def address(self):
+        """HTTP 服务实际监听的 (地址, 端口)"""
+        return self._server.server_address[:2] if self._server else None
+
+    def start(self):
+        if self.file_path:
+            self._writer_thread = threading.Thread(target=self._write_loop, name="metrics-writer", daemon=True)
+            self._writer_thread.start()
+        if self.port is not None:
+            # 只有需要提供 HTTP 指标时才导入 http.server
+            from http.server import ThreadingHTTPServer
+            self._server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+            logger.info(f"指标服务已启动: http://{self.address[0]}:{self.address[1]}/metrics")
+        return self
+
+    def stop(self):
+        """停止后台线程，最后写入一次指标文件"""
+        self._stop.set()
+        if self._writer_thread is not None:
+            self._writer_thread.join()
+            self._writer_thread = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        logger.info(f"指标汇总: {summary(self.registry)}")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def write_file(self):
+        """原子地写入一次 JSON 指标文件"""
+        try:
+            os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+            tmp_path = self.file_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.registry.snapshot(), f, ensure_ascii=False)
+            os.replace(tmp_path, self.file_path)
+        except Exception as e:
+            logger.warning(f"写入指标文件失败: {str(e)}")
+
+    def _write_loop(self):
+        while not self._stop.wait(self.interval):
+            self.write_file()
+        self.write_file()
+
+    def _make_handler(self):
+        from http.server import BaseHTTPRequestHandler
+
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                if path in ("/", "/metrics"):
+                    body = exporter.registry.render_prometheus().encode("utf-8")
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                elif path == "/metrics.json":
+                    body = json.dumps(exporter.registry.snapshot(), ensure_ascii=False).encode("utf-8")
+                    content_type = "application/json; charset=utf-8"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,375 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# TikTok 各类请求的默认限速配置: 类别 -> (每秒令牌数, 突发容量, 最小抖动秒数, 最大抖动秒数)
+TIKTOK_REQUEST_LIMITS = {
+    "comment": (4.0, 10, 0.0, 0.3),  # 主评论 (每条评论一个令牌，每页等待一次)
+    "reply": (2.0, 4, 0.5, 1.5),  # 获取一条评论的回复
+}
+
+# TikTok 所有请求共享的全局速率 (每秒请求数, 突发容量)
+TIKTOK_GLOBAL_LIMIT = (4.0, 10)
+
+# 自适应节奏的配置: 平台 -> (初始速率, 最低速率, 最高速率, 突发容量, 每次提速的步长)，速率单位为次/秒
+PACER_LIMITS = {
+    "youtube": (5.0, 0.5, 50.0, 5, 1.0),
+    "tiktok": (2.0, 0.2, 10.0, 4, 0.25),
+}
+
+# 连续多少次正常响应后提速一次 (加性增加)
+PACER_SUCCESS_WINDOW = 20
+
+# 被限流时速率乘以的系数 (乘性减少)
+PACER_DECREASE = 0.5
+
+# 被限流后暂停的秒数，连续被限流时加倍，最多 PACER_MAX_PAUSE 秒
+PACER_PAUSE = 2.0
+PACER_MAX_PAUSE = 60.0
+
+# 自适应速率的持久化文件 (按平台保存)，超过 PACER_STATE_TTL 秒的状态不再使用
+PACER_STATE_FILE = os.path.join("data", "pacer_state.json")
+PACER_STATE_TTL = 24 * 3600
+
+# 提速后至少间隔多少秒才保存一次状态 (降速时立即保存)
+PACER_SAVE_INTERVAL = 30.0
+
+# 多个节奏控制器 (可能属于不同平台) 写同一个状态文件时互斥
+_state_lock = threading.Lock()
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶
+
+    reserve() 立即预占令牌并返回调用方需要等待的秒数 (令牌可以预支为负数)，
+    等待本身由调用方完成，因此同一个令牌桶可同时用于同步代码和 asyncio 代码。
+    """
+
+    def __init__(self, rate, burst=1):
+        """
+        Args:
+            rate: 每秒补充的令牌数，<= 0 表示不限速
+            burst: 桶容量 (允许的突发请求数)
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        """按当前速率补充到 now 为止的令牌 (调用方持有锁)"""
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens=1):
+        """预占令牌，返回需要等待的秒数"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+def load_pacer_state(state_file=PACER_STATE_FILE):
+    """读取各平台保存的自适应速率，文件不存在或损坏时返回空字典"""
+    if not state_file or not os.path.exists(state_file):
+        return {}
+    try:
+        with open(state_file, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        return state if isinstance(state, dict) else {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"读取节奏状态失败: {str(e)}")
+        return {}
+
+
+class AdaptivePacer(TokenBucket):
+    """
+    按服务器响应自适应调整速率的令牌桶 (AIMD)
+
+    每连续 success_window 次正常响应，速率加上 increase，直到 max_rate；
+    收到限流信号 (HTTP 429、rateLimitExceeded、TikTok 验证码或空页) 时速率乘以 PACER_DECREASE，
+    并暂停一段时间 (连续被限流时加倍)。并发请求几乎同时收到的限流响应在暂停期内只降速一次。
+    当前速率按平台保存到状态文件，下次启动时从上次的速率继续，而不是从保守的常数重新开始。
+    """
+
+    def __init__(self, platform, rate=None, min_rate=None, max_rate=None, burst=None, increase=None,
+                 success_window=PACER_SUCCESS_WINDOW, state_file=PACER_STATE_FILE):
+        """
+        Args:
+            platform: 平台名称 ("youtube" 或 "tiktok")，决定默认配置和状态文件中的键
+            rate: 初始速率 (次/秒)，为 None 时使用状态文件中保存的速率或默认值
+            min_rate: 最低速率
+            max_rate: 最高速率 (用户设置的速率上限)
+            burst: 突发容量
+            increase: 每次提速的步长 (次/秒)
+            success_window: 连续多少次正常响应后提速一次
+            state_file: 状态文件路径，为 None 时不持久化
+        """
+        default_rate, default_min, default_max, default_burst, default_increase = PACER_LIMITS[platform]
+        self.platform = platform
+        self.min_rate = default_min if min_rate is None else min_rate
+        self.max_rate = default_max if max_rate is None else max_rate
+        self.min_rate = min(self.min_rate, self.max_rate)
+        self.increase = default_increase if increase is None else increase
+        self.success_window = max(1, success_window)
+        self.state_file = state_file
+        self.throttle_count = 0
+
+        if rate is None:
+            saved = load_pacer_state(state_file).get(platform) or {}
+            fresh = time.time() - saved.get("updated_at", 0) <= PACER_STATE_TTL
+            rate = saved.get("rate") if fresh and saved.get("rate") else default_rate
+        super().__init__(min(self.max_rate, max(self.min_rate, rate)), default_burst if burst is None else burst)
+
+        self._successes = 0  # 上次调整之后连续正常响应的次数
+        self._throttles = 0  # 连续被限流的次数 (决定暂停时长)
+        self._pause_until = 0.0
+        self._saved_at = 0.0
+
+    def reserve(self, tokens=1):
+        """预占令牌，返回需要等待的秒数 (被限流后的暂停期内至少等到暂停结束)"""
+        delay = super().reserve(tokens)
+        pause = self._pause_until - time.monotonic()
+        return max(delay, pause)
+
+    def on_success(self):
+        """记录一次正常响应"""
+        with self._lock:
+            self._throttles = 0
+            self._successes += 1
+            if self._successes < self.success_window or self.rate >= self.max_rate:
+                return
+            self._successes = 0
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.increase)
+            rate = self.rate
+        logger.debug(f"{self.platform} 响应正常，速率提高到 {rate:.2f} 次/秒")
+        if time.monotonic() - self._saved_at >= PACER_SAVE_INTERVAL:
+            self.save()
+
+    def on_throttle(self, reason):
+        """
+        记录一次限流信号，降低速率并暂停
+
+        Args:
+            reason: 信号类型 (如 "http_429"、"rateLimitExceeded"、"captcha"、"empty_page")
+        """
+        now = time.monotonic()
+        with self._lock:
+            self.throttle_count += 1
+            self._successes = 0
+            if now < self._pause_until:
+                return
+            self._throttles += 1
+            pause = min(PACER_MAX_PAUSE, PACER_PAUSE * 2 ** (self._throttles - 1))
+            self._pause_until = now + pause
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate * PACER_DECREASE)
+            # 丢弃积攒的突发额度，暂停结束后按新速率发出请求
+            self._tokens = min(self._tokens, 0.0)
+            rate = self.rate
+        metrics.registry.inc("scraper_throttled_total", platform=self.platform, reason=reason)
+        logger.warning(f"{self.platform} 触发限流 ({reason})，速率降至 {rate:.2f} 次/秒，暂停 {pause:.0f} 秒")
+        self.save()
+
+    def save(self):
+        """原子地把当前速率写入状态文件 (保留其他平台的状态)"""
+        self._saved_at = time.monotonic()
+        if not self.state_file:
+            return
+        with _state_lock:
+            try:
+                state = load_pacer_state(self.state_file)
+                state[self.platform] = {"rate": round(self.rate, 4), "updated_at": time.time()}
+                os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+                tmp_path = self.state_file + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(state, f, indent=2)
+                os.replace(tmp_path, self.state_file)
+            except Exception as e:
+                logger.warning(f"保存节奏状态失败: {str(e)}")
+
+
+class AsyncThrottle:
+    """
+    按请求类别配置的异步节流器
+
+    每个请求类别有自己的令牌桶和随机抖动，所有类别再共享一个全局令牌桶。
+    全局令牌桶可以是 AdaptivePacer，此时爬虫通过 on_success/on_throttle 报告响应情况，全局速率随之调整。
+    等待通过 asyncio.sleep 完成，不会阻塞事件循环，多个协程可以并发地在同一个预算下排队。
+    """
+
+    def __init__(self, request_limits=None, global_limit=None, platform="tiktok", pacer=None):
+        """
+        Args:
+            request_limits: 类别 -> (每秒令牌数, 突发容量, 最小抖动, 最大抖动)，每秒令牌数 <= 0 表示该类别不限速
+            global_limit: (每秒请求数, 突发容量)，为 None 时不设全局限制
+            platform: 记录休眠指标时使用的平台名称
+            pacer: AdaptivePacer，指定时代替 global_limit 作为全局令牌桶
+        """
+        self.platform = platform
+        if pacer is not None:
+            self.global_bucket = pacer
+        else:
+            self.global_bucket = TokenBucket(*global_limit) if global_limit else None
+        self.buckets = {}
+        self.jitter = {}
+        for request_class, (rate, burst, jitter_min, jitter_max) in (request_limits or {}).items():
+            self.buckets[request_class] = TokenBucket(rate, burst)
+            self.jitter[request_class] = (jitter_min, jitter_max)
+
+        # 统计信息
+        self.slept_seconds = 0.0
+        self.request_counts = {}
+
+    @classmethod
+    def for_tiktok(cls, comment_rate=None, reply_rate=None, adaptive=True, state_file=PACER_STATE_FILE):
+        """
+        使用 TikTok 默认配置创建节流器，可单独覆盖主评论和回复的速率
+
+        Args:
+            comment_rate: 主评论速率上限 (条/秒)
+            reply_rate: 回复请求速率上限 (次/秒)
+            adaptive: 是否使用自适应的全局速率 (AdaptivePacer)；此时各类别只在指定了速率时才限速，
+                      否则使用 TIKTOK_REQUEST_LIMITS 和 TIKTOK_GLOBAL_LIMIT 中的固定速率
+            state_file: 自适应速率的状态文件
+        """
+        limits = dict(TIKTOK_REQUEST_LIMITS)
+        for request_class, rate in (("comment", comment_rate), ("reply", reply_rate)):
+            if rate is not None:
+                limits[request_class] = (rate,) + limits[request_class][1:]
+            elif adaptive:
+                # 只保留随机抖动，速率由自适应的全局令牌桶决定
+                limits[request_class] = (0.0,) + limits[request_class][1:]
+        if adaptive:
+            return cls(limits, pacer=AdaptivePacer("tiktok", state_file=state_file))
+        return cls(limits, TIKTOK_GLOBAL_LIMIT)
+
+    @property
+    def pacer(self):
+        """自适应的全局令牌桶，使用固定速率时为 None"""
+        return self.global_bucket if isinstance(self.global_bucket, AdaptivePacer) else None
+
+    def on_success(self):
+        """报告一次正常响应 (一页评论或一组回复)"""
+        if self.pacer is not None:
+            self.pacer.on_success()
+
+    def on_throttle(self, reason):
+        """报告一次限流信号 (验证码、空页)"""
+        if self.pacer is not None:
+            self.pacer.on_throttle(reason)
+
+    def save(self):
+        """保存自适应速率 (固定速率时不做任何事)"""
+        if self.pacer is not None:
+            self.pacer.save()
+
+    def _delay_for(self, request_class, tokens=1):
+        """预占令牌并计算本次请求需要等待的秒数"""
+        self.request_counts[request_class] = self.request_counts.get(request_class, 0) + 1
+
+        delay = self.global_bucket.reserve() if self.global_bucket else 0.0
+        bucket = self.buckets.get(request_class)
+        if bucket is not None:
+            delay = max(delay, bucket.reserve(tokens))
+
+        jitter_min, jitter_max = self.jitter.get(request_class, (0.0, 0.0))
+        if jitter_max > 0:
+            delay += random.uniform(jitter_min, jitter_max)
+        return delay
+
+    async def wait(self, request_class, tokens=1):
+        """
+        在发出某类请求之前等待，直到预算允许
+
+        Args:
+            request_class: 请求类别
+            tokens: 从该类别的令牌桶中取走的令牌数 (如一页主评论的条数)，全局令牌桶始终只取一个
+        """
+        delay = self._delay_for(request_class, tokens)
+        if delay > 0:
+            self.slept_seconds += delay
+            metrics.record_sleep(self.platform, f"throttle_{request_class}", delay)
+            await asyncio.sleep(delay)
+
+
+class RateLimiter:
+    """
+    线程安全的同步限速器
+
+    多个工作线程共享同一个令牌桶，用于让批量抓取的所有视频共享一个请求预算。
+    令牌桶为 AdaptivePacer 时，调用方通过 on_success/on_throttle 报告响应情况，速率随之调整。
+    """
+
+    def __init__(self, rate, burst=1, platform="youtube", pacer=None):
+        """
+        Args:
+            rate: 每秒请求数，<= 0 表示不限速
+            burst: 突发容量
+            platform: 记录休眠指标时使用的平台名称
+            pacer: AdaptivePacer，指定时代替固定速率的令牌桶 (忽略 rate 和 burst)
+        """
+        self.platform = platform
+        self.bucket = pacer if pacer is not None else TokenBucket(rate, burst)
+        self.slept_seconds = 0.0
+        self.request_count = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """在发出请求之前调用，必要时阻塞当前线程直到预算允许"""
+        delay = self.bucket.reserve()
+        with self._lock:
+            self.request_count += 1
+            self.slept_seconds += delay
+        if delay > 0:
+            metrics.record_sleep(self.platform, "rate_limit", delay)
+            time.sleep(delay)
+
+    @classmethod
+    def adaptive(cls, platform="youtube", max_rate=None, burst=None, state_file=PACER_STATE_FILE):
+        """
+        创建按服务器响应自适应调整速率的限速器
+
+        Args:
+            platform: 平台名称
+            max_rate: 速率上限 (次/秒)，为 None 或 <= 0 时使用 PACER_LIMITS 中的默认上限
+            burst: 突发容量
+            state_file: 自适应速率的状态文件
+        """
+        pacer = AdaptivePacer(platform, max_rate=max_rate if max_rate and max_rate > 0 else None,
+                              burst=burst, state_file=state_file)
+        return cls(0, platform=platform, pacer=pacer)
+
+    @property
+    def is_adaptive(self):
+        return isinstance(self.bucket, AdaptivePacer)
+
+    def on_success(self):
+        """报告一次正常响应"""
+        if self.is_adaptive:
+            self.bucket.on_success()
+
+    def on_throttle(self, reason):
+        """报告一次限流信号 (HTTP 429、rateLimitExceeded)"""
+        if self.is_adaptive:
+            self.bucket.on_throttle(reason)
+
+    def save(self):
+        """保存自适应速率 (固定速率时不做任何事)"""
+        if self.is_adaptive:
+            self.bucket.save()
@@ -0,0 +1,123 @@
+"""
+评论抓取统一入口
+
+    python scrape.py tiktok --url "VIDEO_URL" --count 200
+    python scrape.py youtube --url "VIDEO_ID" --count 500
+    python scrape.py batch tiktok videos.txt --sessions 3
+    python scrape.py batch youtube videos.txt --workers 8
+    python scrape.py watch youtube trending.txt --budget 400
+    python scrape.py queue add data/work_queue.db tiktok videos.txt
+    python scrape.py threads top data/youtube/youtube_xxx.jsonl -n 20
+    python scrape.py analyze data/youtube --top 20
+
+子命令之后的参数原样传给对应平台的爬虫 (与直接运行 tiktok_comments_scraper.py /
+youtube_comments_scraper.py 相同)。只有用到的平台模块才会被导入，TikTokApi、playwright、
+requests、pyarrow 等依赖在真正需要时才加载，查看帮助和空运行都能很快返回。
+"""
+import argparse
+import sys
+
+# 子命令对应的爬虫模块 (只在选中子命令后导入)
+PLATFORMS = {
+    "tiktok": "tiktok_comments_scraper",
+    "youtube": "youtube_comments_scraper",
+}
+
+# 其他子命令对应的模块
+COMMANDS = {
+    "queue": "work_queue",
+    "threads": "thread_index",
+    "analyze": "analytics",
+}
+
+# 需要报告版本的依赖 (--version)
+VERSION_PACKAGES = ("TikTokApi", "playwright", "requests", "pyarrow", "python-dotenv")
+
+
+def package_versions():
+    """通过 importlib.metadata 读取依赖版本 (不导入依赖本身)，未安装的依赖为 None"""
+    from importlib.metadata import PackageNotFoundError, version
+
+    versions = {}
+    for name in VERSION_PACKAGES:
+        try:
+            versions[name] = version(name)
+        except PackageNotFoundError:
+            versions[name] = None
+    return versions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="scrape",
+        description="TikTok / YouTube 评论抓取工具",
+        epilog="各子命令的参数: scrape tiktok --help、scrape youtube --help、scrape queue --help、scrape threads --help、"
+               "scrape analyze --help")
+    parser.add_argument("--version", action="store_true", help="显示依赖版本并退出")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    # 子命令的参数由平台爬虫自己解析，这里不添加 -h，--help 也原样传过去
+    commands.add_parser("tiktok", add_help=False, help="抓取单个 TikTok 视频的评论")
+    commands.add_parser("youtube", add_help=False, help="抓取单个 YouTube 视频的评论")
+    # batch / watch 的 FILE 可以省略，只为了 scrape batch youtube --help 能显示平台爬虫的帮助
+    batch = commands.add_parser("batch", add_help=False, help="批量抓取视频列表 (每行一个，- 表示标准输入)",
+                                usage="scrape batch {tiktok,youtube} FILE [参数 ...]")
+    batch.add_argument("platform", nargs="?", choices=list(PLATFORMS))
+    batch.add_argument("file", nargs="?")
+    batch.set_defaults(subparser=batch)
+    watch = commands.add_parser("watch", add_help=False, help="持续监视视频列表，只抓取新评论 (目前只支持 YouTube)",
+                                usage="scrape watch youtube FILE [参数 ...]")
+    watch.add_argument("platform", nargs="?", choices=["youtube"])
+    watch.add_argument("file", nargs="?")
+    watch.set_defaults(subparser=watch)
+    commands.add_parser("queue", add_help=False, help="管理多节点共享的抓取队列 (add / stats / list / cap / requeue / serve)")
+    commands.add_parser("threads", add_help=False, help="按线程读取 JSON Lines 输出 (build / show / top)")
+    commands.add_parser("analyze", add_help=False, help="分析已保存的评论 (汇总、点赞排行、重复文本、长度分布)")
+    return parser
+
+
+def main(argv=None):
+    """
+    解析子命令并调用对应平台的 main
+
+    Args:
+        argv: 命令行参数 (不含程序名)，为 None 时使用 sys.argv[1:]
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    parser = build_parser()
+    args, rest = parser.parse_known_args(argv)
+
+    if args.version:
+        for name, version in package_versions().items():
+            print(f"{name}: {version or '未安装'}")
+        return 0
+    if args.command is None:
+        parser.print_help()
+        return 0
+
+    if args.command in COMMANDS:
+        module = COMMANDS[args.command]
+        prog = f"scrape {args.command}"
+    elif args.command in ("batch", "watch"):
+        wants_help = "-h" in rest or "--help" in rest
+        if args.platform is None:
+            if wants_help:
+                args.subparser.print_usage()
+                return 0
+            args.subparser.error("需要指定平台和视频列表文件")
+        module = PLATFORMS[args.platform]
+        prog = f"scrape {args.command} {args.platform} FILE"
+        if args.file is not None:
+            rest = [f"--{args.command}", args.file] + rest
+        elif not wants_help:
+            args.subparser.error("需要指定视频列表文件 (每行一个，- 表示标准输入)")
+    else:
+        module = PLATFORMS[args.command]
+        prog = f"scrape {args.command}"
+
+    import importlib
+
+    return importlib.import_module(module).main(rest, prog=prog)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,303 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+import metrics
+from comment_record import CommentRecord
+
+logger = logging.getLogger(__name__)
+
+# 支持的压缩方式及分片文件扩展名
+COMPRESSIONS = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+
+# 默认压缩级别
+COMPRESSION_LEVELS = {"gzip": 6, "zstd": 3}
+
+# 分片默认大小上限 (压缩后的字节数)
+SHARD_BYTES = 256 * 1024 * 1024
+
+# 清单文件的后缀
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+def manifest_path_for(file_path):
+    """根据输出文件名得到分片清单的路径 (xxx.jsonl -> xxx.manifest.json)"""
+    if file_path.endswith(MANIFEST_SUFFIX):
+        return file_path
+    root, ext = os.path.splitext(file_path)
+    if ext in (".json", ".jsonl"):
+        file_path = root
+    return file_path + MANIFEST_SUFFIX
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("zstd 压缩需要安装 zstandard: pip install zstandard")
+    return zstandard
+
+
+class _CountingFile:
+    """写入时统计字节数并计算 SHA-256 的文件包装 (压缩流写入的是压缩后的数据)"""
+
+    def __init__(self, path):
+        self._file = open(path, "wb")
+        self.bytes = 0
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.bytes += len(data)
+        self.sha256.update(data)
+        return self._file.write(data)
+
+    def flush(self):
+        self._file.flush()
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def close(self):
+        self._file.close()
+
+
+class ShardedCommentWriter:
+    """
+    写入压缩分片的 JSON Lines 写入器
+
+    评论逐条序列化为一行后写入 gzip 或 zstd 压缩流，当前分片的压缩后大小或记录数达到上限时
+    在记录边界处切换到下一个分片。清单文件列出每个分片的文件名、记录范围、字节数和 SHA-256，
+    下游可以按分片并行读取。flush() 时对压缩流做同步刷新并 fsync，已刷新的记录即使进程崩溃也能读出；
+    每次 flush 和切换分片时原子地重写清单。不支持追加写入和断点续抓。
+    """
+
+    def __init__(self, file_path, compression="gzip", max_bytes=SHARD_BYTES, max_records=None, level=None,
+                 fsync=True):
+        """
+        Args:
+            file_path: 输出文件路径 (清单路径由此得到，分片与清单位于同一目录)
+            compression: "gzip" 或 "zstd"
+            max_bytes: 每个分片压缩后的大小上限 (字节)，为 None 时不按大小切换
+            max_records: 每个分片的记录数上限，为 None 时不按记录数切换
+            level: 压缩级别，为 None 时使用默认级别
+            fsync: flush() 时是否调用 os.fsync 强制落盘
+        """
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"不支持的压缩方式: {compression}")
+        self.file_path = manifest_path_for(file_path)
+        self.compression = compression
+        self.max_bytes = max_bytes
+        self.max_records = max_records
+        self.level = COMPRESSION_LEVELS[compression] if level is None else level
+        self.fsync = fsync
+        self.count = 0  # 本次写入的记录数
+        self.pending = 0  # 上次 flush 之后写入的记录数
+        self.serialize_seconds = 0.0  # 上次 flush 之后序列化和压缩花费的时间
+        self.shards = []  # 已完成的分片
+        self._closed = False
+        if compression == "zstd":
+            self._zstd = _zstandard()
+
+        self._prefix = self.file_path[:-len(MANIFEST_SUFFIX)]
+        file_dir = os.path.dirname(self.file_path)
+        if file_dir:
+            os.makedirs(file_dir, exist_ok=True)
+        self._created_at = datetime.now().isoformat(timespec="seconds")
+        self._open_shard()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    @property
+    def offset(self):
+        """压缩分片不支持按字节位置截断，始终返回 None"""
+        return None
+
+    def _shard_path(self, index):
+        return f"{self._prefix}-{index:05d}{COMPRESSIONS[self.compression]}"
+
+    def _open_shard(self):
+        self._shard_file = self._shard_path(len(self.shards))
+        self._raw = _CountingFile(self._shard_file)
+        if self.compression == "gzip":
+            # mtime=0 使相同内容的分片得到相同的校验和
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=self.level, mtime=0)
+        else:
+            compressor = self._zstd.ZstdCompressor(level=self.level)
+            self._stream = compressor.stream_writer(self._raw, closefd=False)
+        self._shard_start = self.count
+        self._shard_records = 0
+        self._shard_uncompressed = 0
+
+    def _shard_entry(self, complete):
+        return {
+            "file": os.path.basename(self._shard_file),
+            "first_record": self._shard_start,
+            "records": self._shard_records,
+            "bytes": self._raw.bytes,
+            "uncompressed_bytes": self._shard_uncompressed,
+            "sha256": self._raw.sha256.hexdigest(),
+            "complete": complete,
+        }
+
+    def _close_shard(self):
+        started = time.perf_counter()
+        self._stream.close()
+        self._raw.flush()
+        if self.fsync:
+            os.fsync(self._raw.fileno())
+        self._raw.close()
+        metrics.record_phase("io", time.perf_counter() - started)
+        self.shards.append(self._shard_entry(complete=True))
+
+    def _rotate(self):
+        self._close_shard()
+        logger.debug(f"分片已写满: {self.shards[-1]['file']} ({self.shards[-1]['records']} 条)")
+        self._open_shard()
+        self.write_manifest()
+
+    def write(self, record):
+        """写入一条评论记录 (字典或 CommentRecord)"""
+        started = time.perf_counter()
+        if isinstance(record, CommentRecord):
+            record = record.as_dict()
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+        self._stream.write(line)
+        self.serialize_seconds += time.perf_counter() - started
+        self.count += 1
+        self.pending += 1
+        self._shard_records += 1
+        self._shard_uncompressed += len(line)
+        if ((self.max_records and self._shard_records >= self.max_records)
+                or (self.max_bytes and self._raw.bytes >= self.max_bytes)):
+            self._rotate()
+
+    def write_many(self, records):
+        """写入多条评论记录"""
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        """同步刷新压缩流并写入磁盘，更新清单，返回本次落盘的记录数"""
+        flushed = self.pending
+        started = time.perf_counter()
+        if flushed:
+            if self.compression == "gzip":
+                self._stream.flush()
+            else:
+                self._stream.flush(self._zstd.FLUSH_BLOCK)
+            self._raw.flush()
+            if self.fsync:
+                os.fsync(self._raw.fileno())
+            self.write_manifest()
+        metrics.record_phase("io", time.perf_counter() - started)
+        metrics.record_phase("serialize", self.serialize_seconds)
+        self.serialize_seconds = 0.0
+        self.pending = 0
+        return flushed
+
+    def manifest(self, complete=False):
+        """当前的清单内容 (未完成的分片标记为 complete=False)"""
+        shards = list(self.shards)
+        if not self._closed and self._shard_records:
+            shards.append(self._shard_entry(complete=False))
+        return {
+            "format": "jsonl",
+            "compression": self.compression,
+            "created_at": self._created_at,
+            "records": self.count,
+            "complete": complete,
+            "shards": shards,
+        }
+
+    def write_manifest(self, complete=False):
+        """原子地写入清单文件"""
+        tmp_path = self.file_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest(complete), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.file_path)
+
+    def close(self):
+        """关闭当前分片 (没有记录的空分片会被删除) 并写入最终清单"""
+        if self._closed:
+            return
+        try:
+            if self._shard_records or not self.shards:
+                self._close_shard()
+            else:
+                self._stream.close()
+                self._raw.close()
+                os.remove(self._shard_file)
+        finally:
+            self._closed = True
+        self.write_manifest(complete=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def open_shard(path):
+    """按扩展名打开一个分片，返回文本流"""
+    if path.endswith(COMPRESSIONS["zstd"]):
+        import io
+
+        reader = _zstandard().ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        return io.TextIOWrapper(reader, encoding="utf-8")
+    return gzip.open(path, "rt", encoding="utf-8")
+
+
+def read_shard(path):
+    """逐条读取一个分片中的评论，跳过空行和被截断的行 (进程崩溃时最后一批未刷新的数据)"""
+    with open_shard(path) as f:
+        try:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"跳过无法解析的行 {path}:{line_no}")
+        except (EOFError, OSError) as e:
+            # 未正常关闭的分片没有结尾标记，读到最后一次同步刷新的位置为止
+            logger.warning(f"分片 {path} 未正常结束: {str(e)}")
+
+
+def verify_shard(manifest_path, shard):
+    """检查分片文件的大小和 SHA-256 是否与清单一致"""
+    path = os.path.join(os.path.dirname(manifest_path), shard["file"])
+    sha256 = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(block)
+            size += len(block)
+    return size == shard["bytes"] and sha256.hexdigest() == shard["sha256"]
+
+
+def read_manifest(manifest_path):
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_shards(manifest_path, verify=False):
+    """
+    按清单顺序读取全部分片中的评论
+
+    Args:
+        manifest_path: 清单文件路径
+        verify: 是否先校验每个分片的大小和 SHA-256 (不一致时抛出 ValueError)
+    """
+    manifest = read_manifest(manifest_path)
+    for shard in manifest["shards"]:
+        if verify and not verify_shard(manifest_path, shard):
+            raise ValueError(f"分片校验失败: {shard['file']}")
+        yield from read_shard(os.path.join(os.path.dirname(manifest_path), shard["file"]))
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(TESTS_DIR)
+sys.path.insert(0, ROOT_DIR)
+# 模拟服务器和数据源 (benchmarks/analytics.py 与根目录的 analytics.py 同名，放在根目录之后)
+sys.path.append(os.path.join(ROOT_DIR, "benchmarks"))
+
+
+@pytest.fixture(autouse=True)
+def work_dir(tmp_path, monkeypatch):
+    """每个测试在临时目录中运行 (爬虫把输出、检查点和状态文件写到相对路径 data/ 下)"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,85 @@
+import json
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import analytics
+
+
+def write_jsonl(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def test_text_hashes_reserve_zero_for_empty_texts():
+    texts = ["hello", None, "", "你好", "ab", "ba", "x" * (analytics.HASH_BLOCK_BYTES + 1), "y"]
+    hashes = analytics.text_hashes(texts)
+    assert hashes.dtype == np.int64
+    assert (hashes == 0).tolist() == [False, True, True, False, False, False, False, False]
+    assert len(set(hashes.tolist())) == len(texts) - 1
+
+
+def test_text_hashes_of_arrow_arrays_match_lists():
+    pa = pytest.importorskip("pyarrow")
+    texts = ["hello", None, "", "你好", "ab", "ba", "x" * 1000]
+    expected = analytics.text_hashes(texts).tolist()
+    assert analytics.text_hashes(pa.array(texts)).tolist() == expected
+    assert analytics.text_hashes(pa.array(texts, pa.large_string())).tolist() == expected
+    assert analytics.text_hashes(pa.array(texts).slice(2)).tolist() == expected[2:]
+    assert analytics.text_hashes(pa.chunked_array([pa.array(texts[:3]), pa.array(texts[3:])])).tolist() == expected
+
+
+def test_text_hash_of_zero_is_remapped(monkeypatch):
+    monkeypatch.setattr(analytics, "_mix64", lambda values: values & np.uint64(0))
+    assert analytics.text_hashes(["text", ""]).tolist() == [1, 0]
+
+
+def test_text_hashes_are_stable_across_processes():
+    code = ("import sys; sys.path.insert(0, %r); import analytics; "
+            "print(analytics.text_hashes(['same text']).tolist())" % analytics.__file__.rsplit("/", 1)[0])
+    outputs = {subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                              env={"PYTHONHASHSEED": seed}).stdout for seed in ("1", "2")}
+    assert len(outputs) == 1
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("youtube_dQw4w9WgXcQ_20240101_120000.jsonl", "dQw4w9WgXcQ"),
+    ("youtube_a_b_c-d_20240101_120000.parquet", "a_b_c-d"),
+    ("tiktok_7300000000000000000_20240101_120000.jsonl", "7300000000000000000"),
+    ("tiktok_20240101_120000.jsonl", "tiktok_20240101_120000"),
+    ("comments.jsonl.manifest.json", "comments.jsonl"),
+])
+def test_video_from_path(name, expected):
+    assert analytics.video_from_path(f"data/{name}") == expected
+
+
+@pytest.mark.parametrize("use_arrow", [False, True])
+def test_duplicates_and_tiktok_grouping(tmp_path, use_arrow):
+    path = str(tmp_path / "tiktok_7300000000000000000_20240101_120000.jsonl")
+    texts = ["lol"] * 3 + ["nice"] * 2 + ["unique", "", None]
+    write_jsonl(path, [{"id": str(i), "parent_id": None, "platform": "tiktok", "text": text, "like_count": i}
+                       for i, text in enumerate(texts)])
+
+    report = analytics.analyze([path], top_duplicates=5, use_arrow=use_arrow)
+
+    assert list(report["videos"]) == ["7300000000000000000"]
+    assert report["duplicates"]["unique_texts"] == 3
+    assert report["duplicates"]["duplicate_records"] == 3
+    assert report["duplicates"]["top"] == [{"text": "lol", "count": 3}, {"text": "nice", "count": 2}]
+    assert report["duplicates"]["hash_collisions"] == 0
+
+
+def test_top_duplicates_are_confirmed_by_text(tmp_path, monkeypatch):
+    # 用文本长度作为"摘要"，制造碰撞: "ab" 和 "cd" 摘要相同
+    monkeypatch.setattr(analytics, "text_hashes",
+                        lambda texts: np.array([len(text) if text else 0 for text in texts], dtype=np.int64))
+    path = str(tmp_path / "comments.jsonl")
+    write_jsonl(path, [{"text": text} for text in ["ab", "cd", "ab", "xyz", "xyz", "q"]])
+
+    report = analytics.analyze([path], top_duplicates=5, use_arrow=False)
+
+    assert report["duplicates"]["top"] == [{"text": "ab", "count": 2}, {"text": "xyz", "count": 2}]
+    assert report["duplicates"]["hash_collisions"] == 1
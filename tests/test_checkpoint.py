@@ -0,0 +1,56 @@
+import os
+
+from checkpoint import (checkpoint_path_for, find_checkpoint, load_checkpoint, save_checkpoint,
+                        truncate_output)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    output = str(tmp_path / "youtube_abc.jsonl")
+    save_checkpoint(output, "youtube", "abc", "token-2", 100, 150, 4096, matched_comments=7)
+
+    state = load_checkpoint(output)
+    assert state["cursor"] == "token-2"
+    assert (state["comment_count"], state["total_comments"], state["output_offset"]) == (100, 150, 4096)
+    assert state["completed"] is False
+    assert state["matched_comments"] == 7
+    assert not os.path.exists(checkpoint_path_for(output) + ".tmp")
+
+
+def test_load_missing_or_corrupt_checkpoint(tmp_path):
+    output = str(tmp_path / "comments.jsonl")
+    assert load_checkpoint(output) is None
+    with open(checkpoint_path_for(output), "w", encoding="utf-8") as f:
+        f.write("{not json")
+    assert load_checkpoint(output) is None
+
+
+def test_find_checkpoint_picks_latest_for_video(tmp_path):
+    save_dir = str(tmp_path)
+    old = os.path.join(save_dir, "youtube_abc_1.jsonl")
+    new = os.path.join(save_dir, "youtube_abc_2.jsonl")
+    save_checkpoint(old, "youtube", "abc", "old", 1, 1, 10)
+    save_checkpoint(new, "youtube", "abc", "new", 2, 2, 20)
+    save_checkpoint(os.path.join(save_dir, "tiktok_abc.jsonl"), "tiktok", "abc", "0", 3, 3, 30)
+    os.utime(checkpoint_path_for(old), (1, 1))
+    with open(os.path.join(save_dir, "broken" + ".ckpt.json"), "w", encoding="utf-8") as f:
+        f.write("{")
+
+    assert find_checkpoint(save_dir, "youtube", "abc")["cursor"] == "new"
+    assert find_checkpoint(save_dir, "tiktok", "abc")["output_file"].endswith("tiktok_abc.jsonl")
+    assert find_checkpoint(save_dir, "youtube", "other") is None
+
+
+def test_truncate_output(tmp_path):
+    output = str(tmp_path / "comments.jsonl")
+    truncate_output(output, 10)
+    assert not os.path.exists(output)
+
+    with open(output, "wb") as f:
+        f.write(b"line 1\nline 2 (partial)\n")
+    truncate_output(output, 7)
+    with open(output, "rb") as f:
+        assert f.read() == b"line 1\n"
+
+    # 文件比记录的位置短时保持原样
+    truncate_output(output, 100)
+    assert os.path.getsize(output) == 7
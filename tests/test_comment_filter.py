@@ -0,0 +1,103 @@
+import re
+
+import pytest
+
+from comment_filter import CommentFilter, _trie_pattern, load_comment_filter, read_keywords_file
+from comment_record import CommentRecord
+from comment_stream import select_thread
+
+
+def entry(text, comment_id="c", parent_id=None):
+    return CommentRecord(text, 0, "youtube", id=comment_id, parent_id=parent_id), None
+
+
+def test_trie_pattern_matches_every_keyword():
+    words = ["apple", "app", "application", "banana", "band", "苹果", "a.b"]
+    regex = re.compile(_trie_pattern(words))
+    for word in words:
+        assert regex.search(f"xx {word} yy"), word
+    assert not regex.search("ap ban 苹 axb")
+    # 某个关键词是另一个的前缀时，较长的那个不再展开
+    assert "application" not in _trie_pattern(["app", "application"])
+
+
+def test_trie_pattern_empty():
+    assert _trie_pattern([]) is None
+
+
+def test_match_ignores_case_by_default():
+    comment_filter = CommentFilter(["iPhone"])
+    assert comment_filter.match("new IPHONE 15")
+    assert not comment_filter.match("android")
+    assert not comment_filter.match("")
+    assert not comment_filter.match(None)
+
+
+def test_match_case_sensitive():
+    comment_filter = CommentFilter(["iPhone"], ignore_case=False)
+    assert comment_filter.match("my iPhone")
+    assert not comment_filter.match("my IPHONE")
+
+
+def test_keywords_are_literal_and_combined_with_patterns():
+    comment_filter = CommentFilter(["c++", "1.5"], [r"\bv\d+\b"])
+    assert comment_filter.match("I write C++")
+    assert comment_filter.match("version 1.5")
+    assert not comment_filter.match("version 105")
+    assert comment_filter.match("released v12 today")
+    assert not comment_filter.match("released v12x")
+
+
+def test_invalid_filters_raise_value_error():
+    with pytest.raises(ValueError):
+        CommentFilter([], [])
+    with pytest.raises(ValueError):
+        CommentFilter([""])
+    with pytest.raises(ValueError):
+        CommentFilter([], ["(unclosed"])
+
+
+def test_fetch_replies_only_skips_when_requested():
+    assert CommentFilter(["brand"]).fetch_replies("unrelated")
+    skipping = CommentFilter(["brand"], skip_unmatched_replies=True)
+    assert not skipping.fetch_replies("unrelated")
+    assert skipping.fetch_replies("my Brand")
+
+
+def test_read_keywords_file_and_load(tmp_path):
+    path = tmp_path / "keywords.txt"
+    path.write_text("# 品牌\napple\n\n  苹果  \nre:iphone\\s*\\d+\n", encoding="utf-8")
+    assert read_keywords_file(str(path)) == (["apple", "苹果"], [r"iphone\s*\d+"])
+
+    comment_filter = load_comment_filter(["samsung"], keywords_file=str(path))
+    assert comment_filter.keywords == ["apple", "samsung", "苹果"]
+    assert comment_filter.match("iPhone 15")
+    assert load_comment_filter() is None
+
+
+def test_select_thread_without_filter_keeps_everything():
+    thread = select_thread(entry("top"), [entry("r1"), entry("r2")])
+    assert [record.text for record, _ in thread.records] == ["top", "r1", "r2"]
+    assert thread.matches == 3
+    assert thread.reply_count == 2
+
+
+def test_select_thread_keeps_parent_of_matching_reply():
+    comment_filter = CommentFilter(["brand"])
+    thread = select_thread(entry("unrelated", "t1"),
+                           [entry("no", "r1", "t1"), entry("love this brand", "r2", "t1")], comment_filter)
+    assert [record.id for record, _ in thread.records] == ["t1", "r2"]
+    # 作为上下文写出的主评论不计入匹配数
+    assert thread.matches == 1
+
+
+def test_select_thread_drops_unmatched_thread():
+    comment_filter = CommentFilter(["brand"])
+    thread = select_thread(entry("unrelated"), [entry("no")], comment_filter)
+    assert thread.records == []
+    assert thread.matches == 0
+    assert thread.reply_count == 1
+
+    thread = select_thread(entry("brand"), [entry("no")], comment_filter)
+    assert [record.text for record, _ in thread.records] == ["brand"]
+    assert thread.matches == 1
@@ -0,0 +1,30 @@
+import pytest
+
+import scrape
+
+
+@pytest.mark.parametrize("argv, usage", [
+    (["batch", "youtube", "--help"], "usage: scrape batch youtube FILE"),
+    (["batch", "tiktok", "-h"], "usage: scrape batch tiktok FILE"),
+    (["watch", "youtube", "--help"], "usage: scrape watch youtube FILE"),
+])
+def test_batch_and_watch_help_shows_platform_help(capsys, argv, usage):
+    with pytest.raises(SystemExit) as exc:
+        scrape.main(argv)
+    assert exc.value.code == 0
+    out = capsys.readouterr().out
+    assert out.startswith(usage)
+    assert "--count" in out
+
+
+def test_batch_help_without_platform(capsys):
+    assert scrape.main(["batch", "--help"]) == 0
+    assert "scrape batch {tiktok,youtube} FILE" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("argv", [["batch", "youtube"], ["watch"]])
+def test_batch_and_watch_require_file(capsys, argv):
+    with pytest.raises(SystemExit) as exc:
+        scrape.main(argv)
+    assert exc.value.code == 2
+    assert "error" in capsys.readouterr().err
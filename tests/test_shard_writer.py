@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from shard_writer import ShardedCommentWriter, read_manifest, read_shards
+
+
+def records(n):
+    return [{"id": str(i), "text": f"评论 {i}"} for i in range(n)]
+
+
+@pytest.fixture(params=["gzip", "zstd"])
+def compression(request):
+    if request.param == "zstd":
+        pytest.importorskip("zstandard")
+    return request.param
+
+
+def test_rotated_shards_read_back_in_order(tmp_path, compression):
+    path = str(tmp_path / "youtube_abc.jsonl")
+    with ShardedCommentWriter(path, compression=compression, max_records=3, fsync=False) as writer:
+        writer.write_many(records(8))
+
+    manifest_path = str(tmp_path / "youtube_abc.manifest.json")
+    manifest = read_manifest(manifest_path)
+    assert manifest["complete"] and manifest["records"] == 8
+    assert [(shard["first_record"], shard["records"]) for shard in manifest["shards"]] == [(0, 3), (3, 3), (6, 2)]
+    assert list(read_shards(manifest_path, verify=True)) == records(8)
+
+
+def test_exact_rotation_leaves_no_empty_shard(tmp_path):
+    path = str(tmp_path / "comments.jsonl")
+    with ShardedCommentWriter(path, max_records=2, fsync=False) as writer:
+        writer.write_many(records(4))
+    manifest = read_manifest(writer.file_path)
+    assert [shard["records"] for shard in manifest["shards"]] == [2, 2]
+    assert sorted(os.listdir(tmp_path)) == ["comments-00000.jsonl.gz", "comments-00001.jsonl.gz",
+                                           "comments.manifest.json"]
+
+
+def test_flushed_records_survive_unclosed_writer(tmp_path, compression):
+    writer = ShardedCommentWriter(str(tmp_path / "comments.jsonl"), compression=compression, fsync=False)
+    writer.write_many(records(5))
+    assert writer.flush() == 5
+
+    manifest = read_manifest(writer.file_path)
+    assert not manifest["complete"] and manifest["shards"][0]["complete"] is False
+    # 模拟进程崩溃: 不关闭写入器直接读取
+    assert list(read_shards(writer.file_path)) == records(5)
+
+
+def test_verify_detects_modified_shard(tmp_path):
+    with ShardedCommentWriter(str(tmp_path / "comments.jsonl"), fsync=False) as writer:
+        writer.write_many(records(3))
+    with open(tmp_path / "comments-00000.jsonl.gz", "ab") as f:
+        f.write(b"garbage")
+
+    with pytest.raises(ValueError):
+        list(read_shards(writer.file_path, verify=True))
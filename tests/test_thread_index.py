@@ -0,0 +1,79 @@
+import json
+
+from checkpoint import truncate_output
+from thread_index import ThreadIndex, ThreadIndexWriter, index_path_for, read_index_entries
+
+
+def thread(thread_id, replies, like_count=0):
+    records = [{"id": thread_id, "parent_id": None, "like_count": like_count}]
+    records.extend({"id": f"{thread_id}.{i}", "parent_id": thread_id, "like_count": 0} for i in range(replies))
+    return records
+
+
+def append_records(path, writer, records):
+    """像爬虫一样写入输出文件并登记到索引，返回写入后的文件大小"""
+    with open(path, "ab") as f:
+        for record in records:
+            offset = f.tell()
+            line = (json.dumps(record) + "\n").encode("utf-8")
+            f.write(line)
+            writer.add(record, offset, len(line))
+        return f.tell()
+
+
+def ids(records):
+    return [record["id"] for record in records]
+
+
+def test_recover_after_crash_and_truncation(tmp_path):
+    path = str(tmp_path / "comments.jsonl")
+    writer = ThreadIndexWriter(path, fsync=False)
+    checkpoint_offset = append_records(path, writer, thread("a", 2) + thread("b", 1))
+    append_records(path, writer, thread("c", 3) + thread("d", 1))
+    writer.flush()
+    # 崩溃: 索引中已有 a、b、c，但检查点只覆盖到 b，恢复时输出文件被截断
+    assert len(read_index_entries(index_path_for(path))) == 3
+    truncate_output(path, checkpoint_offset)
+
+    writer = ThreadIndexWriter(path, append=True, fsync=False)
+    assert len(writer.entries) == 2
+    append_records(path, writer, thread("c", 3) + thread("e", 0))
+    writer.close()
+
+    with ThreadIndex(path) as index:
+        assert len(index) == 4
+        assert ids(index.thread("a")) == ["a", "a.0", "a.1"]
+        assert ids(index.thread("c")) == ["c", "c.0", "c.1", "c.2"]
+        assert index.thread("d") == []
+        assert ids(index.top_threads(1)[0]) == ["c", "c.0", "c.1", "c.2"]
+
+
+def test_recover_scans_records_written_after_last_flush(tmp_path):
+    path = str(tmp_path / "comments.jsonl")
+    writer = ThreadIndexWriter(path, fsync=False)
+    append_records(path, writer, thread("a", 1))
+    writer.flush()
+    # 只有线程 a 在 flush 时已结束，b 及之后的记录不在索引文件中
+    append_records(path, writer, thread("b", 2) + thread("c", 0, like_count=9))
+
+    writer = ThreadIndexWriter(path, append=True, fsync=False)
+    assert len(writer.entries) == 3
+    writer.close()
+    with ThreadIndex(path) as index:
+        assert ids(index.thread("b")) == ["b", "b.0", "b.1"]
+        assert ids(index.top_threads(1, by="like_count")[0]) == ["c"]
+
+
+def test_recover_rebuilds_invalid_index(tmp_path):
+    path = str(tmp_path / "comments.jsonl")
+    writer = ThreadIndexWriter(path, fsync=False)
+    append_records(path, writer, thread("a", 1) + thread("b", 1))
+    writer.close()
+    with open(index_path_for(path), "wb") as f:
+        f.write(b"garbage")
+
+    writer = ThreadIndexWriter(path, append=True, fsync=False)
+    writer.close()
+    with ThreadIndex(path) as index:
+        assert len(index) == 2
+        assert ids(index.thread("b")) == ["b", "b.0"]
@@ -0,0 +1,36 @@
+from tiktok_fields import CommentFieldExtractor
+
+
+class Comment:
+    def __init__(self, raw):
+        self.as_dict = raw
+
+
+def test_missing_field_on_first_comment_is_not_cached():
+    extractor = CommentFieldExtractor()
+    first = Comment({"cid": "1", "text": "first"})
+    second = Comment({"cid": "2", "text": "second", "reply_comment_total": 3, "create_time": 1700000000,
+                      "user": {"unique_id": "someone"}})
+
+    assert extractor.get(first, "reply_count") == 0
+    assert extractor.get(first, "user") is None
+    assert extractor.get(second, "reply_count") == 3
+    assert extractor.extract(second)["user"] == "someone"
+    assert extractor.extract(second)["create_time"] == 1700000000
+
+
+def test_cached_path_falls_back_to_alternative_path():
+    extractor = CommentFieldExtractor()
+    assert extractor.get(Comment({"cid": "1", "digg_count": 5}), "like_count") == 5
+    assert extractor.get(Comment({"cid": "2", "diggCount": 7}), "like_count") == 7
+    assert extractor.get(Comment({"cid": "3"}), "like_count") == 0
+    assert extractor.get(Comment({"cid": "4", "digg_count": 9}), "like_count") == 9
+
+
+def test_attribute_fallback_without_raw_dict():
+    class Plain:
+        id = "5"
+        text = "hello"
+        likes_count = 2
+
+    assert CommentFieldExtractor().extract(Plain())["like_count"] == 2
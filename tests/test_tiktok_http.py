@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+import tiktok_comments_scraper as scraper
+from fake_tiktok import FakeTikTokSource, synthetic_tiktok_fixture
+from rate_limiter import AsyncThrottle
+from stub_tiktok import StubTikTokServer
+from tiktok_http import MAX_REJECTIONS, HttpVideo, TikTokHttpClient
+from tiktok_session_pool import TikTokSessionPool
+
+VIDEO_ID = "7300000000000000000"
+
+
+@pytest.fixture
+def fixture():
+    return synthetic_tiktok_fixture(95, seed=7)
+
+
+def crawl_http(fixture, server, count=None, cursor=0, sign=True):
+    """通过 HttpVideo 翻页读取主评论，返回 (评论ID列表, HttpVideo, 数据源)"""
+    source = FakeTikTokSource(fixture, base_url=server.base_url)
+
+    async def run():
+        api = source()
+        await api.create_sessions(num_sessions=1)
+        client = await TikTokHttpClient.bootstrap(api, api.sessions[0], session_index=0)
+        if not sign:
+            client.signer = None
+        video = HttpVideo(client, VIDEO_ID, api, api.video(url=VIDEO_ID))
+        try:
+            ids = [comment.id async for comment in video.comments(count=count or len(fixture["comments"]),
+                                                                     cursor=cursor)]
+        finally:
+            client.close()
+        return ids, video
+
+    ids, video = asyncio.run(run())
+    return ids, video, source
+
+
+def fixture_ids(fixture, start=0, end=None):
+    return [raw["cid"] for raw in fixture["comments"][start:end]]
+
+
+def test_pagination_reads_every_page(fixture):
+    with StubTikTokServer(fixture) as server:
+        ids, video, source = crawl_http(fixture, server)
+    assert ids == fixture_ids(fixture)
+    assert server.requests["comment_list"] == 5
+    assert server.requests["unsigned"] == 0
+    assert source.signatures == 5
+    assert video.fallbacks == 0 and source.requests == 0
+
+
+def test_pagination_starts_from_cursor_and_stops_at_count(fixture):
+    with StubTikTokServer(fixture) as server:
+        ids, _, _ = crawl_http(fixture, server, count=30, cursor=40)
+    assert ids == fixture_ids(fixture, 40, 70)
+
+
+def test_rejection_hands_cursor_to_browser(fixture):
+    # 两页之后开始返回验证码页面，浏览器从第三页的游标继续，不丢失也不重复
+    with StubTikTokServer(fixture, reject_after=2) as server:
+        ids, video, source = crawl_http(fixture, server)
+    assert ids == fixture_ids(fixture)
+    assert server.requests["comment_list"] == 2
+    assert server.requests["rejected"] == 1
+    assert video.fallbacks == 1
+    assert source.requests == 3  # 浏览器路径请求剩下的 55 条 (3 页)
+
+
+def test_unsigned_requests_are_rejected(fixture):
+    with StubTikTokServer(fixture) as server:
+        ids, video, source = crawl_http(fixture, server, sign=False)
+    assert ids == fixture_ids(fixture)
+    assert server.requests["unsigned"] == 1
+    assert server.requests["comment_list"] == 0
+    assert video.fallbacks == 1
+
+
+def test_get_comments_http_mode_with_replies(fixture):
+    with StubTikTokServer(fixture, reject_after=12) as server:
+        source = FakeTikTokSource(fixture, base_url=server.base_url)
+        stats = {}
+
+        async def crawl():
+            async with TikTokSessionPool(num_sessions=1, sleep_after=0, api_factory=source) as pool:
+                return await scraper.get_comments(f"https://www.tiktok.com/@user/video/{VIDEO_ID}", count=95,
+                                                  pool=pool, stats=stats, throttle=AsyncThrottle(), http_mode=True)
+
+        records = asyncio.run(crawl())
+    # 与 TikTokApi 的 Comment.replies() 一样，不指定 count 时每条评论只取一页回复
+    expected_replies = sum(min(len(replies), 20) for replies in fixture["replies"].values())
+    assert stats["error"] is None
+    assert stats["total_comments"] == 95 + expected_replies
+    assert len({record.id for record in records}) == len(records)
+    assert server.requests["rejected"] >= 1
+    assert server.requests["comment_list"] + server.requests["reply_list"] == 12
+
+
+def test_client_is_disabled_after_consecutive_rejections(fixture):
+    with StubTikTokServer(fixture, reject_after=0) as server:
+        source = FakeTikTokSource(fixture, base_url=server.base_url)
+
+        async def run():
+            api = source()
+            await api.create_sessions(num_sessions=1)
+            client = await TikTokHttpClient.bootstrap(api, api.sessions[0], session_index=0)
+            video = HttpVideo(client, VIDEO_ID, api, api.video(url=VIDEO_ID))
+            for _ in range(MAX_REJECTIONS + 1):
+                [comment async for comment in video.comments(count=20)]
+            client.close()
+            return client
+
+        client = asyncio.run(run())
+    assert client.disabled
+    assert server.requests["rejected"] == MAX_REJECTIONS
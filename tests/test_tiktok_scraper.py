@@ -0,0 +1,79 @@
+import asyncio
+import json
+import os
+
+import tiktok_batch
+import tiktok_comments_scraper as scraper
+from fake_tiktok import FakeTikTokSource, synthetic_tiktok_fixture
+from rate_limiter import AsyncThrottle
+from tiktok_session_pool import TikTokSessionPool
+
+VIDEO_URLS = [f"https://www.tiktok.com/@user/video/73000000000000000{i:02d}" for i in range(3)]
+
+
+def read_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_concurrent_videos_write_separate_files():
+    fixture = synthetic_tiktok_fixture(30, seed=1)
+    source = FakeTikTokSource(fixture)
+
+    async def crawl():
+        async with TikTokSessionPool(num_sessions=len(VIDEO_URLS), sleep_after=0, api_factory=source) as pool:
+            return await asyncio.gather(*(tiktok_batch.crawl_video(url, pool, count=30, throttle=AsyncThrottle())
+                                          for url in VIDEO_URLS))
+
+    entries = asyncio.run(crawl())
+    output_files = [entry["output_file"] for entry in entries]
+    assert len(set(output_files)) == len(VIDEO_URLS)
+    for url, entry in zip(VIDEO_URLS, entries):
+        assert entry["error"] is None
+        assert scraper.get_video_id_from_url(url) in os.path.basename(entry["output_file"])
+        records = read_jsonl(entry["output_file"])
+        assert len(records) == entry["total_comments"]
+        assert len({record["id"] for record in records}) == len(records)
+
+
+def test_max_matches_is_checked_per_comment():
+    from comment_filter import CommentFilter
+
+    fixture = synthetic_tiktok_fixture(60, seed=2)
+    for raw in fixture["comments"] + [reply for replies in fixture["replies"].values() for reply in replies]:
+        raw["text"] = "nothing here"
+    fixture["comments"][0]["text"] = "needle"
+    fixture["comments"][1]["text"] = "needle"
+    source = FakeTikTokSource(fixture)
+    stats = {}
+
+    async def crawl():
+        async with TikTokSessionPool(num_sessions=1, sleep_after=0, api_factory=source) as pool:
+            await scraper.get_comments(VIDEO_URLS[0], count=60, pool=pool, stats=stats, throttle=AsyncThrottle(),
+                                       comment_filter=CommentFilter(["needle"]), max_matches=1)
+
+    asyncio.run(crawl())
+    assert stats["comment_count"] == 1
+    assert [record["id"] for record in read_jsonl(stats["output_file"])] == [fixture["comments"][0]["cid"]]
+    # 只读取了第一页主评论，没有继续翻页
+    assert source.requests <= 1 + 10
+
+
+def test_empty_reply_page_does_not_slow_down_pacer():
+    from rate_limiter import AdaptivePacer
+
+    fixture = synthetic_tiktok_fixture(1, seed=3)
+    fixture["comments"][0]["reply_comment_total"] = 3
+    fixture["replies"] = {}
+    pacer = AdaptivePacer("tiktok", rate=50, max_rate=50, burst=50, success_window=10 ** 6, state_file=None)
+    stats = {}
+
+    async def crawl():
+        async with TikTokSessionPool(num_sessions=1, sleep_after=0, api_factory=FakeTikTokSource(fixture)) as pool:
+            await scraper.get_comments(VIDEO_URLS[0], count=1, pool=pool, stats=stats,
+                                       throttle=AsyncThrottle(pacer=pacer))
+
+    asyncio.run(crawl())
+    assert stats["comment_count"] == 1
+    assert pacer.throttle_count == 0
+    assert pacer.rate == 50
@@ -0,0 +1,107 @@
+import time
+
+import pytest
+
+from work_queue import DEAD, DONE, LEASED, PENDING, QueueServer, RemoteWorkQueue, WorkQueue
+
+VIDEOS = ["https://www.youtube.com/watch?v=aaaaaaaaaaa", "bbbbbbbbbbb", "ccccccccccc"]
+
+
+@pytest.fixture
+def queue(tmp_path):
+    with WorkQueue(str(tmp_path / "queue.db"), lease_seconds=60, max_attempts=2, retry_delay=0) as queue:
+        yield queue
+
+
+def states(queue, platform="youtube"):
+    return queue.stats()["platforms"][platform]
+
+
+def test_enqueue_deduplicates_by_video_id(queue):
+    assert queue.enqueue("youtube", VIDEOS + ["", "https://youtu.be/bbbbbbbbbbb"]) == 3
+    assert queue.enqueue("youtube", ["aaaaaaaaaaa"]) == 0
+    assert queue.pending() == 3
+    with pytest.raises(ValueError):
+        queue.enqueue("vimeo", ["x"])
+
+
+def test_concurrent_workers_never_share_an_item(queue):
+    queue.enqueue("youtube", VIDEOS)
+    first = queue.lease("w1", limit=2)
+    second = queue.lease("w2", limit=2)
+    assert [item["video"] for item in first] == VIDEOS[:2]
+    assert [item["video"] for item in second] == VIDEOS[2:]
+    assert queue.lease("w3") == []
+    assert states(queue)[LEASED] == 3
+
+
+def test_complete_and_lost_lease(queue):
+    queue.enqueue("youtube", VIDEOS[:1])
+    [item] = queue.lease("w1")
+    assert queue.heartbeat([item["id"]], "w2") == [item["id"]]
+    assert queue.complete(item["id"], "w2") is False
+    assert queue.complete(item["id"], "w1", {"comment_count": 5}) is True
+    assert states(queue)[DONE] == 1
+    assert queue.items(state=DONE)[0]["result"] == {"comment_count": 5}
+
+
+def test_fail_retries_then_goes_dead(queue):
+    queue.enqueue("youtube", VIDEOS[:1])
+    [item] = queue.lease("w1")
+    assert queue.fail(item["id"], "w1", "network") == PENDING
+    [item] = queue.lease("w1")
+    assert item["attempts"] == 2
+    assert queue.fail(item["id"], "w1", "network") == DEAD
+    assert queue.fail(item["id"], "w1", "network") is None
+
+    assert queue.requeue_dead("youtube") == 1
+    assert queue.lease("w1")[0]["attempts"] == 1
+
+
+def test_permanent_failure_skips_retries(queue):
+    queue.enqueue("youtube", VIDEOS[:1])
+    [item] = queue.lease("w1")
+    assert queue.fail(item["id"], "w1", "video_not_found", retry=False) == DEAD
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    with WorkQueue(str(tmp_path / "queue.db"), lease_seconds=0.05, max_attempts=2) as queue:
+        queue.enqueue("youtube", VIDEOS[:1])
+        queue.lease("w1")
+        time.sleep(0.1)
+        [item] = queue.lease("w2")
+        assert item["attempts"] == 2
+        time.sleep(0.1)
+        # 第二次过期时已达到最大尝试次数
+        assert queue.lease("w3") == []
+        assert states(queue)[DEAD] == 1
+
+
+def test_release_does_not_count_attempt(queue):
+    queue.enqueue("youtube", VIDEOS[:1])
+    [item] = queue.lease("w1")
+    queue.release([item["id"]], "w1")
+    assert queue.lease("w2")[0]["attempts"] == 1
+
+
+def test_platform_cap_limits_active_leases(queue):
+    queue.enqueue("youtube", VIDEOS)
+    queue.set_cap("youtube", 1)
+    assert len(queue.lease("w1", limit=3)) == 1
+    assert queue.lease("w2") == []
+    queue.set_cap("youtube", None)
+    assert len(queue.lease("w2", limit=3)) == 2
+
+
+def test_remote_queue_matches_local(queue):
+    server = QueueServer(queue, host="127.0.0.1", port=0).start()
+    try:
+        host, port = server.address
+        remote = RemoteWorkQueue(f"http://{host}:{port}")
+        assert remote.enqueue("youtube", VIDEOS[:2]) == 2
+        [item] = remote.lease("w1")
+        assert remote.complete(item["id"], "w1") is True
+        assert remote.pending() == 1
+        assert remote.stats()["platforms"]["youtube"][DONE] == 1
+    finally:
+        server.stop()
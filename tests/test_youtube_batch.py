@@ -0,0 +1,52 @@
+import json
+import os
+
+import youtube_batch
+from stub_youtube import StubYouTubeServer, synthetic_youtube_fixture
+from youtube_client import YouTubeClient
+from youtube_key_pool import ApiKeyPool
+
+ERROR_BODY = {"error": {"errors": [{"reason": "backendError"}], "message": "backend error"}}
+
+
+class FailingVideosServer(StubYouTubeServer):
+    """videos.list 总是返回 500 的模拟服务器"""
+
+    def handle(self, resource, params):
+        if resource == "videos":
+            return 500, ERROR_BODY
+        return super().handle(resource, params)
+
+
+def test_batch_continues_when_video_info_request_fails():
+    fixture = synthetic_youtube_fixture(30, seed=5)
+    with FailingVideosServer(fixture) as server:
+        key_pool = ApiKeyPool(["test-key"], daily_budget=10 ** 9, state_file=None,
+                              client=YouTubeClient(api_base=server.api_base))
+        manifest = youtube_batch.run_batch([fixture["video_id"]], key_pool=key_pool, workers=1, rate=0,
+                                           adaptive=False, manifest_path="manifest.json", count=30)
+
+    assert manifest["skipped"] == [] and manifest["deferred"] == []
+    [entry] = manifest["videos"]
+    assert entry["error"] is None
+    assert entry["comment_count"] == 30
+    assert os.path.exists(entry["output_file"])
+
+
+def test_batch_stops_cleanly_when_quota_is_exhausted(tmp_path):
+    fixture = synthetic_youtube_fixture(10, seed=5)
+    state_file = str(tmp_path / "quota.json")
+    with StubYouTubeServer(fixture) as server:
+        key_pool = ApiKeyPool(["test-key"], daily_budget=0, state_file=state_file,
+                              client=YouTubeClient(api_base=server.api_base))
+        videos = [fixture["video_id"], "https://youtu.be/aaaaaaaaaaa"]
+        manifest = youtube_batch.run_batch(videos, key_pool=key_pool, workers=1, rate=0, adaptive=False,
+                                           manifest_path="manifest.json")
+        requests = dict(server.requests)
+
+    assert manifest["videos"] == []
+    assert manifest["deferred"] == videos
+    assert requests == {"commentThreads": 0, "comments": 0, "videos": 0}
+    assert os.path.exists(state_file)
+    with open("manifest.json", "r", encoding="utf-8") as f:
+        assert json.load(f)["deferred"] == videos
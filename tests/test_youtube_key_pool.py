@@ -0,0 +1,125 @@
+import json
+
+import pytest
+
+import youtube_key_pool
+from youtube_client import YouTubeApiError
+from youtube_key_pool import ApiKeyPool, QuotaExhausted, key_fingerprint
+
+
+@pytest.fixture
+def today(monkeypatch):
+    day = {"value": "2024-01-01"}
+    monkeypatch.setattr(youtube_key_pool, "quota_day", lambda: day["value"])
+    return day
+
+
+def make_pool(keys=("k1", "k2"), daily_budget=3, state_file=None):
+    return ApiKeyPool(list(keys), daily_budget=daily_budget, state_file=state_file, client=object())
+
+
+def test_roll_day_resets_usage_and_saves(today, tmp_path):
+    state_file = str(tmp_path / "quota.json")
+    pool = make_pool(state_file=state_file)
+    pool.charge("k1", "commentThreads.list")
+    pool.mark_exhausted("k2")
+    assert pool.remaining() == 2
+
+    today["value"] = "2024-01-02"
+    assert pool.used("k1") == 0
+    assert pool.remaining() == 6
+    with open(state_file, "r", encoding="utf-8") as f:
+        assert json.load(f) == {"date": "2024-01-02", "used": {}}
+    assert pool.report()["date"] == "2024-01-02"
+
+
+def test_load_keeps_only_todays_counts(today, tmp_path):
+    state_file = str(tmp_path / "quota.json")
+    make_pool(state_file=state_file).mark_exhausted("k1")
+    assert make_pool(state_file=state_file).used("k1") == 3
+
+    today["value"] = "2024-01-02"
+    assert make_pool(state_file=state_file).used("k1") == 0
+
+
+def test_state_file_does_not_store_keys(today, tmp_path):
+    state_file = str(tmp_path / "quota.json")
+    pool = make_pool(state_file=state_file)
+    pool.charge("k1", "videos.list")
+    pool.flush()
+    with open(state_file, "r", encoding="utf-8") as f:
+        assert json.load(f)["used"] == {key_fingerprint("k1"): 1}
+
+
+def test_execute_switches_key_on_quota_error(today):
+    pool = make_pool()
+    calls = []
+
+    def call(key):
+        calls.append(key)
+        if key == "k1":
+            raise YouTubeApiError(403, "quotaExceeded")
+        return {"items": []}
+
+    assert pool.execute("commentThreads.list", call) == {"items": []}
+    assert calls == ["k1", "k2"]
+    assert pool.used("k1") == 3 and pool.used("k2") == 1
+
+
+def test_execute_raises_when_all_keys_are_used(today):
+    pool = make_pool(daily_budget=1)
+    pool.execute("comments.list", lambda key: {})
+    pool.execute("comments.list", lambda key: {})
+    with pytest.raises(QuotaExhausted):
+        pool.execute("comments.list", lambda key: {})
+
+
+def test_execute_reraises_other_errors_and_charges(today):
+    pool = make_pool()
+
+    def call(key):
+        raise YouTubeApiError(404, "videoNotFound")
+
+    with pytest.raises(YouTubeApiError):
+        pool.execute("comments.list", call)
+    assert pool.used("k1") == 1
+
+
+def test_pools_sharing_state_file_add_up_usage(today, tmp_path):
+    state_file = str(tmp_path / "quota.json")
+    first = make_pool(daily_budget=100, state_file=state_file)
+    second = make_pool(daily_budget=100, state_file=state_file)
+    for _ in range(3):
+        first.charge("k1", "comments.list")
+    for _ in range(5):
+        second.charge("k1", "comments.list")
+    first.flush()
+    second.flush()
+
+    with open(state_file, "r", encoding="utf-8") as f:
+        assert json.load(f)["used"] == {key_fingerprint("k1"): 8}
+    # 保存时读回其他进程的用量
+    assert second.used("k1") == 8
+    first.flush()
+    assert first.used("k1") == 8
+
+    first.mark_exhausted("k2")
+    second.charge("k2", "comments.list")
+    second.flush()
+    assert second.remaining("k2") == 0
+
+
+def test_stale_pool_does_not_overwrite_next_day(today, tmp_path):
+    state_file = str(tmp_path / "quota.json")
+    stale = make_pool(state_file=state_file)
+    stale.charge("k1", "comments.list")
+
+    today["value"] = "2024-01-02"
+    make_pool(state_file=state_file).charge("k2", "comments.list")
+    make_pool(state_file=state_file).flush()
+    # stale 仍停留在前一天 (没有经过 _roll_day) 时保存
+    with stale._lock:
+        stale._save()
+
+    with open(state_file, "r", encoding="utf-8") as f:
+        assert json.load(f)["date"] == "2024-01-02"
@@ -0,0 +1,171 @@
+import json
+import time
+
+import pytest
+
+import youtube_comments_scraper as scraper
+from comment_stream import stream_youtube_pages
+from stub_youtube import StubYouTubeServer, synthetic_youtube_fixture
+from youtube_client import YouTubeClient
+from youtube_key_pool import ApiKeyPool
+
+
+def read_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+@pytest.fixture
+def fixture():
+    return synthetic_youtube_fixture(250, seed=3)
+
+
+@pytest.fixture
+def server(fixture):
+    with StubYouTubeServer(fixture) as server:
+        yield server
+
+
+def make_key_pool(server):
+    return ApiKeyPool(["test-key"], daily_budget=10 ** 9, state_file=None,
+                      client=YouTubeClient(api_base=server.api_base))
+
+
+def expected_ids(fixture, threads=None):
+    ids = []
+    for thread in fixture["threads"][:threads]:
+        ids.append(thread["id"])
+        ids.extend(reply["id"] for reply in fixture["replies"].get(thread["id"], []))
+    return ids
+
+
+def test_get_comments_writes_threads_in_order(fixture, server):
+    stats = {}
+    returned = scraper.get_comments(fixture["video_id"], count=250, key_pool=make_key_pool(server),
+                                    stats=stats, adaptive=False, keep_records=False)
+
+    assert returned == []
+    assert stats["error"] is None
+    assert stats["comment_count"] == 250
+    records = read_jsonl(stats["output_file"])
+    assert [record["id"] for record in records] == expected_ids(fixture)
+    assert stats["total_comments"] == len(records)
+
+
+def test_get_comments_and_stream_share_reader(fixture, server):
+    stats = {}
+    returned = scraper.get_comments(fixture["video_id"], count=120, key_pool=make_key_pool(server),
+                                    stats=stats, adaptive=False)
+    pages = list(stream_youtube_pages(fixture["video_id"], count=120, key_pool=make_key_pool(server)))
+
+    streamed = [record["id"] for page in pages for record in page]
+    assert [record.id for record in returned] == streamed == expected_ids(fixture, 120)
+    # 数量上限落在第二页中间，最后一页的游标指向之后的评论
+    assert [page.cursor for page in pages] == ["100", "200"]
+
+
+def test_get_comments_resumes_after_quota_exhausted(fixture, server):
+    stats = {}
+    key_pool = ApiKeyPool(["test-key"], daily_budget=20, state_file=None,
+                          client=YouTubeClient(api_base=server.api_base))
+    scraper.get_comments(fixture["video_id"], count=250, key_pool=key_pool, stats=stats, adaptive=False)
+    assert stats["error"] == "quota_exhausted"
+    assert stats["comment_count"] < 250
+    output_file = stats["output_file"]
+
+    scraper.get_comments(fixture["video_id"], count=250, output_filename=output_file, resume=True,
+                         key_pool=make_key_pool(server), stats=stats, adaptive=False)
+
+    assert stats["error"] is None
+    assert stats["comment_count"] == 250
+    assert [record["id"] for record in read_jsonl(output_file)] == expected_ids(fixture)
+
+
+def test_max_matches_stops_submitting_replies_and_pages(fixture):
+    from comment_filter import CommentFilter
+
+    threads = fixture["threads"]
+    for thread in threads:
+        thread["snippet"]["topLevelComment"]["snippet"]["textDisplay"] = "nothing here"
+    threads[0]["snippet"]["topLevelComment"]["snippet"]["textDisplay"] = "needle"
+    window = 2 * 2  # reply_workers 的 2 倍
+    # 只有前 window 个线程中内联不完整的那些才可能请求回复
+    bound = sum(-(-thread["snippet"]["totalReplyCount"] // 100) for thread in threads[:window]
+                if thread["snippet"]["totalReplyCount"] > 5)
+
+    stats = {}
+    with StubYouTubeServer(fixture) as server:
+        scraper.get_comments(fixture["video_id"], count=250, key_pool=make_key_pool(server), stats=stats,
+                             adaptive=False, reply_workers=2, comment_filter=CommentFilter(["needle"]),
+                             max_matches=1)
+        # 线程池关闭时不等待，给已提交的请求留出完成的时间再统计
+        time.sleep(0.5)
+        requests = dict(server.requests)
+
+    assert stats["comment_count"] == 1
+    assert stats["total_comments"] == 1
+    assert requests["commentThreads"] == 1
+    assert requests["comments"] <= bound
+
+
+def test_filter_writes_parent_of_matching_reply(fixture, server):
+    from comment_filter import CommentFilter
+
+    thread = next(thread for thread in fixture["threads"] if thread["snippet"]["totalReplyCount"] > 5)
+    for other in fixture["threads"]:
+        other["snippet"]["topLevelComment"]["snippet"]["textDisplay"] = "nothing here"
+    for reply in fixture["replies"].values():
+        for item in reply:
+            item["snippet"]["textDisplay"] = "nothing here"
+    fixture["replies"][thread["id"]][-1]["snippet"]["textDisplay"] = "needle"
+
+    stats = {}
+    scraper.get_comments(fixture["video_id"], count=250, key_pool=make_key_pool(server), stats=stats,
+                         adaptive=False, comment_filter=CommentFilter(["needle"]))
+
+    records = read_jsonl(stats["output_file"])
+    assert [record["id"] for record in records] == [thread["id"], fixture["replies"][thread["id"]][-1]["id"]]
+    assert records[1]["parent_id"] == records[0]["id"]
+
+
+def test_thread_without_reply_count_is_logged(fixture, server, caplog):
+    thread = next(thread for thread in fixture["threads"] if thread["snippet"]["totalReplyCount"] > 5)
+    del thread["snippet"]["totalReplyCount"]
+
+    stats = {}
+    with caplog.at_level("WARNING", logger="comment_stream"):
+        scraper.get_comments(fixture["video_id"], count=250, key_pool=make_key_pool(server), stats=stats,
+                             adaptive=False)
+
+    assert stats["error"] is None
+    assert thread["id"] in caplog.text
+    ids = [record["id"] for record in read_jsonl(stats["output_file"])]
+    reply_ids = {reply["id"] for reply in fixture["replies"][thread["id"]]}
+    assert thread["id"] in ids and not reply_ids & set(ids)
+    assert len(ids) == len(expected_ids(fixture)) - len(reply_ids)
+
+
+def test_retries_are_counted_per_endpoint(server, monkeypatch):
+    import metrics
+
+    monkeypatch.setattr(scraper.time, "sleep", lambda seconds: None)
+    key_pool = make_key_pool(server)
+    failures = {"commentThreads.list": 1, "comments.list": 2}
+
+    def flaky(method, func):
+        def call(key, **kwargs):
+            if failures[method]:
+                failures[method] -= 1
+                raise ConnectionError("connection reset")
+            return func(key, **kwargs)
+        return call
+
+    metrics.registry.reset()
+    scraper.call_api(key_pool, "commentThreads.list", flaky("commentThreads.list", key_pool.client.comment_threads),
+                     {"part": "snippet", "videoId": "benchVideo1"})
+    scraper.call_api(key_pool, "comments.list", flaky("comments.list", key_pool.client.comments),
+                     {"part": "snippet", "parentId": "x"})
+
+    assert metrics.registry.total("scraper_retries_total", endpoint="commentThreads") == 1
+    assert metrics.registry.total("scraper_retries_total", endpoint="comments") == 2
+    assert metrics.registry.total("scraper_retries_total", endpoint="call") == 0
@@ -0,0 +1,45 @@
+import pytest
+
+import youtube_watch
+from youtube_watch import WatchScheduler, WatchedVideo, poll_video
+
+
+def thread(comment_id, published):
+    snippet = {"textDisplay": f"text {comment_id}", "likeCount": 0}
+    if published is not None:
+        snippet["publishedAt"] = published
+    return {"id": comment_id, "snippet": {"topLevelComment": {"id": comment_id, "snippet": snippet},
+                                          "totalReplyCount": 0}}
+
+
+@pytest.fixture
+def pages(monkeypatch):
+    pages = []
+    monkeypatch.setattr(youtube_watch.scraper, "fetch_comment_threads",
+                        lambda key_pool, kwargs, page_token, limiter: {"items": pages})
+    return pages
+
+
+def test_is_seen_compares_with_high_water_mark():
+    video = WatchedVideo("v", hwm_time="2024-01-01T00:00:10Z", hwm_ids=["b"])
+    assert video.is_seen("2024-01-01T00:00:09Z", "x")
+    assert video.is_seen("2024-01-01T00:00:10Z", "b")
+    assert not video.is_seen("2024-01-01T00:00:10Z", "c")
+    assert not video.is_seen("2024-01-01T00:00:11Z", "x")
+
+
+def test_comment_without_timestamp_is_emitted_once(pages):
+    video = WatchedVideo("v", hwm_time="2024-01-01T00:00:10Z", hwm_ids=["old"])
+    pages[:] = [thread("new", "2024-01-01T00:00:20Z"), thread("untimed", None), thread("blank", ""),
+                thread("old", "2024-01-01T00:00:10Z")]
+
+    result = poll_video(video, key_pool=None)
+    assert [record["id"] for record in result["records"]] == ["new", "untimed", "blank"]
+    assert result["reached"]
+    assert result["newest_time"] == "2024-01-01T00:00:20Z"
+    assert result["oldest_time"] == "2024-01-01T00:00:20Z"
+
+    WatchScheduler({"v": video}, budget=1000).reschedule(video, now=1e9, result=result)
+    assert video.untimed_ids == ["blank", "untimed"]
+    pages.insert(0, thread("newer", "2024-01-01T00:00:30Z"))
+    assert [record["id"] for record in poll_video(video, key_pool=None)["records"]] == ["newer"]
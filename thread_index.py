@@ -0,0 +1,430 @@
+"""
+评论线程索引
+
+JSON Lines 输出中每个主评论后面紧跟它的全部回复，一个线程在文件中是一段连续的字节。
+线程索引 (与输出文件同名、后缀为 .tidx 的二进制文件) 记录每个线程的起始位置和长度，
+读取时把索引和输出文件都映射到内存，按线程ID二分查找，只读取该线程的字节，不需要扫描整个文件。
+
+索引文件格式 (小端):
+    文件头 16 字节: magic "TIDX"、版本 (uint16)、标志 (uint16，1 表示已按键排序)、线程数 (uint64)
+    每个线程 32 字节: 线程ID的 8 字节 BLAKE2b 摘要 (uint64)、起始位置 (uint64)、长度 (uint32)、
+                     记录数 (uint32)、主评论点赞数 (uint32)、4 字节填充
+
+用法:
+    python thread_index.py build data/youtube/youtube_xxx.jsonl
+    python thread_index.py show data/youtube/youtube_xxx.jsonl THREAD_ID
+    python thread_index.py top data/youtube/youtube_xxx.jsonl -n 20 --by records
+"""
+import argparse
+import hashlib
+import heapq
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+
+logger = logging.getLogger(__name__)
+
+# 索引文件的后缀 (xxx.jsonl -> xxx.jsonl.tidx)
+INDEX_SUFFIX = ".tidx"
+
+MAGIC = b"TIDX"
+VERSION = 1
+
+# 文件头标志: 线程记录已按键排序，可以二分查找
+FLAG_SORTED = 1
+
+HEADER = struct.Struct("<4sHHQ")
+ENTRY = struct.Struct("<QQIII4x")
+
+MAX_UINT32 = 0xFFFFFFFF
+
+# top 子命令可用的排序字段 (线程记录中的字段)
+TOP_FIELDS = ("records", "like_count")
+
+
+def index_path_for(file_path):
+    """根据 JSON Lines 输出文件路径得到线程索引路径"""
+    return file_path + INDEX_SUFFIX
+
+
+def thread_key(thread_id):
+    """线程ID (主评论ID) 对应的 64 位键"""
+    digest = hashlib.blake2b(str(thread_id).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def record_thread_id(record):
+    """评论所属线程的ID: 主评论为自身ID，回复为 parent_id"""
+    parent_id = record.get("parent_id")
+    thread_id = record.get("id") if parent_id is None else parent_id
+    return "" if thread_id is None else str(thread_id)
+
+
+def _clamp_uint32(value):
+    try:
+        return min(max(int(value or 0), 0), MAX_UINT32)
+    except (TypeError, ValueError):
+        return 0
+
+
+def scan_threads(file_path, start=0):
+    """
+    从指定位置开始逐行读取 JSON Lines 文件
+
+    Args:
+        file_path: JSON Lines 文件路径
+        start: 开始读取的字节位置 (必须位于行首)
+
+    Yields:
+        (记录字典, 行的起始位置, 行的字节数)，无法解析的行 (如崩溃时被截断的最后一行) 会被跳过
+    """
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        offset = start
+        for line in f:
+            length = len(line)
+            if line.strip():
+                try:
+                    yield json.loads(line), offset, length
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    logger.warning(f"跳过无法解析的行 {file_path} (位置 {offset})")
+            offset += length
+
+
+class ThreadIndexWriter:
+    """
+    随评论写入生成线程索引
+
+    写入器按顺序传入每条记录及其在输出文件中的位置：主评论开始一个新线程，
+    紧跟其后、parent_id 指向该主评论的回复并入同一线程。不在主评论之后的回复
+    (例如旧版输出中先写回复后写主评论) 单独成为一个线程片段，读取时按线程ID合并。
+
+    flush() 把已结束的线程追加到索引文件并 fsync (应在输出文件落盘之后调用)，
+    close() 时按键排序后原子地重写索引。
+    """
+
+    def __init__(self, file_path, append=False, fsync=True):
+        """
+        Args:
+            file_path: JSON Lines 输出文件路径
+            append: 输出文件是否为追加写入 (断点续抓)，是则先恢复已有的索引
+            fsync: flush() 时是否调用 os.fsync 强制落盘
+        """
+        self.file_path = file_path
+        self.path = index_path_for(file_path)
+        self.fsync = fsync
+        self.entries = []  # 已结束的线程 (key, offset, length, records, like_count)
+        self._current = None  # 正在写入的线程 [thread_id, offset, length, records, like_count]
+        self._persisted = 0  # 已写入索引文件的线程数
+        if append and os.path.exists(file_path):
+            self._recover()
+        self._file = open(self.path, "w+b")
+        self._write_entries(self.entries, flags=0)
+        self._persisted = len(self.entries)
+
+    def _recover(self):
+        """恢复追加写入前的索引: 保留仍在输出文件范围内的线程，再扫描索引之后的部分"""
+        size = os.path.getsize(self.file_path)
+        indexed_end = 0
+        if os.path.exists(self.path):
+            try:
+                for entry in read_index_entries(self.path):
+                    if entry[1] + entry[2] <= size:
+                        self.entries.append(entry)
+                        indexed_end = max(indexed_end, entry[1] + entry[2])
+            except ValueError as e:
+                logger.warning(f"线程索引无效，将重新生成: {str(e)}")
+                self.entries = []
+                indexed_end = 0
+        for record, offset, length in scan_threads(self.file_path, indexed_end):
+            self.add(record, offset, length)
+        self._finish()
+        if self.entries:
+            logger.debug(f"已恢复 {len(self.entries)} 个线程的索引: {self.path}")
+
+    def _write_entries(self, entries, flags):
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, flags, len(entries)))
+        self._file.write(b"".join(ENTRY.pack(*entry) for entry in entries))
+        self._file.truncate()
+
+    def _finish(self):
+        current = self._current
+        if current is None:
+            return
+        self.entries.append((thread_key(current[0]), current[1], min(current[2], MAX_UINT32),
+                             min(current[3], MAX_UINT32), current[4]))
+        self._current = None
+
+    def add(self, record, offset, length):
+        """
+        登记一条已写入的记录
+
+        Args:
+            record: 评论字典 (需要 id、parent_id 和 like_count 字段)
+            offset: 该行在输出文件中的起始位置
+            length: 该行的字节数 (含换行符)
+        """
+        thread_id = record_thread_id(record)
+        current = self._current
+        if record.get("parent_id") is not None and current is not None and current[0] == thread_id \
+                and current[1] + current[2] == offset:
+            current[2] += length
+            current[3] += 1
+            return
+        self._finish()
+        like_count = _clamp_uint32(record.get("like_count")) if record.get("parent_id") is None else 0
+        self._current = [thread_id, offset, length, 1, like_count]
+
+    def flush(self):
+        """把已结束的线程追加到索引文件"""
+        new_entries = self.entries[self._persisted:]
+        if not new_entries:
+            return
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(b"".join(ENTRY.pack(*entry) for entry in new_entries))
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, 0, len(self.entries)))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._persisted = len(self.entries)
+
+    def close(self):
+        """结束最后一个线程，按键排序后原子地重写索引文件"""
+        if self._file.closed:
+            return
+        self._finish()
+        self._file.close()
+        self.entries.sort()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, FLAG_SORTED, len(self.entries)))
+            f.write(b"".join(ENTRY.pack(*entry) for entry in self.entries))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._persisted = len(self.entries)
+
+
+def _read_header(data, path):
+    if len(data) < HEADER.size:
+        raise ValueError(f"线程索引文件过短: {path}")
+    magic, version, flags, count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"不是线程索引文件或版本不支持: {path}")
+    # 以文件头中的数量为准 (追加记录后、更新文件头前中断时，多出的记录会被忽略)，文件被截断时以完整的记录数为准
+    count = min(count, (len(data) - HEADER.size) // ENTRY.size)
+    return flags, count
+
+
+def read_index_entries(index_path):
+    """读取索引文件中的全部线程记录 (key, offset, length, records, like_count)"""
+    with open(index_path, "rb") as f:
+        data = f.read()
+    flags, count = _read_header(data, index_path)
+    return list(ENTRY.iter_unpack(data[HEADER.size:HEADER.size + count * ENTRY.size]))
+
+
+def build_index(file_path, fsync=True):
+    """
+    扫描已有的 JSON Lines 文件生成线程索引 (用于旧版输出或索引丢失的文件)
+
+    Returns:
+        索引中的线程数
+    """
+    writer = ThreadIndexWriter(file_path, fsync=fsync)
+    for record, offset, length in scan_threads(file_path):
+        writer.add(record, offset, length)
+    writer.close()
+    return len(writer.entries)
+
+
+class ThreadIndex:
+    """
+    通过线程索引随机读取评论线程
+
+    索引文件和输出文件都以只读方式映射到内存，按线程ID查找时对已排序的索引二分查找，
+    只解析该线程所在的字节范围。未排序的索引 (写入过程中或崩溃后留下的) 先在内存中排序。
+    """
+
+    def __init__(self, file_path, index_path=None):
+        """
+        Args:
+            file_path: JSON Lines 输出文件路径
+            index_path: 线程索引路径，为 None 时使用 file_path + ".tidx"
+        """
+        self.file_path = file_path
+        self.index_path = index_path or index_path_for(file_path)
+        self._index_file = open(self.index_path, "rb")
+        self._index = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        flags, self._count = _read_header(self._index, self.index_path)
+        self._entries = None
+        if not flags & FLAG_SORTED:
+            self._entries = sorted(ENTRY.iter_unpack(self._index[HEADER.size:HEADER.size + self._count * ENTRY.size]))
+
+        self._data_file = open(file_path, "rb")
+        size = os.fstat(self._data_file.fileno()).st_size
+        self._data = mmap.mmap(self._data_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self):
+        return self._count
+
+    def _entry(self, position):
+        if self._entries is not None:
+            return self._entries[position]
+        return ENTRY.unpack_from(self._index, HEADER.size + position * ENTRY.size)
+
+    def entries(self):
+        """按键顺序生成全部线程记录 (key, offset, length, records, like_count)"""
+        if self._entries is not None:
+            return iter(self._entries)
+        return ENTRY.iter_unpack(memoryview(self._index)[HEADER.size:HEADER.size + self._count * ENTRY.size])
+
+    def _lookup(self, key):
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._entry(middle)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        while low < self._count:
+            entry = self._entry(low)
+            if entry[0] != key:
+                break
+            yield entry
+            low += 1
+
+    def _read_range(self, offset, length):
+        records = []
+        for line in self._data[offset:offset + length].splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                logger.warning(f"跳过无法解析的行 {self.file_path} (位置 {offset})")
+        return records
+
+    def thread(self, thread_id):
+        """
+        读取一个线程的全部评论 (主评论在前，回复按写入顺序)
+
+        Args:
+            thread_id: 主评论ID
+
+        Returns:
+            评论字典列表，索引中没有该线程时返回空列表
+        """
+        thread_id = str(thread_id)
+        records = []
+        for entry in sorted(self._lookup(thread_key(thread_id)), key=lambda entry: entry[1]):
+            # 键是摘要，可能冲突，按记录中的线程ID再过滤一次
+            records.extend(record for record in self._read_range(entry[1], entry[2])
+                           if record_thread_id(record) == thread_id)
+        records.sort(key=lambda record: record.get("parent_id") is not None)
+        return records
+
+    def top_threads(self, n=10, by="records"):
+        """
+        读取按记录数或主评论点赞数排序的前 n 个线程
+
+        Args:
+            n: 线程数
+            by: "records" (线程中的评论数) 或 "like_count" (主评论点赞数)
+
+        Returns:
+            [评论字典列表, ...]
+        """
+        if by not in TOP_FIELDS:
+            raise ValueError(f"不支持的排序字段: {by}")
+        field = TOP_FIELDS.index(by) + 3
+        threads = []
+        seen = set()
+        # 多取一些候选，旧版输出中同一线程可能分成多个片段
+        for entry in heapq.nlargest(n * 2, self.entries(), key=lambda entry: entry[field]):
+            records = self._read_range(entry[1], entry[2])
+            if not records:
+                continue
+            thread_id = record_thread_id(records[0])
+            if thread_id in seen:
+                continue
+            seen.add(thread_id)
+            threads.append(self.thread(thread_id))
+            if len(threads) >= n:
+                break
+        return threads
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data_file.close()
+        self._index.close()
+        self._index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _print_thread(records):
+    for record in records:
+        print(json.dumps(record, ensure_ascii=False))
+
+
+def main(argv=None, prog=None):
+    """
+    命令行入口
+
+    Args:
+        argv: 命令行参数 (不含程序名)，为 None 时使用 sys.argv[1:]
+        prog: 帮助信息中显示的程序名
+    """
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(prog=prog, description="评论线程索引: 生成索引、按线程ID读取线程、列出最大的线程")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="COMMAND")
+
+    build = commands.add_parser("build", help="扫描 JSON Lines 文件生成线程索引")
+    build.add_argument("file", help="JSON Lines 输出文件")
+
+    show = commands.add_parser("show", help="输出一个线程的全部评论 (每行一条 JSON)")
+    show.add_argument("file", help="JSON Lines 输出文件")
+    show.add_argument("thread_id", help="主评论ID")
+
+    top = commands.add_parser("top", help="输出前 N 个线程的全部评论")
+    top.add_argument("file", help="JSON Lines 输出文件")
+    top.add_argument("-n", type=int, default=10, help="线程数")
+    top.add_argument("--by", choices=TOP_FIELDS, default="records", help="排序字段: 线程评论数或主评论点赞数")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        threads = build_index(args.file)
+        logger.info(f"已生成 {threads} 个线程的索引: {index_path_for(args.file)}")
+        return 0
+
+    if not os.path.exists(index_path_for(args.file)):
+        logger.error(f"未找到线程索引，请先运行 build: {index_path_for(args.file)}")
+        return 1
+    with ThreadIndex(args.file) as index:
+        if args.command == "show":
+            records = index.thread(args.thread_id)
+            if not records:
+                logger.error(f"索引中没有该线程: {args.thread_id}")
+                return 1
+            _print_thread(records)
+        else:
+            for records in index.top_threads(args.n, args.by):
+                _print_thread(records)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
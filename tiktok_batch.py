@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+
+import tiktok_comments_scraper as scraper
+from batch_utils import write_manifest
+from rate_limiter import AsyncThrottle
+from tiktok_session_pool import TikTokSessionPool
+
+logger = logging.getLogger(__name__)
+
+# TikTok 数据目录
+DATA_DIR = os.path.join("data", "tiktok")
+
+
+async def crawl_video(video_url, pool, **kwargs):
+    """使用会话池抓取单个视频，返回清单条目"""
+    stats = {}
+    started = time.monotonic()
+    try:
+        await scraper.get_comments(video_url, pool=pool, stats=stats, keep_records=False, **kwargs)
+    except Exception as e:
+        stats["error"] = stats.get("error") or str(e)
+    return {
+        "input": video_url,
+        "video_id": scraper.get_video_id_from_url(video_url),
+        "output_file": stats.get("output_file"),
+        "comment_count": stats.get("comment_count", 0),
+        "total_comments": stats.get("total_comments", 0),
+        "seconds": round(time.monotonic() - started, 3),
+        "error": stats.get("error"),
+    }
+
+
+async def run_batch(videos, num_sessions=2, ms_tokens=None, headless=True, browser_type="chromium",
+                    manifest_path=None, throttle=None, debug_mode=False, **kwargs):
+    """
+    使用共享的会话池批量抓取多个 TikTok 视频的评论
+
+    浏览器只启动一次，N 个会话轮流处理视频队列，所有视频共享同一个节流器。
+    每个视频写入自己的输出文件，每完成一个视频就更新汇总清单 (包含每个会话的吞吐量)。
+
+    Args:
+        videos: 视频 URL 列表
+        num_sessions: 会话数量 (即同时抓取的视频数)
+        ms_tokens: ms_token 列表，按顺序分配给各个会话
+        headless: 是否使用无头模式
+        browser_type: 浏览器类型
+        manifest_path: 清单文件路径，为 None 时自动生成
+        throttle: 共享的 AsyncThrottle，为 None 时使用 TikTok 默认配置
+        debug_mode: 是否开启调试模式
+        kwargs: 传给 get_comments 的其他参数 (count, include_replies 等)
+
+    Returns:
+        清单字典
+    """
+    if manifest_path is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        manifest_path = os.path.join(DATA_DIR, f"batch_{timestamp}_manifest.json")
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+
+    if throttle is None:
+        throttle = AsyncThrottle.for_tiktok()
+
+    logger.info(f"批量抓取 {len(videos)} 个视频，会话数 {num_sessions}")
+    logger.info(f"清单将保存到: {manifest_path}")
+
+    started = time.monotonic()
+    results = [None] * len(videos)
+    manifest = {"started_at": datetime.now().isoformat(timespec="seconds"), "videos": results}
+
+    queue = asyncio.Queue()
+    for index, video in enumerate(videos):
+        queue.put_nowait((index, video))
+
+    pool = TikTokSessionPool(num_sessions=num_sessions, ms_tokens=ms_tokens, headless=headless,
+                             browser_type=browser_type, debug_mode=debug_mode)
+    done = 0
+
+    async def worker():
+        nonlocal done
+        while True:
+            try:
+                index, video = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            entry = await crawl_video(video, pool, throttle=throttle, debug_mode=debug_mode, **kwargs)
+            results[index] = entry
+            done += 1
+            if entry["error"]:
+                logger.warning(f"[{done}/{len(videos)}] {entry['input']} 失败: {entry['error']}")
+            else:
+                logger.info(f"[{done}/{len(videos)}] {entry['input']} 完成: {entry['total_comments']} 条评论, {entry['seconds']} 秒")
+            manifest.update(
+                elapsed_seconds=round(time.monotonic() - started, 3),
+                throttled_seconds=round(throttle.slept_seconds, 3),
+                pool=pool.report(),
+            )
+            write_manifest(manifest_path, manifest)
+
+    async with pool:
+        await asyncio.gather(*(worker() for _ in range(pool.size)))
+        manifest["pool"] = pool.report()
+
+    manifest["finished_at"] = datetime.now().isoformat(timespec="seconds")
+    write_manifest(manifest_path, manifest)
+
+    finished = [entry for entry in results if entry is not None]
+    failed = sum(1 for entry in finished if entry["error"])
+    total = sum(entry["total_comments"] for entry in finished)
+    logger.info(f"✅ 批量抓取完成 - {len(finished) - failed} 个成功, {failed} 个失败, 共 {total} 条评论")
+    return manifest
+
+
+async def run_queue_worker(queue, worker_id=None, num_sessions=2, ms_tokens=None, headless=True,
+                           browser_type="chromium", throttle=None, debug_mode=False, idle_exit=True,
+                           poll_interval=10, pool=None, **kwargs):
+    """
+    从共享队列中领取 TikTok 视频并抓取 (多台机器可以同时运行，共享同一个队列)
+
+    浏览器只启动一次，每个会话对应一个协程，各自领取一个视频、抓取、标记结果后再领取下一个。
+    后台线程定期为持有的工作项续约；队列操作在线程池中执行，不阻塞事件循环。
+
+    Args:
+        queue: WorkQueue 或 RemoteWorkQueue
+        worker_id: 工作进程标识，为 None 时使用 主机名:进程号
+        num_sessions: 会话数量 (即本进程同时抓取的视频数)
+        ms_tokens: ms_token 列表，按顺序分配给各个会话
+        headless: 是否使用无头模式
+        browser_type: 浏览器类型
+        throttle: 共享的 AsyncThrottle，为 None 时使用 TikTok 默认配置
+        debug_mode: 是否开启调试模式
+        idle_exit: 队列中没有未完成的 TikTok 视频时是否退出 (为 False 时持续等待新的视频)
+        poll_interval: 没有可领取的视频时的等待间隔 (秒)
+        pool: 已创建的 TikTokSessionPool (由调用方启动和关闭)，为 None 时按上面的参数新建
+        kwargs: 传给 get_comments 的其他参数 (count, include_replies 等)
+
+    Returns:
+        本进程处理的视频数
+    """
+    from work_queue import LEASE_SECONDS, LeaseKeeper, default_worker_id, finish_item
+
+    worker_id = worker_id or default_worker_id()
+    if throttle is None:
+        throttle = AsyncThrottle.for_tiktok()
+    loop = asyncio.get_running_loop()
+
+    def call(method, *args):
+        return loop.run_in_executor(None, method, *args)
+
+    lease_seconds = (await call(queue.stats)).get("lease_seconds", LEASE_SECONDS)
+    owns_pool = pool is None
+    if owns_pool:
+        pool = TikTokSessionPool(num_sessions=num_sessions, ms_tokens=ms_tokens, headless=headless,
+                                 browser_type=browser_type, debug_mode=debug_mode)
+    keeper = LeaseKeeper(queue, worker_id, lease_seconds / 3)
+    processed = 0
+
+    async def worker():
+        nonlocal processed
+        while True:
+            items = await call(queue.lease, worker_id, "tiktok", 1)
+            if not items:
+                if idle_exit and not await call(queue.pending, "tiktok"):
+                    return
+                await asyncio.sleep(poll_interval)
+                continue
+            item = items[0]
+            keeper.hold(item["id"])
+            try:
+                entry = await crawl_video(item["video"], pool, throttle=throttle, debug_mode=debug_mode, **kwargs)
+            except BaseException:
+                # 中断时归还正在抓取的视频 (不计入尝试次数)
+                await asyncio.shield(call(queue.release, [item["id"]], worker_id))
+                raise
+            finally:
+                keeper.drop(item["id"])
+            processed += 1
+            status = await call(finish_item, queue, worker_id, item, entry)
+            logger.info(f"[#{item['id']}] {item['video']} {status}: "
+                        f"{entry['total_comments']} 条评论, {entry['seconds']} 秒")
+
+    with keeper:
+        if owns_pool:
+            await pool.start()
+        logger.info(f"队列工作进程 {worker_id} 已启动，会话数 {pool.size}")
+        try:
+            await asyncio.gather(*(worker() for _ in range(pool.size)))
+        finally:
+            if owns_pool:
+                await pool.close()
+    throttle.save()
+    logger.info(f"✅ 队列工作进程退出 - 处理了 {processed} 个视频")
+    return processed
@@ -1,20 +1,27 @@
 import logging
-from TikTokApi import TikTokApi
 import asyncio
-import json
 import os
 import random
+import re
 from datetime import datetime
 import time
 import sys
 
+import config
+import metrics
+from metrics import METRICS_INTERVAL, MetricsExporter
+from checkpoint import find_checkpoint, load_checkpoint, save_checkpoint, truncate_output
+from comment_filter import load_comment_filter
+from comment_stream import TikTokThreadReader
+from comment_writer import (OUTPUT_FORMATS, JsonlCommentWriter, export_pretty_json, open_comment_writer,
+                            output_path_for)
+from rate_limiter import AsyncThrottle
+from tiktok_session_pool import is_challenge_error, lease_session
+
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# 设置 ms_token (保留但设为可选)
-from config import TIKTOK_MS_TOKEN
-
 
 
 # 常用的用户代理列表
@@ -43,43 +50,15 @@ def debug_object(obj, name="对象"):
     except:
         pass
 
-# 获取点赞数的函数，尝试多种可能的属性名
-def get_like_count(comment):
-    """尝试多种可能的方式获取评论点赞数"""
-    # 可能的属性名称列表
-    like_attrs = ['diggCount', 'likeCount', 'likes', 'like_count', 'likes_count']
-    
-    # 尝试直接访问属性
-    for attr in like_attrs:
-        if hasattr(comment, attr):
-            return getattr(comment, attr)
-    
-    # 尝试访问原始数据
-    if hasattr(comment, 'as_dict'):
-        try:
-            comment_dict = comment.as_dict()
-            for attr in like_attrs:
-                if attr in comment_dict:
-                    return comment_dict[attr]
-        except:
-            pass
-    
-    # 如果有原始数据属性，检查里面的点赞数
-    if hasattr(comment, 'raw_data'):
-        raw_data = comment.raw_data
-        if isinstance(raw_data, dict):
-            for attr in like_attrs:
-                if attr in raw_data:
-                    return raw_data[attr]
-    
-    # 尝试处理特殊情况
-    if hasattr(comment, 'statistics'):
-        stats = comment.statistics
-        if isinstance(stats, dict) and 'digg_count' in stats:
-            return stats['digg_count']
-    
-    # 默认值
-    return 0
+# 从视频URL中提取视频ID
+def get_video_id_from_url(url):
+    """从 TikTok 视频 URL 中提取视频ID，无法识别时返回 None"""
+    match = re.search(r'/video/(\d+)', url)
+    if match:
+        return match.group(1)
+    if re.match(r'^\d+$', url):
+        return url
+    return None
 
 # 创建目录的函数
 def ensure_dir_exists(dir_path):
@@ -92,9 +71,30 @@ def ensure_dir_exists(dir_path):
             logger.error(f"创建目录失败: {str(e)}")
             raise
 
+async def use_http_video(lease, video, video_id):
+    """
+    把浏览器视频对象替换为直接 HTTP 分页的视频对象
+
+    无法创建 HTTP 客户端或无法确定数字视频ID时返回原来的视频对象。
+    """
+    from tiktok_http import HttpVideo
+    
+    aweme_id = str(getattr(video, "id", None) or video_id)
+    if not aweme_id.isdigit():
+        logger.warning(f"无法确定视频ID ({aweme_id})，使用浏览器抓取")
+        return video
+    client = await lease.http_client()
+    if client is None:
+        return video
+    return HttpVideo(client, aweme_id, lease.api, video)
+
 async def get_comments(video_url, count=50, output_filename=None, include_replies=True, 
                       include_user_info=False, include_create_time=False, debug_mode=False,
-                      headless=False, browser_type="chromium", use_ms_token=False):
+                      headless=False, browser_type="chromium", use_ms_token=False,
+                      pretty_json=False, throttle=None, reply_concurrency=4, resume=False,
+                      pool=None, stats=None, store=None, output_format="jsonl", http_mode=False,
+                      shard_size=None, shard_records=None, comment_filter=None, max_matches=None,
+                      keep_records=True):
     """
     抓取指定 TikTok 视频的评论
     
@@ -109,25 +109,53 @@ async def get_comments(video_url, count=50, output_filename=None, include_replie
         headless: 是否使用无头模式 (False则显示浏览器)
         browser_type: 浏览器类型 ("webkit" 或 "chromium")
         use_ms_token: 是否使用 ms_token
+        pretty_json: 抓取结束后是否额外导出带缩进的 JSON 文件
+        throttle: AsyncThrottle 节流器，为 None 时使用 TikTok 默认配置
+        reply_concurrency: 同时获取回复的评论数量
+        resume: 是否从检查点继续上次中断的抓取 (追加到原输出文件)
+        pool: 共享的 TikTokSessionPool，为 None 时临时创建一个单会话的会话池
+        stats: 可选字典，用于返回输出文件、评论数和错误信息 (批量模式生成清单时使用)
+        store: 可选的 CommentStore，评论按ID去重后写入数据库
+        output_format: 输出格式 ("jsonl"、"parquet"、"arrow"、"jsonl.gz" 或 "jsonl.zst")，只有 jsonl 支持断点续抓
+        http_mode: 是否在浏览器会话创建后直接通过 HTTP 分页请求评论和回复 (被拒绝时改用浏览器)
+        shard_size: 压缩分片格式 (jsonl.gz/jsonl.zst) 每个分片压缩后的大小上限 (字节)
+        shard_records: 压缩分片格式每个分片的记录数上限
+        comment_filter: 可选的 CommentFilter，只写出文本匹配的评论和回复 (有回复匹配时主评论作为上下文一起写出，
+            count 仍按检查过的主评论计算)
+        max_matches: 匹配过滤条件的评论 (包含回复) 达到该数量后停止抓取 (每写完一个线程检查一次)
+        keep_records: 是否在内存中保留写出的评论并返回 (命令行和批量模式只写文件，传入 False)
+
+    Returns:
+        写出的评论列表 (keep_records 为 False 时为空列表)
     """
     # 声明评论列表作用域在整个函数内
     comment_list = []
+    writer = None
+    if stats is None:
+        stats = {}
+    stats.update(output_file=None, comment_count=0, total_comments=0, error=None)
+    
+    if throttle is None:
+        throttle = AsyncThrottle.for_tiktok()
     
-    # 保存已爬取评论的辅助函数
-    def save_comments_to_file(comments, file_path, is_final=False):
+    if resume and output_format != "jsonl":
+        raise ValueError(f"{output_format} 格式不支持断点续抓")
+    
+    # 落盘已写入的评论 (追加写入，每批只 fsync 一次)
+    def flush_comments(is_final=False):
+        if writer is None or writer.closed:
+            return
         try:
-            # 确保文件所在目录存在
-            file_dir = os.path.dirname(file_path)
-            if file_dir:
-                ensure_dir_exists(file_dir)
-                
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(comments, f, ensure_ascii=False, indent=2)
+            flushed = writer.flush()
             if not is_final:  # 不是最终保存时只在调试模式下显示
                 if debug_mode:
-                    logger.debug(f"已将 {len(comments)} 条评论增量保存到 {file_path}")
+                    logger.debug(f"已将 {flushed} 条评论增量保存到 {writer.file_path}")
             else:
-                logger.info(f"✅ 成功保存 {len(comments)} 条评论到 {file_path}")
+                writer.close()
+                logger.info(f"✅ 成功保存 {writer.count} 条评论到 {writer.file_path}")
+                if pretty_json and isinstance(writer, JsonlCommentWriter):
+                    json_path, exported = export_pretty_json(writer.file_path)
+                    logger.info(f"已导出 {exported} 条评论到 {json_path}")
         except Exception as e:
             logger.error(f"保存评论到文件失败: {str(e)}")
     
@@ -136,190 +164,144 @@ async def get_comments(video_url, count=50, output_filename=None, include_replie
         data_dir = os.path.join("data", "tiktok")
         ensure_dir_exists(data_dir)
         
-        # 如果未指定输出文件名，根据时间生成一个
+        video_id = get_video_id_from_url(video_url) or video_url
+        
+        # 如果未指定输出文件名，根据视频ID和时间生成一个 (批量模式下同一秒开始的视频不会写到同一个文件)
+        checkpoint = None
         if output_filename is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_filename = os.path.join(data_dir, f"tiktok_{timestamp}.json")
+            if resume:
+                # 未指定输出文件时，查找该视频最近的检查点
+                checkpoint = find_checkpoint(data_dir, "tiktok", video_id)
+            if checkpoint:
+                output_filename = checkpoint["output_file"]
+            else:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                # 无法从 URL 中识别视频ID时，把 URL 中不能用于文件名的字符替换掉
+                name_id = re.sub(r"\W+", "_", video_id).strip("_")[-64:]
+                output_filename = output_path_for(os.path.join(data_dir, f"tiktok_{name_id}_{timestamp}"),
+                                                  output_format)
         else:
             # 如果指定了输出文件名，确保它在 data/tiktok 目录下
             if not output_filename.startswith(data_dir):
                 output_filename = os.path.join(data_dir, os.path.basename(output_filename))
+            output_filename = output_path_for(output_filename, output_format)
+            if resume:
+                checkpoint = load_checkpoint(output_filename)
+        
+        if resume and not checkpoint:
+            logger.warning(f"未找到视频 {video_id} 的检查点，将从头开始抓取")
+        elif checkpoint and checkpoint.get("completed"):
+            logger.info(f"视频 {video_id} 已抓取完成 ({checkpoint['total_comments']} 条评论)，无需继续: {output_filename}")
+            stats.update(output_file=output_filename, comment_count=checkpoint["comment_count"],
+                         total_comments=checkpoint["total_comments"])
+            return comment_list
+        stats["output_file"] = output_filename
         
         logger.info(f"开始抓取视频评论: {video_url}")
         logger.info(f"计划抓取约 {count} 条评论" + (" (包含回复)" if include_replies else ""))
         logger.info(f"使用配置: 浏览器={browser_type}, 无头模式={headless}, 使用ms_token={use_ms_token}")
         logger.info(f"评论将增量保存到: {output_filename}")
 
-        # 创建一个空的JSON文件，确保文件存在且可写
-        save_comments_to_file([], output_filename)
+        if checkpoint:
+            # 丢弃检查点之后写入的不完整批次，然后追加写入
+            truncate_output(output_filename, checkpoint["output_offset"])
+            writer = JsonlCommentWriter(output_filename, append=True)
+            logger.info(f"从检查点继续抓取: 已有 {checkpoint['comment_count']} 条主评论 (总计 {checkpoint['total_comments']} 条)")
+        else:
+            # 创建输出文件，确保文件存在且可写
+            writer = open_comment_writer(output_filename, output_format, shard_size=shard_size,
+                                         shard_records=shard_records)
 
         # 检查 TikTokApi 版本和可用的参数
+        from importlib.metadata import PackageNotFoundError, version
         try:
-            import pkg_resources
-            tiktok_api_version = pkg_resources.get_distribution("TikTokApi").version
-            logger.info(f"TikTokApi 版本: {tiktok_api_version}")
-        except:
+            logger.info(f"TikTokApi 版本: {version('TikTokApi')}")
+        except PackageNotFoundError:
             logger.warning("无法获取 TikTokApi 版本信息")
         
-        async with TikTokApi() as api:
-            # 创建会话
-            logger.info("创建 TikTokApi 会话...")
-            
-            # 根据 TikTokApi 可用参数设置会话
-            # 简化会话参数以兼容性更好
-            session_params = {}
-            
-            # 基本参数设置
-            if use_ms_token:
-                session_params["ms_tokens"] = [ms_token]
-                session_params["num_sessions"] = 1
+        async with lease_session(pool, num_sessions=1,
+                                 ms_tokens=[config.TIKTOK_MS_TOKEN] if use_ms_token else None,
+                                 headless=headless, browser_type=browser_type,
+                                 debug_mode=debug_mode) as lease:
+            api = lease.api
             
-            # 尝试设置浏览器相关参数
-            session_params["browser"] = browser_type
-            session_params["headless"] = headless
-            
-            # 设置合理的等待时间
-            session_params["sleep_after"] = 3
-            
-            # 显示使用的会话参数
-            if debug_mode:
-                logger.debug(f"会话参数: {session_params}")
-            
-            try:
-                # 用 try-except 包围以处理不支持的参数
-                await api.create_sessions(**session_params)
-            except TypeError as e:
-                # 如果发生TypeError，可能是不支持的参数
-                logger.warning(f"创建会话时出现参数错误: {e}")
-                logger.info("尝试使用基本参数创建会话...")
-                
-                # 回退到最基本的参数
-                basic_params = {}
-                if use_ms_token:
-                    basic_params["ms_tokens"] = [ms_token]
-                
-                # 只保留最基本的参数
-                await api.create_sessions(**basic_params)
-            
-            # 添加随机延迟，模拟真实用户行为
-            delay = random.uniform(1.0, 3.0)
-            logger.debug(f"随机延迟 {delay:.2f} 秒...")
-            time.sleep(delay)
+            # 所有评论和回复请求都使用借出的会话
+            session_kwargs = lease.request_kwargs
             
             # 获取视频对象
             video = api.video(url=video_url)
+            if http_mode:
+                video = await use_http_video(lease, video, video_id)
             
             # 抓取评论
             logger.info("开始抓取评论...")
-            comment_count = 0
-            total_comments = 0  # 包括回复在内的总评论数
-            last_save_count = 0  # 上次保存时的评论数
+            comment_count = checkpoint["comment_count"] if checkpoint else 0
+            total_comments = checkpoint["total_comments"] if checkpoint else 0  # 包括回复在内的总评论数
             
-            # 使用简单的评论获取参数
-            comments_kwargs = {"count": count}
+            # TikTok 的评论游标是主评论的偏移量，起始游标加上已写出的主评论数即为下一次请求的游标
+            start_cursor = checkpoint["cursor"] if checkpoint else 0
             
-            async for comment in video.comments(**comments_kwargs):
-                # 处理主评论
-                try:
-                    # 随机延迟，防止请求过于频繁
-                    if random.random() < 0.3:  # 30%的概率添加延迟
-                        micro_delay = random.uniform(0.1, 0.8)
-                        time.sleep(micro_delay)
-                    
-                    # 如果是调试模式，输出第一条评论的详细信息以帮助分析
-                    if debug_mode and comment_count == 0:
-                        debug_object(comment, "第一条评论")
-                        
-                        # 输出原始数据作为JSON字符串
-                        if hasattr(comment, 'as_dict'):
-                            try:
-                                comment_dict = comment.as_dict()
-                                logger.debug(f"评论的as_dict()输出: {json.dumps(comment_dict, indent=2)}")
-                            except Exception as e:
-                                logger.debug(f"无法将评论转为字典: {str(e)}")
-                    
-                    # 获取评论点赞数
-                    like_count = get_like_count(comment)
-                    
-                    # 重点关注评论内容和点赞数
-                    comment_data = {
-                        "text": comment.text if hasattr(comment, 'text') else "",
-                        "like_count": like_count,
-                        "platform": "tiktok"
-                    }
-                    
-                    # 可选添加用户信息
-                    if include_user_info and hasattr(comment, 'author') and hasattr(comment.author, 'uniqueId'):
-                        comment_data["user"] = comment.author.uniqueId
-                    
-                    # 可选添加创建时间
-                    if include_create_time and hasattr(comment, 'createTime'):
-                        comment_data["create_time"] = comment.createTime
-                    
-                    # 如果需要获取回复
-                    if include_replies and hasattr(comment, 'reply_count') and comment.reply_count > 0:
-                        try:
-                            # 回复之前增加随机延迟
-                            time.sleep(random.uniform(0.5, 1.5))
-                            
-                            # 尝试获取评论回复
-                            reply_count = 0
-                            
-                            # 使用评论ID获取回复
-                            async for reply in comment.replies():
-                                # 调试第一条回复
-                                if debug_mode and reply_count == 0 and comment_count == 0:
-                                    debug_object(reply, "第一条回复")
-                                
-                                # 获取回复点赞数
-                                reply_like_count = get_like_count(reply)
-                                
-                                reply_data = {
-                                    "text": reply.text if hasattr(reply, 'text') else "",
-                                    "like_count": reply_like_count,
-                                    "platform": "tiktok"
-                                }
-                                
-                                # 可选添加用户信息
-                                if include_user_info and hasattr(reply, 'author') and hasattr(reply.author, 'uniqueId'):
-                                    reply_data["user"] = reply.author.uniqueId
-                                
-                                # 可选添加创建时间
-                                if include_create_time and hasattr(reply, 'createTime'):
-                                    reply_data["create_time"] = reply.createTime
-                                    
-                                comment_list.append(reply_data)
-                                reply_count += 1
-                                total_comments += 1
-                            
-                            if reply_count > 0:
-                                logger.info(f"评论 #{comment_count + 1} 获取到 {reply_count} 条回复")
-                        except Exception as e:
-                            logger.warning(f"获取评论回复时出错: {str(e)}")
+            # 匹配过滤条件的评论数 (作为上下文写出的主评论不计入)，用于 --max-matches
+            matched_comments = checkpoint.get("matched_comments", total_comments) if checkpoint else 0
+            reported_total = total_comments
+            
+            # 保存当前评论到文件，并记录已写出的主评论对应的游标
+            def save_progress(completed=False):
+                nonlocal reported_total
+                metrics.record_comments("tiktok", total_comments - reported_total)
+                reported_total = total_comments
+                flush_comments()
+                if store is not None:
+                    store.flush()
+                save_checkpoint(output_filename, "tiktok", video_id, start_cursor + reader.consumed,
+                                comment_count, total_comments, writer.offset, completed=completed,
+                                count=count, matched_comments=matched_comments)
+            
+            # 评论预读、回复并发获取和过滤都由 TikTokThreadReader 完成 (与 comment_stream 的流式接口共用)，
+            # 这里只负责按原始顺序写出，每 10 条主评论保存一次检查点
+            reader = TikTokThreadReader(video, session_kwargs, throttle, count - comment_count, include_replies,
+                                        reply_concurrency, 10, include_user_info, include_create_time,
+                                        comment_filter, debug_mode)
+            threads = reader.threads(start_cursor)
+            try:
+                async for thread in threads:
+                    try:
+                        # 先写主评论，回复紧跟在后面，同一线程在输出文件中连续存放
+                        for record, create_time in thread.records:
+                            if keep_records:
+                                comment_list.append(record)
+                            writer.write(record)
+                            if store is not None:
+                                store.add("tiktok", video_id, record, create_time)
+                            total_comments += 1
+                        matched_comments += thread.matches
+                        if thread.reply_count:
+                            logger.info(f"评论 #{comment_count + 1} 获取到 {thread.reply_count} 条回复")
+                    except Exception as e:
+                        logger.warning(f"处理评论时出错: {str(e)}")
                     
-                    comment_list.append(comment_data)
                     comment_count += 1
-                    total_comments += 1
-                    
-                    # 每抓取10条评论保存一次
                     if comment_count % 10 == 0:
                         logger.info(f"已抓取 {comment_count} 条主评论 (总计 {total_comments} 条包含回复)...")
-                        # 保存当前评论到文件
-                        save_comments_to_file(comment_list, output_filename)
-                        last_save_count = comment_count
-                        
-                        # 增加随机休眠
-                        rest_time = random.uniform(1.0, 3.0)
-                        logger.debug(f"休息 {rest_time:.2f} 秒...")
-                        time.sleep(rest_time)
-                        
-                except Exception as e:
-                    logger.warning(f"处理评论时出错: {str(e)}")
-                    continue
+                        save_progress()
+                    
+                    # 每写完一个线程就检查匹配数，够数后不再读取评论，尚未完成的回复请求随即取消
+                    if max_matches and matched_comments >= max_matches:
+                        logger.info(f"已写出 {matched_comments} 条匹配的评论，达到 --max-matches 上限，停止抓取")
+                        reader.stop()
+                        break
+            finally:
+                await threads.aclose()
+            if reader.skipped_threads:
+                logger.info(f"{reader.skipped_threads} 个评论线程的主评论不匹配过滤条件，未请求回复")
+            throttle.save()
+            
+            stats.update(comment_count=comment_count, total_comments=total_comments)
+            lease.record(total_comments)
             
-            # 保存最终评论到文件（如果有新增评论）
-            if comment_count > last_save_count:
-                save_comments_to_file(comment_list, output_filename, is_final=True)
+            # 保存最终评论到文件
+            save_progress(completed=True)
+            flush_comments(is_final=True)
             
             logger.info(f"✅ 评论抓取完成 - {comment_count} 条主评论 (总计 {total_comments} 条包含回复)")
             return comment_list
@@ -327,24 +309,26 @@ async def get_comments(video_url, count=50, output_filename=None, include_replie
     except KeyboardInterrupt:
         # 用户中断时保存已爬取的评论
         logger.info("用户中断了操作，正在保存已爬取的评论...")
-        if comment_list:  # 确保有数据要保存
-            save_comments_to_file(comment_list, output_filename, is_final=True)
-        logger.info(f"已保存 {len(comment_list)} 条评论到 {output_filename}")
+        flush_comments(is_final=True)
+        if writer is not None:
+            logger.info(f"已保存 {writer.count} 条评论到 {output_filename}")
         return comment_list
     except Exception as e:
         # 发生异常时尝试保存已爬取的评论
         logger.error(f"抓取评论失败: {str(e)}")
-        if comment_list:  # 确保有数据要保存
+        stats["error"] = str(e)
+        if is_challenge_error(e):
+            throttle.on_throttle("captcha")
+        if writer is not None and writer.count:  # 确保有数据要保存
             logger.info("尝试保存已爬取的评论...")
-            save_comments_to_file(comment_list, output_filename, is_final=True)
-            logger.info(f"已保存 {len(comment_list)} 条评论到 {output_filename}")
+        flush_comments(is_final=True)
         raise
 
-def main():
+def main(argv=None, prog=None):
     """主函数，处理命令行参数和调用抓取函数"""
     import argparse
     
-    parser = argparse.ArgumentParser(description="TikTok 视频评论抓取工具")
+    parser = argparse.ArgumentParser(prog=prog, description="TikTok 视频评论抓取工具")
     parser.add_argument("--url", type=str, help="TikTok 视频 URL", 
                         default="https://www.tiktok.com/@ccarolinapg/video/7485833744784297238")
     parser.add_argument("--count", type=int, help="要抓取的评论数量", default=100)
@@ -357,8 +341,53 @@ def main():
     parser.add_argument("--browser", choices=["webkit", "chromium"], default="chromium", 
                        help="使用的浏览器引擎 (注意: webkit可能不被所有TikTokApi版本支持)")
     parser.add_argument("--no-ms-token", action="store_true", help="不使用 ms_token")
+    parser.add_argument("--pretty-json", action="store_true", help="抓取结束后额外导出带缩进的 JSON 文件")
+    parser.add_argument("--comment-rate", type=float, default=None, help="主评论处理速率上限 (条/秒)，默认自适应")
+    parser.add_argument("--reply-rate", type=float, default=None, help="回复请求速率上限 (次/秒)，默认自适应")
+    parser.add_argument("--http", action="store_true",
+                        help="浏览器会话创建后直接通过 HTTP 分页请求评论和回复 (被拒绝时改用浏览器)")
+    parser.add_argument("--no-adaptive", action="store_true",
+                        help="使用固定的请求速率，不根据验证码和空页等信号自适应调整")
+    parser.add_argument("--reply-concurrency", type=int, default=4, help="同时获取回复的评论数量")
+    parser.add_argument("--resume", action="store_true",
+                        help="从检查点继续上次中断的抓取 (不指定 --output 时自动查找该视频最近的检查点)")
+    parser.add_argument("--queue", type=str, metavar="QUEUE",
+                        help="队列模式: 从共享队列 (队列文件路径或协调进程地址) 领取视频，见 scrape.py queue")
+    parser.add_argument("--batch", type=str, metavar="FILE",
+                        help="批量模式: 包含视频 URL 的文件 (每行一个，- 表示标准输入)")
+    parser.add_argument("--sessions", type=int, default=2,
+                        help="批量/队列模式下会话池的会话数 (即同时抓取的视频数)")
+    parser.add_argument("--manifest", type=str, default=None, help="批量模式的清单文件路径")
+    parser.add_argument("--worker-id", type=str, default=None, help="队列模式的工作进程标识 (默认为 主机名:进程号)")
+    parser.add_argument("--keep-running", action="store_true", help="队列模式下队列为空时继续等待新的视频")
+    parser.add_argument("--store", type=str, default=None, metavar="DB",
+                        help="同时将评论按ID去重写入 SQLite 数据库")
+    parser.add_argument("--format", choices=list(OUTPUT_FORMATS), default="jsonl",
+                        help="输出格式 (parquet/arrow 需要安装 pyarrow，jsonl.zst 需要安装 zstandard，"
+                             "只有 jsonl 支持 --resume)")
+    parser.add_argument("--shard-size", type=float, default=None, metavar="MB",
+                        help="jsonl.gz/jsonl.zst 格式每个分片压缩后的大小上限 (MB，默认 256)")
+    parser.add_argument("--shard-records", type=int, default=None,
+                        help="jsonl.gz/jsonl.zst 格式每个分片的记录数上限 (默认不限)")
+    parser.add_argument("--keyword", action="append", default=[], metavar="WORD",
+                        help="只保存包含该关键词的评论和回复 (可重复，任一关键词匹配即保存)")
+    parser.add_argument("--keywords-file", type=str, default=None, metavar="FILE",
+                        help="关键词文件 (每行一个，re: 开头的行是正则表达式)")
+    parser.add_argument("--pattern", action="append", default=[], metavar="REGEX",
+                        help="只保存匹配该正则表达式的评论和回复 (可重复)")
+    parser.add_argument("--case-sensitive", action="store_true", help="关键词和正则表达式区分大小写")
+    parser.add_argument("--skip-unmatched-replies", action="store_true",
+                        help="主评论不匹配时不请求该线程的回复 (减少请求，可能漏掉匹配的回复)")
+    parser.add_argument("--max-matches", type=int, default=None,
+                        help="每个视频匹配的评论 (包含回复) 达到该数量后停止抓取")
+    parser.add_argument("--metrics-file", type=str, default=None,
+                        help="定期将运行指标 (请求延迟、重试、休眠/网络/序列化耗时、配额) 以 JSON 写入该文件")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="在本地端口上提供 Prometheus 格式的指标 (GET /metrics)")
+    parser.add_argument("--metrics-interval", type=float, default=METRICS_INTERVAL,
+                        help="写入指标文件的间隔 (秒)")
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # 如果启用了调试模式，将日志级别设置为DEBUG
     if args.debug:
@@ -374,7 +403,92 @@ def main():
         except Exception as e:
             logger.error(f"创建数据目录失败: {str(e)}")
     
+    if args.resume and args.format != "jsonl":
+        parser.error(f"{args.format} 格式不支持 --resume")
     try:
+        comment_filter = load_comment_filter(args.keyword, args.pattern, args.keywords_file,
+                                             ignore_case=not args.case_sensitive,
+                                             skip_unmatched_replies=args.skip_unmatched_replies)
+    except (OSError, ValueError) as e:
+        parser.error(f"无法加载过滤条件: {str(e)}")
+    store = None
+    if args.store:
+        # 只有写入数据库时才导入 sqlite3
+        from comment_store import CommentStore
+        store = CommentStore(args.store)
+    shard_size = int(args.shard_size * 1024 * 1024) if args.shard_size else None
+    exporter = MetricsExporter(args.metrics_file, args.metrics_port, args.metrics_interval).start()
+    
+    try:
+        if args.queue:
+            from work_queue import open_queue
+            from tiktok_batch import run_queue_worker
+
+            with open_queue(args.queue) as queue:
+                asyncio.run(run_queue_worker(
+                    queue,
+                    worker_id=args.worker_id,
+                    num_sessions=args.sessions,
+                    ms_tokens=None if args.no_ms_token else config.TIKTOK_MS_TOKENS,
+                    headless=not args.show_browser,
+                    browser_type=args.browser,
+                    throttle=AsyncThrottle.for_tiktok(args.comment_rate, args.reply_rate, not args.no_adaptive),
+                    debug_mode=args.debug,
+                    idle_exit=not args.keep_running,
+                    count=args.count,
+                    include_replies=not args.no_replies,
+                    include_user_info=args.include_user,
+                    include_create_time=args.include_time,
+                    pretty_json=args.pretty_json,
+                    reply_concurrency=args.reply_concurrency,
+                    resume=args.resume,
+                    store=store,
+                    output_format=args.format,
+                    shard_size=shard_size,
+                    shard_records=args.shard_records,
+                    http_mode=args.http,
+                    comment_filter=comment_filter,
+                    max_matches=args.max_matches
+                ))
+            return
+
+        if args.batch:
+            from batch_utils import read_video_list
+            from tiktok_batch import run_batch
+            
+            if args.output:
+                logger.warning("批量模式下忽略 --output，每个视频使用自动生成的文件名")
+            videos = read_video_list(args.batch)
+            if not videos:
+                # 空列表直接返回，不启动浏览器/创建客户端
+                logger.warning("视频列表为空，没有需要抓取的视频")
+                return
+            asyncio.run(run_batch(
+                videos,
+                num_sessions=args.sessions,
+                ms_tokens=None if args.no_ms_token else config.TIKTOK_MS_TOKENS,
+                headless=not args.show_browser,
+                browser_type=args.browser,
+                manifest_path=args.manifest,
+                throttle=AsyncThrottle.for_tiktok(args.comment_rate, args.reply_rate, not args.no_adaptive),
+                debug_mode=args.debug,
+                count=args.count,
+                include_replies=not args.no_replies,
+                include_user_info=args.include_user,
+                include_create_time=args.include_time,
+                pretty_json=args.pretty_json,
+                reply_concurrency=args.reply_concurrency,
+                resume=args.resume,
+                store=store,
+                output_format=args.format,
+                shard_size=shard_size,
+                shard_records=args.shard_records,
+                http_mode=args.http,
+                comment_filter=comment_filter,
+                max_matches=args.max_matches
+            ))
+            return
+        
         asyncio.run(get_comments(
             args.url, 
             args.count, 
@@ -385,12 +499,28 @@ def main():
             args.debug,
             not args.show_browser,  # 反转 show-browser 参数
             args.browser,
-            not args.no_ms_token  # 反转 no-ms-token 参数
+            not args.no_ms_token,  # 反转 no-ms-token 参数
+            args.pretty_json,
+            AsyncThrottle.for_tiktok(args.comment_rate, args.reply_rate, not args.no_adaptive),
+            args.reply_concurrency,
+            args.resume,
+            store=store,
+            output_format=args.format,
+            shard_size=shard_size,
+            shard_records=args.shard_records,
+            http_mode=args.http,
+            comment_filter=comment_filter,
+            max_matches=args.max_matches,
+            keep_records=False
         ))
     except KeyboardInterrupt:
         logger.info("程序已退出")
     except Exception as e:
         logger.error(f"发生错误: {str(e)}")
+    finally:
+        if store is not None:
+            store.close()
+        exporter.stop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
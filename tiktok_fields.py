@@ -0,0 +1,168 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 各字段在原始评论字典中可能的路径，按优先级排列 (不同 TikTokApi 版本的字段名不同)
+RAW_FIELD_PATHS = {
+    "id": (("cid",), ("id",)),
+    "text": (("text",),),
+    "like_count": (("digg_count",), ("diggCount",), ("like_count",), ("likeCount",), ("likes",),
+                   ("statistics", "digg_count")),
+    "create_time": (("create_time",), ("createTime",)),
+    "reply_count": (("reply_comment_total",), ("replyCommentTotal",), ("reply_count",)),
+    "user": (("user", "unique_id"), ("user", "uniqueId"), ("author", "uniqueId")),
+}
+
+# 没有原始字典时，从对象属性读取的路径
+ATTR_FIELD_PATHS = {
+    "id": (("id",), ("cid",)),
+    "text": (("text",),),
+    "like_count": (("likes_count",), ("diggCount",), ("likeCount",), ("likes",), ("like_count",)),
+    "create_time": (("createTime",), ("create_time",)),
+    "reply_count": (("reply_count",), ("reply_comment_total",)),
+    "user": (("author", "uniqueId"), ("author", "username")),
+}
+
+# 找不到字段时的默认值
+FIELD_DEFAULTS = {"text": "", "like_count": 0, "reply_count": 0}
+
+_MISSING = object()
+
+
+def _raw_from_dict_attr(obj):
+    return obj.as_dict
+
+
+def _raw_from_method(obj):
+    return obj.as_dict()
+
+
+def _raw_from_raw_data(obj):
+    return obj.raw_data
+
+
+def _resolve_raw_getter(obj):
+    """确定如何取得对象的原始评论字典 (TikTokApi v6 的 as_dict 是属性，早期版本是方法)"""
+    as_dict = getattr(obj, "as_dict", None)
+    if isinstance(as_dict, dict):
+        return _raw_from_dict_attr
+    if callable(as_dict):
+        try:
+            if isinstance(as_dict(), dict):
+                return _raw_from_method
+        except Exception:
+            pass
+    if isinstance(getattr(obj, "raw_data", None), dict):
+        return _raw_from_raw_data
+    return None
+
+
+def _follow_dict(data, path):
+    for key in path:
+        if not isinstance(data, dict) or key not in data:
+            return _MISSING
+        data = data[key]
+    return data
+
+
+def _follow_attr(obj, path):
+    for name in path:
+        obj = getattr(obj, name, _MISSING)
+        if obj is _MISSING:
+            return _MISSING
+    return obj
+
+
+def _make_dict_accessor(path):
+    """根据字段路径生成读取函数 (路径不存在时抛出 KeyError/TypeError)"""
+    if len(path) == 1:
+        key = path[0]
+        return lambda data: data[key]
+    first, second = path[0], path[1]
+    if len(path) == 2:
+        return lambda data: data[first][second]
+
+    def accessor(data):
+        for key in path:
+            data = data[key]
+        return data
+    return accessor
+
+
+def _make_attr_accessor(path):
+    def accessor(obj):
+        for name in path:
+            obj = getattr(obj, name)
+        return obj
+    return accessor
+
+
+class CommentFieldExtractor:
+    """
+    TikTok 评论字段提取器
+
+    对每种评论对象类型，第一次遇到时确定原始字典的取法和每个字段的路径，并缓存读取函数；
+    之后每条评论只需要几次字典查找。缓存的路径在某条评论上失效时 (字段缺失)，
+    只对该字段重新解析；找不到任何路径时返回默认值，但不缓存这个结果，下一条评论仍会重新解析。线程安全。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._shapes = {}  # 对象类型 -> (原始字典取法, {字段: (是否读取原始字典, 读取函数)})
+
+    def _shape_for(self, obj):
+        shape = self._shapes.get(type(obj))
+        if shape is None:
+            with self._lock:
+                shape = self._shapes.get(type(obj))
+                if shape is None:
+                    shape = (_resolve_raw_getter(obj), {})
+                    self._shapes[type(obj)] = shape
+                    logger.debug(f"解析评论对象字段: {type(obj).__name__}, 使用原始字典: {shape[0] is not None}")
+        return shape
+
+    @staticmethod
+    def _resolve_field(obj, raw, field):
+        """为一个字段查找可用的路径，返回 (是否读取原始字典, 读取函数)，找不到时返回 None"""
+        if raw is not None:
+            for path in RAW_FIELD_PATHS[field]:
+                if _follow_dict(raw, path) is not _MISSING:
+                    return True, _make_dict_accessor(path)
+        for path in ATTR_FIELD_PATHS[field]:
+            if _follow_attr(obj, path) is not _MISSING:
+                return False, _make_attr_accessor(path)
+        return None
+
+    def _get(self, obj, raw, accessors, field):
+        accessor = accessors.get(field)
+        if accessor is not None:
+            from_raw, read = accessor
+            try:
+                return read(raw if from_raw else obj)
+            except (KeyError, TypeError, AttributeError):
+                pass
+        # 第一次读取该字段或缓存的路径失效时重新解析
+        accessor = self._resolve_field(obj, raw, field)
+        if accessor is None:
+            # 只有这条评论缺少该字段，不缓存失败的结果 (之后的评论可能有该字段)，保留原来的路径
+            return FIELD_DEFAULTS.get(field)
+        accessors[field] = accessor
+        from_raw, read = accessor
+        return read(raw if from_raw else obj)
+
+    def get(self, obj, field):
+        """读取评论对象的一个字段 (id, text, like_count, create_time, reply_count, user)"""
+        raw_getter, accessors = self._shape_for(obj)
+        raw = raw_getter(obj) if raw_getter is not None else None
+        return self._get(obj, raw, accessors, field)
+
+    def extract(self, obj):
+        """读取全部字段，返回字典"""
+        raw_getter, accessors = self._shape_for(obj)
+        raw = raw_getter(obj) if raw_getter is not None else None
+        return {field: self._get(obj, raw, accessors, field) for field in RAW_FIELD_PATHS}
+
+
+# 模块级共享的提取器
+extractor = CommentFieldExtractor()
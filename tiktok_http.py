@@ -0,0 +1,289 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from config import TIKTOK_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# TikTok 网页版地址 (会话没有 base_url 时使用)
+TIKTOK_BASE_URL = "https://www.tiktok.com"
+
+# 评论列表和回复列表接口
+COMMENT_LIST_PATH = "/api/comment/list/"
+REPLY_LIST_PATH = "/api/comment/list/reply/"
+
+# 连接池大小 (即同时进行的 HTTP 请求数)
+POOL_SIZE = 16
+
+# 单次HTTP请求超时 (秒)
+REQUEST_TIMEOUT = 20
+
+# 连续被拒绝多少次后停用直接 HTTP 模式，之后全部使用浏览器
+MAX_REJECTIONS = 3
+
+# 会话没有携带请求参数时使用的网页版默认参数
+DEFAULT_PARAMS = {
+    "aid": "1988",
+    "app_name": "tiktok_web",
+    "device_platform": "web_pc",
+    "browser_language": "en-US",
+    "browser_platform": "Win32",
+}
+
+DEFAULT_USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                      "Chrome/120.0.0.0 Safari/537.36")
+
+
+class TikTokRejected(Exception):
+    """直接 HTTP 请求被 TikTok 拒绝 (非 200、空响应、验证码页面或 status_code 不为 0)"""
+
+
+class TikTokHttpClient:
+    """
+    直接分页请求 TikTok 评论接口的 HTTP 客户端
+
+    cookies、msToken 和设备参数在浏览器会话创建后复制一次，之后的评论和回复分页请求
+    不再经过浏览器，而是使用带连接池的 requests.Session 在线程池中并发发出，不阻塞事件循环。
+    每个请求的 URL 先交给 signer 签名 (TikTokApi 的 sign_url 在浏览器页面中计算 X-Bogus)，
+    签名只是一次页面内的函数调用，比在浏览器中发出整个请求轻得多。
+    """
+
+    def __init__(self, cookies=None, headers=None, params=None, base_url=TIKTOK_BASE_URL,
+                 pool_size=POOL_SIZE, timeout=REQUEST_TIMEOUT, signer=None):
+        """
+        Args:
+            cookies: 浏览器会话的 cookies ({名称: 值})
+            headers: 请求头 (至少包含 User-Agent)
+            params: 每个请求都携带的查询参数 (设备参数、msToken)
+            base_url: TikTok 地址 (测试时指向本地的模拟服务器)
+            pool_size: 连接池大小
+            timeout: 单次请求超时 (秒)
+            signer: 给完整 URL 加上签名参数的协程函数 (参数为 URL，返回签名后的 URL)，为 None 时不签名
+        """
+        self.base_url = base_url.rstrip("/")
+        self.params = {**DEFAULT_PARAMS, **(params or {})}
+        self.timeout = timeout
+        self.signer = signer
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"User-Agent": DEFAULT_USER_AGENT, "Referer": f"{self.base_url}/"})
+        self.session.headers.update(headers or {})
+        self.session.cookies.update(cookies or {})
+        self._executor = ThreadPoolExecutor(max_workers=max(1, pool_size), thread_name_prefix="tiktok-http")
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.request_count = 0
+        self.rejections = 0
+        self.consecutive_rejections = 0
+
+    @classmethod
+    async def bootstrap(cls, api, session, session_index=None, **kwargs):
+        """
+        从已创建的 TikTokApi 浏览器会话复制 cookies、请求头和设备参数，并使用该会话的页面签名请求
+
+        Args:
+            api: TikTokApi 实例
+            session: api.sessions 中的一个会话
+            session_index: 会话序号 (签名时使用该会话的页面)
+            kwargs: 传给构造函数的其他参数
+        """
+        get_cookies = getattr(api, "get_session_cookies", None)
+        if get_cookies is not None:
+            cookies = await get_cookies(session)
+        else:
+            cookies = {cookie["name"]: cookie["value"] for cookie in await session.context.cookies()}
+        params = dict(getattr(session, "params", None) or {})
+        ms_token = getattr(session, "ms_token", None) or cookies.get("msToken")
+        if ms_token:
+            params["msToken"] = ms_token
+        headers = dict(getattr(session, "headers", None) or {})
+        base_url = getattr(session, "base_url", None) or TIKTOK_BASE_URL
+        signer = session_signer(api, session_index)
+        if signer is None:
+            logger.warning("TikTokApi 没有提供 sign_url，直接 HTTP 请求不带 X-Bogus 签名，很可能被拒绝")
+        logger.debug(f"已复制浏览器会话: {len(cookies)} 个 cookie, {len(params)} 个请求参数")
+        return cls(cookies=cookies, headers=headers, params=params, base_url=base_url, signer=signer, **kwargs)
+
+    @property
+    def disabled(self):
+        """连续被拒绝次数过多时停用，之后的请求都走浏览器"""
+        return self.consecutive_rejections >= MAX_REJECTIONS
+
+    def _get(self, url):
+        response = self.session.get(url, timeout=self.timeout)
+        with self._lock:
+            self.request_count += 1
+        if response.status_code != 200:
+            raise TikTokRejected(f"HTTP {response.status_code}")
+        if not response.content:
+            raise TikTokRejected("空响应")
+        try:
+            data = response.json()
+        except ValueError:
+            raise TikTokRejected("响应不是 JSON (可能是验证码页面)")
+        if data.get("status_code", 0) != 0:
+            raise TikTokRejected(f"status_code={data.get('status_code')} {data.get('status_msg') or ''}".strip())
+        # 服务器会轮换 msToken，之后的请求使用新的值
+        ms_token = response.headers.get("x-ms-token")
+        if ms_token:
+            self.params["msToken"] = ms_token
+        return data
+
+    async def get(self, path, params):
+        """签名后在线程池中发出一次 GET 请求，被拒绝 (包括无法签名) 时抛出 TikTokRejected"""
+        loop = asyncio.get_running_loop()
+        url = f"{self.base_url}{path}?{urlencode({**self.params, **params})}"
+        try:
+            if self.signer is not None:
+                try:
+                    url = await self.signer(url)
+                except Exception as e:
+                    raise TikTokRejected(f"无法签名: {str(e)}") from e
+            data = await loop.run_in_executor(self._executor, self._get, url)
+        except (TikTokRejected, requests.RequestException) as e:
+            with self._lock:
+                self.rejections += 1
+                self.consecutive_rejections += 1
+            metrics.registry.inc("tiktok_http_rejections_total", endpoint=path.strip("/").rsplit("/", 1)[-1])
+            if isinstance(e, TikTokRejected):
+                raise
+            raise TikTokRejected(str(e)) from e
+        self.consecutive_rejections = 0
+        return data
+
+    async def comment_page(self, video_id, cursor=0, count=TIKTOK_PAGE_SIZE):
+        """请求一页主评论"""
+        return await self.get(COMMENT_LIST_PATH, {"aweme_id": video_id, "count": count, "cursor": cursor})
+
+    async def reply_page(self, video_id, comment_id, cursor=0, count=TIKTOK_PAGE_SIZE):
+        """请求一页回复"""
+        return await self.get(REPLY_LIST_PATH, {"item_id": video_id, "comment_id": comment_id,
+                                                "count": count, "cursor": cursor})
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+def session_signer(api, session_index=None):
+    """
+    返回使用浏览器会话签名 URL 的协程函数 (TikTokApi v6 的 sign_url 在页面中调用
+    byted_acrawler.frontierSign 计算 X-Bogus)，TikTokApi 不支持签名时返回 None
+    """
+    sign_url = getattr(api, "sign_url", None)
+    if sign_url is None:
+        return None
+    kwargs = {} if session_index is None else {"session_index": session_index}
+
+    async def signer(url):
+        return await sign_url(url, **kwargs)
+    return signer
+
+
+async def _paginate(video, fetch_page, fallback, count, cursor, kwargs):
+    """
+    按游标翻页生成评论对象，请求被拒绝时从当前游标改用浏览器继续
+
+    Args:
+        video: HttpVideo
+        fetch_page: 以游标为参数、返回一页响应的协程函数
+        fallback: 返回浏览器路径异步生成器的函数 (参数为剩余数量、游标)
+        count: 最多生成的数量
+        cursor: 起始游标
+        kwargs: 传给浏览器路径的参数 (如 session_index)
+    """
+    found = 0
+    while found < count:
+        if video.client.disabled:
+            page = None
+        else:
+            try:
+                page = await fetch_page(cursor)
+            except TikTokRejected as e:
+                logger.warning(f"直接 HTTP 请求被拒绝 ({str(e)})，改用浏览器从游标 {cursor} 继续")
+                page = None
+        if page is None:
+            video.fallbacks += 1
+            async for item in fallback(count - found, cursor, **kwargs):
+                yield item
+            return
+
+        items = page.get("comments") or []
+        for raw in items[:count - found]:
+            yield HttpComment(raw, video)
+        found += min(len(items), count - found)
+        if not page.get("has_more") or not items:
+            return
+        cursor = page.get("cursor", cursor + len(items))
+
+
+class HttpComment:
+    """
+    直接 HTTP 模式返回的评论对象
+
+    as_dict 为原始评论字典 (与 TikTokApi v6 的 Comment 相同)，回复同样通过 HTTP 分页获取。
+    """
+
+    __slots__ = ("as_dict", "id", "video")
+
+    def __init__(self, raw, video):
+        self.as_dict = raw
+        self.id = raw.get("cid")
+        self.video = video
+
+    def replies(self, count=TIKTOK_PAGE_SIZE, cursor=0, **kwargs):
+        """获取回复 (参数与 TikTokApi 的 Comment.replies 相同)"""
+        video = self.video
+
+        def fetch_page(page_cursor):
+            return video.client.reply_page(video.video_id, self.id, page_cursor)
+
+        def fallback(remaining, page_cursor, **fallback_kwargs):
+            return video.api.comment(data=self.as_dict).replies(count=remaining, cursor=page_cursor,
+                                                                **fallback_kwargs)
+
+        return _paginate(video, fetch_page, fallback, count, cursor, kwargs)
+
+
+class HttpVideo:
+    """
+    直接 HTTP 模式的视频对象
+
+    接口与 TikTokApi 的 Video.comments 相同，可以直接替换爬虫中的 video 对象；
+    请求被拒绝时改用原来的浏览器视频对象，从同一个游标继续。
+    """
+
+    def __init__(self, client, video_id, api, browser_video):
+        """
+        Args:
+            client: TikTokHttpClient
+            video_id: 视频ID (aweme_id)
+            api: TikTokApi 实例 (回退时用来构造浏览器评论对象)
+            browser_video: api.video() 返回的视频对象
+        """
+        self.client = client
+        self.video_id = video_id
+        self.api = api
+        self.browser_video = browser_video
+        self.fallbacks = 0  # 改用浏览器的次数
+
+    def comments(self, count=TIKTOK_PAGE_SIZE, cursor=0, **kwargs):
+        """获取主评论 (参数与 TikTokApi 的 Video.comments 相同)"""
+
+        def fetch_page(page_cursor):
+            return self.client.comment_page(self.video_id, page_cursor)
+
+        def fallback(remaining, page_cursor, **fallback_kwargs):
+            return self.browser_video.comments(count=remaining, cursor=page_cursor, **fallback_kwargs)
+
+        return _paginate(self, fetch_page, fallback, count, cursor, kwargs)
@@ -0,0 +1,299 @@
+import asyncio
+import contextlib
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# 单个会话连续出错多少次后重建
+MAX_SESSION_ERRORS = 3
+
+# 这些异常说明会话被 TikTok 拦截 (验证码、空响应)，需要立即重建
+CHALLENGE_ERROR_NAMES = ("Captcha", "EmptyResponse")
+
+
+def is_challenge_error(error):
+    """判断异常是否意味着会话被 TikTok 拦截"""
+    name = type(error).__name__
+    return any(marker in name for marker in CHALLENGE_ERROR_NAMES)
+
+
+class SessionStats:
+    """单个会话的使用统计"""
+
+    def __init__(self, index):
+        self.index = index
+        self.videos = 0
+        self.comments = 0
+        self.errors = 0  # 连续错误次数
+        self.total_errors = 0
+        self.recycles = 0
+        self.busy_seconds = 0.0
+
+    def as_dict(self):
+        return {
+            "index": self.index,
+            "videos": self.videos,
+            "comments": self.comments,
+            "total_errors": self.total_errors,
+            "recycles": self.recycles,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "comments_per_second": round(self.comments / self.busy_seconds, 2) if self.busy_seconds else 0.0,
+        }
+
+
+class SessionLease:
+    """从会话池借出的一个会话"""
+
+    def __init__(self, pool, index):
+        self.pool = pool
+        self.index = index
+        self.comments = 0
+
+    @property
+    def api(self):
+        return self.pool.api
+
+    @property
+    def request_kwargs(self):
+        """传给 video.comments() / comment.replies() 的参数，确保请求使用借出的会话"""
+        return {"session_index": self.index}
+
+    def record(self, comments):
+        """记录本次借用期间抓取的评论数"""
+        self.comments += comments
+
+    async def http_client(self):
+        """借出会话对应的直接 HTTP 客户端，无法创建或已停用时返回 None"""
+        return await self.pool.http_client(self.index)
+
+
+class TikTokSessionPool:
+    """
+    长期存活的 TikTok 会话池
+
+    只启动一次浏览器并创建 N 个会话 (每个会话可使用独立的 ms_token)，
+    然后把会话轮流借给待抓取的视频。出错或被拦截的会话会被关闭并重建。
+    """
+
+    def __init__(self, num_sessions=1, ms_tokens=None, headless=True, browser_type="chromium",
+                 sleep_after=3, max_errors=MAX_SESSION_ERRORS, debug_mode=False, api_factory=None):
+        """
+        Args:
+            num_sessions: 会话数量
+            ms_tokens: ms_token 列表，按顺序分配给各个会话 (数量不足时循环使用)
+            headless: 是否使用无头模式
+            browser_type: 浏览器类型 ("webkit" 或 "chromium")
+            sleep_after: 创建会话后等待的秒数
+            max_errors: 会话连续出错多少次后重建
+            debug_mode: 是否开启调试模式
+            api_factory: 创建 API 对象的函数，为 None 时使用 TikTokApi (基准测试时传入模拟的数据源)
+        """
+        self.num_sessions = max(1, num_sessions)
+        self.ms_tokens = [token for token in (ms_tokens or []) if token]
+        self.headless = headless
+        self.browser_type = browser_type
+        self.sleep_after = sleep_after
+        self.max_errors = max_errors
+        self.debug_mode = debug_mode
+        self.api_factory = api_factory
+
+        self.api = None
+        self.stats = [SessionStats(i) for i in range(self.num_sessions)]
+        self._idle = None
+        self._http_clients = {}  # 会话序号 -> TikTokHttpClient
+
+    @property
+    def size(self):
+        return self.num_sessions
+
+    def _token_for(self, index):
+        if not self.ms_tokens:
+            return None
+        return self.ms_tokens[index % len(self.ms_tokens)]
+
+    def _session_creator(self):
+        """返回 TikTokApi 内部创建单个会话的方法 (不同版本可能不存在)"""
+        return getattr(self.api, "_TikTokApi__create_session", None)
+
+    async def _create_sessions(self):
+        """创建全部会话，尽量为每个会话分配独立的 ms_token"""
+        # 根据 TikTokApi 可用参数设置会话
+        session_params = {
+            "num_sessions": 1 if len(self.ms_tokens) > 1 else self.num_sessions,
+            "browser": self.browser_type,
+            "headless": self.headless,
+            "sleep_after": self.sleep_after,
+        }
+        if self.ms_tokens:
+            session_params["ms_tokens"] = [self._token_for(0)] if len(self.ms_tokens) > 1 else self.ms_tokens
+
+        # 显示使用的会话参数
+        if self.debug_mode:
+            logger.debug(f"会话参数: {session_params}")
+
+        try:
+            # 用 try-except 包围以处理不支持的参数
+            await self.api.create_sessions(**session_params)
+        except TypeError as e:
+            # 如果发生TypeError，可能是不支持的参数
+            logger.warning(f"创建会话时出现参数错误: {e}")
+            logger.info("尝试使用基本参数创建会话...")
+
+            # 回退到最基本的参数
+            basic_params = {"num_sessions": self.num_sessions}
+            if self.ms_tokens:
+                basic_params["ms_tokens"] = self.ms_tokens
+            await self.api.create_sessions(**basic_params)
+
+        # 多个 ms_token 时逐个创建剩余会话，保证每个会话使用自己的 token
+        creator = self._session_creator()
+        missing = self.num_sessions - len(self.api.sessions)
+        if missing > 0 and creator is not None:
+            for index in range(len(self.api.sessions), self.num_sessions):
+                await creator(ms_token=self._token_for(index), sleep_after=self.sleep_after)
+        elif missing > 0:
+            await self.api.create_sessions(num_sessions=missing, ms_tokens=self.ms_tokens or None,
+                                           headless=self.headless, sleep_after=self.sleep_after)
+
+    async def start(self):
+        """启动浏览器并创建全部会话"""
+        logger.info(f"创建 TikTokApi 会话池 ({self.num_sessions} 个会话)...")
+        if self.api_factory is None:
+            # 只有真正创建会话时才导入 TikTokApi (会连带加载 playwright)
+            from TikTokApi import TikTokApi
+            self.api_factory = TikTokApi
+        self.api = self.api_factory()
+        await self.api.__aenter__()
+        await self._create_sessions()
+
+        self.num_sessions = min(self.num_sessions, len(self.api.sessions))
+        self.stats = self.stats[:self.num_sessions]
+        self._idle = asyncio.Queue()
+        for index in range(self.num_sessions):
+            self._idle.put_nowait(index)
+
+        # 添加随机延迟，模拟真实用户行为
+        await asyncio.sleep(random.uniform(1.0, 3.0))
+        return self
+
+    async def http_client(self, index):
+        """
+        返回会话对应的直接 HTTP 客户端
+
+        第一次使用时从浏览器会话复制 cookies 和设备参数，请求由该会话的页面签名，之后同一会话的所有视频共用。
+        无法创建或连续被拒绝而停用时返回 None (调用方使用浏览器)，会话重建后会重新创建。
+        """
+        client = self._http_clients.get(index)
+        if client is None:
+            from tiktok_http import TikTokHttpClient
+            try:
+                client = await TikTokHttpClient.bootstrap(self.api, self.api.sessions[index], session_index=index)
+            except Exception as e:
+                logger.warning(f"无法为会话 #{index} 创建直接 HTTP 客户端，使用浏览器: {str(e)}")
+                return None
+            self._http_clients[index] = client
+            logger.info(f"会话 #{index} 已启用直接 HTTP 分页")
+        if client.disabled:
+            return None
+        return client
+
+    def _drop_http_client(self, index):
+        client = self._http_clients.pop(index, None)
+        if client is not None:
+            client.close()
+
+    async def close(self):
+        """关闭全部会话和浏览器"""
+        for index in list(self._http_clients):
+            self._drop_http_client(index)
+        if self.api is not None:
+            await self.api.__aexit__(None, None, None)
+            self.api = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def recycle(self, index):
+        """关闭指定会话并在原位置重建"""
+        creator = self._session_creator()
+        if creator is None:
+            logger.warning(f"当前 TikTokApi 版本不支持单独重建会话，会话 #{index} 继续使用")
+            return
+
+        old_session = self.api.sessions[index]
+        for closable in (getattr(old_session, "page", None), getattr(old_session, "context", None)):
+            try:
+                if closable is not None:
+                    await closable.close()
+            except Exception as e:
+                logger.debug(f"关闭会话 #{index} 时出错: {str(e)}")
+
+        await creator(ms_token=self._token_for(index), sleep_after=self.sleep_after)
+        self.api.sessions[index] = self.api.sessions.pop()
+        self._drop_http_client(index)
+        self.stats[index].recycles += 1
+        self.stats[index].errors = 0
+        logger.info(f"已重建会话 #{index}")
+
+    @contextlib.asynccontextmanager
+    async def lease(self, recycle=True):
+        """
+        借出一个空闲会话，用完后自动归还
+
+        Args:
+            recycle: 会话出错或被拦截时是否重建
+        """
+        index = await self._idle.get()
+        lease = SessionLease(self, index)
+        stats = self.stats[index]
+        started = time.monotonic()
+        try:
+            yield lease
+        except Exception as e:
+            stats.errors += 1
+            stats.total_errors += 1
+            if recycle and (is_challenge_error(e) or stats.errors >= self.max_errors):
+                logger.warning(f"会话 #{index} 出错 ({type(e).__name__})，正在重建...")
+                try:
+                    await self.recycle(index)
+                except Exception as recycle_error:
+                    logger.error(f"重建会话 #{index} 失败: {str(recycle_error)}")
+            raise
+        else:
+            stats.errors = 0
+        finally:
+            stats.videos += 1
+            stats.comments += lease.comments
+            stats.busy_seconds += time.monotonic() - started
+            self._idle.put_nowait(index)
+
+    def report(self):
+        """返回会话池大小和每个会话的吞吐量统计"""
+        return {
+            "size": self.num_sessions,
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "sessions": [stats.as_dict() for stats in self.stats],
+        }
+
+
+@contextlib.asynccontextmanager
+async def lease_session(pool=None, **pool_kwargs):
+    """
+    从会话池借出一个会话
+
+    pool 为 None 时临时创建一个会话池，用完后关闭 (单视频抓取时使用)。
+    """
+    own_pool = pool is None
+    if own_pool:
+        pool = await TikTokSessionPool(**pool_kwargs).start()
+    try:
+        async with pool.lease(recycle=not own_pool) as lease:
+            yield lease
+    finally:
+        if own_pool:
+            await pool.close()
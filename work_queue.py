@@ -0,0 +1,652 @@
+"""
+多节点共享的视频抓取队列
+
+队列保存在一个 SQLite 文件中，每个视频是一条工作项。工作进程租用 (lease) 工作项后定期续约 (心跳)，
+租约过期的工作项会被其他工作进程重新领取；失败的工作项按指数退避重试，超过最大尝试次数后进入死信状态。
+多台机器可以直接共享网络文件系统上的队列文件，也可以由一台机器运行 `scrape queue serve`，
+其他机器通过 HTTP 访问 (推荐，网络文件系统上的 SQLite 文件锁不一定可靠)。
+
+    python scrape.py queue add data/work_queue.db tiktok videos.txt
+    python scrape.py queue cap data/work_queue.db tiktok 3
+    python scrape.py queue serve data/work_queue.db --port 8765
+    python scrape.py tiktok --queue http://coordinator:8765 --sessions 3
+    python scrape.py queue stats http://coordinator:8765
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# 默认队列文件
+DEFAULT_QUEUE_PATH = os.path.join("data", "work_queue.db")
+
+# 支持的平台
+PLATFORMS = ("tiktok", "youtube")
+
+# 工作项状态
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+DEAD = "dead"
+STATES = (PENDING, LEASED, DONE, DEAD)
+
+# 租约时长 (秒)，工作进程每隔三分之一租约时长续约一次
+LEASE_SECONDS = 300
+
+# 最大尝试次数 (包括租约过期)，超过后进入死信状态
+MAX_ATTEMPTS = 3
+
+# 失败后第一次重试前的等待时间 (秒)，之后每次加倍
+RETRY_DELAY = 60
+
+# 重试也不会成功的错误 (直接进入死信状态)
+PERMANENT_ERRORS = ("invalid_url", "video_not_found", "comments_disabled")
+
+# 等待其他进程释放数据库锁的时间 (秒)
+BUSY_TIMEOUT = 30
+
+# 协调进程的默认端口
+DEFAULT_PORT = 8765
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    platform TEXT NOT NULL,
+    video_key TEXT NOT NULL,
+    video TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    not_before REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (platform, video_key)
+);
+CREATE INDEX IF NOT EXISTS idx_work_items_state ON work_items (platform, state, not_before);
+CREATE TABLE IF NOT EXISTS platform_caps (
+    platform TEXT PRIMARY KEY,
+    max_leases INTEGER NOT NULL
+);
+"""
+
+
+def video_key(platform, video):
+    """
+    去重用的视频标识 (同一个视频的不同 URL 写法得到相同的标识)
+
+    Args:
+        platform: "tiktok" 或 "youtube"
+        video: 视频 URL 或 ID
+    """
+    video = video.strip()
+    if platform == "youtube":
+        from youtube_comments_scraper import get_video_id_from_url
+    else:
+        from tiktok_comments_scraper import get_video_id_from_url
+    return get_video_id_from_url(video) or video
+
+
+def default_worker_id():
+    """工作进程标识: 主机名:进程号"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _item(row):
+    return {"id": row[0], "platform": row[1], "video": row[2], "attempts": row[3]}
+
+
+class WorkQueue:
+    """
+    基于 SQLite 的租约式工作队列
+
+    同一个视频 (按平台和视频ID去重) 只会入队一次。lease() 在一个写事务中回收过期租约、
+    检查各平台的并发上限并领取工作项，多个进程 (包括共享队列文件的多台机器) 同时领取时不会拿到同一项。
+    时间使用墙上时钟，多台机器共享队列时需要保持时钟同步。线程安全。
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS,
+                 retry_delay=RETRY_DELAY):
+        """
+        Args:
+            path: 队列文件路径
+            lease_seconds: 租约时长 (秒)
+            max_attempts: 最大尝试次数
+            retry_delay: 失败后第一次重试前的等待时间 (秒)
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        queue_dir = os.path.dirname(path)
+        if queue_dir:
+            os.makedirs(queue_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # 手动管理事务 (BEGIN IMMEDIATE)，领取时一开始就拿到写锁
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        # 不使用 WAL: WAL 依赖共享内存，多台机器通过网络文件系统共享队列文件时不可用 (队列的写入频率很低)
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def enqueue(self, platform, videos):
+        """
+        添加视频，已经在队列中的视频 (任何状态) 会被忽略
+
+        Args:
+            platform: "tiktok" 或 "youtube"
+            videos: 视频 URL 或 ID 列表
+
+        Returns:
+            新加入的视频数
+        """
+        if platform not in PLATFORMS:
+            raise ValueError(f"不支持的平台: {platform}")
+        now = time.time()
+        rows = [(platform, video_key(platform, video), video.strip(), now, now) for video in videos if video.strip()]
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO work_items (platform, video_key, video, created_at, updated_at) "
+                             "VALUES (?, ?, ?, ?, ?)", rows)
+            return conn.total_changes - before
+
+    def _reclaim_expired(self, conn, now):
+        """回收过期的租约: 达到最大尝试次数的进入死信状态，其余重新排队"""
+        conn.execute("UPDATE work_items SET state = ?, lease_owner = NULL, last_error = ?, updated_at = ? "
+                     "WHERE state = ? AND lease_expires < ? AND attempts >= ?",
+                     (DEAD, "租约过期", now, LEASED, now, self.max_attempts))
+        conn.execute("UPDATE work_items SET state = ?, lease_owner = NULL, updated_at = ? "
+                     "WHERE state = ? AND lease_expires < ?",
+                     (PENDING, now, LEASED, now))
+
+    def lease(self, worker_id, platforms=PLATFORMS, limit=1):
+        """
+        领取工作项
+
+        Args:
+            worker_id: 工作进程标识
+            platforms: 要领取的平台
+            limit: 最多领取的数量
+
+        Returns:
+            工作项列表 [{"id", "platform", "video", "attempts"}]，没有可领取的工作项 (或已达到并发上限) 时为空
+        """
+        if isinstance(platforms, str):
+            platforms = (platforms,)
+        now = time.time()
+        leased = []
+        with self._transaction() as conn:
+            self._reclaim_expired(conn, now)
+            caps = dict(conn.execute("SELECT platform, max_leases FROM platform_caps"))
+            for platform in platforms:
+                room = limit - len(leased)
+                if room <= 0:
+                    break
+                if platform in caps:
+                    active = conn.execute("SELECT COUNT(*) FROM work_items WHERE platform = ? AND state = ?",
+                                          (platform, LEASED)).fetchone()[0]
+                    room = min(room, caps[platform] - active)
+                    if room <= 0:
+                        continue
+                rows = conn.execute("SELECT id, platform, video, attempts + 1 FROM work_items "
+                                    "WHERE platform = ? AND state = ? AND not_before <= ? ORDER BY id LIMIT ?",
+                                    (platform, PENDING, now, room)).fetchall()
+                conn.executemany("UPDATE work_items SET state = ?, lease_owner = ?, lease_expires = ?, "
+                                 "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                                 [(LEASED, worker_id, now + self.lease_seconds, now, row[0]) for row in rows])
+                leased.extend(_item(row) for row in rows)
+        return leased
+
+    def heartbeat(self, item_ids, worker_id):
+        """
+        为持有的工作项续约
+
+        Returns:
+            已经失去租约的工作项ID列表 (租约过期后被回收或被其他工作进程领取)
+        """
+        item_ids = list(item_ids)
+        if not item_ids:
+            return []
+        now = time.time()
+        lost = []
+        with self._transaction() as conn:
+            for item_id in item_ids:
+                cursor = conn.execute("UPDATE work_items SET lease_expires = ?, updated_at = ? "
+                                      "WHERE id = ? AND state = ? AND lease_owner = ?",
+                                      (now + self.lease_seconds, now, item_id, LEASED, worker_id))
+                if cursor.rowcount == 0:
+                    lost.append(item_id)
+        return lost
+
+    def complete(self, item_id, worker_id, result=None):
+        """
+        标记工作项完成
+
+        租约已过期但还没有被其他工作进程领取时同样标记完成；已被其他工作进程领取时返回 False。
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute("UPDATE work_items SET state = ?, lease_owner = NULL, result = ?, last_error = NULL, "
+                                  "updated_at = ? WHERE id = ? AND (state = ? AND lease_owner = ? OR state = ?)",
+                                  (DONE, json.dumps(result, ensure_ascii=False) if result is not None else None,
+                                   now, item_id, LEASED, worker_id, PENDING))
+            return cursor.rowcount > 0
+
+    def fail(self, item_id, worker_id, error, retry=True):
+        """
+        记录失败: 未达到最大尝试次数时按指数退避重新排队，否则进入死信状态
+
+        Args:
+            item_id: 工作项ID
+            worker_id: 工作进程标识
+            error: 错误信息
+            retry: 为 False 时直接进入死信状态 (如视频不存在)
+
+        Returns:
+            工作项的新状态，失去租约时为 None
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT attempts FROM work_items WHERE id = ? AND state = ? AND lease_owner = ?",
+                               (item_id, LEASED, worker_id)).fetchone()
+            if row is None:
+                return None
+            attempts = row[0]
+            state = PENDING if retry and attempts < self.max_attempts else DEAD
+            not_before = now + self.retry_delay * 2 ** (attempts - 1) if state == PENDING else 0
+            conn.execute("UPDATE work_items SET state = ?, lease_owner = NULL, not_before = ?, last_error = ?, "
+                         "updated_at = ? WHERE id = ?", (state, not_before, str(error), now, item_id))
+            return state
+
+    def release(self, item_ids, worker_id):
+        """归还工作项 (不计入尝试次数)，用于工作进程正常退出时交还还没开始的工作"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany("UPDATE work_items SET state = ?, lease_owner = NULL, attempts = MAX(attempts - 1, 0), "
+                             "updated_at = ? WHERE id = ? AND state = ? AND lease_owner = ?",
+                             [(PENDING, now, item_id, LEASED, worker_id) for item_id in item_ids])
+
+    def set_cap(self, platform, max_leases):
+        """设置平台的并发上限 (所有工作进程同时持有的租约数)，为 None 时取消上限"""
+        with self._transaction() as conn:
+            if max_leases is None:
+                conn.execute("DELETE FROM platform_caps WHERE platform = ?", (platform,))
+            else:
+                conn.execute("INSERT OR REPLACE INTO platform_caps (platform, max_leases) VALUES (?, ?)",
+                             (platform, int(max_leases)))
+
+    def requeue_dead(self, platform=None):
+        """把死信工作项重新排队 (重置尝试次数)，返回重新排队的数量"""
+        sql = "UPDATE work_items SET state = ?, attempts = 0, not_before = 0, updated_at = ? WHERE state = ?"
+        params = [PENDING, time.time(), DEAD]
+        if platform:
+            sql += " AND platform = ?"
+            params.append(platform)
+        with self._transaction() as conn:
+            return conn.execute(sql, params).rowcount
+
+    def stats(self):
+        """各平台各状态的工作项数量，以及并发上限和租约时长"""
+        with self._lock:
+            rows = self._conn.execute("SELECT platform, state, COUNT(*) FROM work_items GROUP BY platform, state")
+            counts = {}
+            for platform, state, count in rows:
+                counts.setdefault(platform, dict.fromkeys(STATES, 0))[state] = count
+            caps = dict(self._conn.execute("SELECT platform, max_leases FROM platform_caps"))
+        return {"platforms": counts, "caps": caps, "lease_seconds": self.lease_seconds}
+
+    def items(self, state=None, platform=None, limit=100):
+        """列出工作项 (最近更新的在前)"""
+        sql = ("SELECT id, platform, video, state, attempts, lease_owner, last_error, result FROM work_items "
+               "WHERE 1 = 1")
+        params = []
+        if state:
+            sql += " AND state = ?"
+            params.append(state)
+        if platform:
+            sql += " AND platform = ?"
+            params.append(platform)
+        sql += " ORDER BY updated_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        names = ("id", "platform", "video", "state", "attempts", "lease_owner", "last_error", "result")
+        items = [dict(zip(names, row)) for row in rows]
+        for item in items:
+            if item["result"]:
+                item["result"] = json.loads(item["result"])
+        return items
+
+    def pending(self, platforms=PLATFORMS):
+        """尚未完成的工作项数 (等待中 + 已租出)"""
+        if isinstance(platforms, str):
+            platforms = (platforms,)
+        counts = self.stats()["platforms"]
+        return sum(counts.get(platform, {}).get(state, 0) for platform in platforms for state in (PENDING, LEASED))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# 协调进程通过 HTTP 提供的方法
+REMOTE_METHODS = ("enqueue", "lease", "heartbeat", "complete", "fail", "release", "set_cap", "requeue_dead",
+                  "stats", "items", "pending")
+
+
+class QueueServer:
+    """
+    在一台机器上运行的协调进程，通过 HTTP 把 WorkQueue 提供给其他机器
+
+    每个方法对应 POST /<方法名>，请求体为关键字参数的 JSON，响应体为 {"result": 返回值}。
+    """
+
+    def __init__(self, queue, host="0.0.0.0", port=DEFAULT_PORT):
+        """
+        Args:
+            queue: WorkQueue
+            host: 监听地址
+            port: 监听端口 (0 表示随机端口)
+        """
+        from http.server import ThreadingHTTPServer
+
+        self.queue = queue
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+
+    @property
+    def address(self):
+        return self._server.server_address[:2]
+
+    def serve_forever(self):
+        logger.info(f"队列协调服务已启动: http://{self.address[0]}:{self.address[1]}")
+        self._server.serve_forever()
+
+    def start(self):
+        """在后台线程中运行"""
+        threading.Thread(target=self.serve_forever, name="work-queue-http", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _make_handler(self):
+        from http.server import BaseHTTPRequestHandler
+
+        queue = self.queue
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                method = self.path.strip("/")
+                if method not in REMOTE_METHODS:
+                    self.send_error(404)
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                    kwargs = json.loads(self.rfile.read(length) or b"{}")
+                    body = {"result": getattr(queue, method)(**kwargs)}
+                    status = 200
+                except Exception as e:
+                    logger.warning(f"队列请求 {method} 失败: {str(e)}")
+                    body = {"error": str(e)}
+                    status = 400 if isinstance(e, (TypeError, ValueError)) else 500
+                payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class RemoteWorkQueue:
+    """通过 HTTP 访问协调进程的队列客户端 (方法与 WorkQueue 相同)"""
+
+    def __init__(self, url, timeout=BUSY_TIMEOUT + 10):
+        """
+        Args:
+            url: 协调进程地址 (如 http://coordinator:8765)
+            timeout: 单次请求超时 (秒)
+        """
+        import requests
+
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _call(self, method, **kwargs):
+        response = self.session.post(f"{self.url}/{method}", json=kwargs, timeout=self.timeout)
+        try:
+            body = response.json()
+        except ValueError:
+            body = {"error": f"HTTP {response.status_code}"}
+        if response.status_code != 200:
+            raise RuntimeError(f"队列请求 {method} 失败: {body.get('error')}")
+        return body["result"]
+
+    def enqueue(self, platform, videos):
+        return self._call("enqueue", platform=platform, videos=list(videos))
+
+    def lease(self, worker_id, platforms=PLATFORMS, limit=1):
+        return self._call("lease", worker_id=worker_id, platforms=platforms, limit=limit)
+
+    def heartbeat(self, item_ids, worker_id):
+        return self._call("heartbeat", item_ids=list(item_ids), worker_id=worker_id)
+
+    def complete(self, item_id, worker_id, result=None):
+        return self._call("complete", item_id=item_id, worker_id=worker_id, result=result)
+
+    def fail(self, item_id, worker_id, error, retry=True):
+        return self._call("fail", item_id=item_id, worker_id=worker_id, error=str(error), retry=retry)
+
+    def release(self, item_ids, worker_id):
+        return self._call("release", item_ids=list(item_ids), worker_id=worker_id)
+
+    def set_cap(self, platform, max_leases):
+        return self._call("set_cap", platform=platform, max_leases=max_leases)
+
+    def requeue_dead(self, platform=None):
+        return self._call("requeue_dead", platform=platform)
+
+    def stats(self):
+        return self._call("stats")
+
+    def items(self, state=None, platform=None, limit=100):
+        return self._call("items", state=state, platform=platform, limit=limit)
+
+    def pending(self, platforms=PLATFORMS):
+        return self._call("pending", platforms=platforms)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def open_queue(location=DEFAULT_QUEUE_PATH, **kwargs):
+    """
+    打开队列: http(s):// 地址使用协调进程，否则为本地 (或网络文件系统上的) 队列文件
+
+    Args:
+        location: 队列文件路径或协调进程地址
+        kwargs: 传给 WorkQueue 的其他参数
+    """
+    if location.startswith(("http://", "https://")):
+        return RemoteWorkQueue(location)
+    return WorkQueue(location, **kwargs)
+
+
+class LeaseKeeper:
+    """
+    在后台线程中为工作进程持有的全部工作项续约
+
+    失去租约的工作项会从持有列表中移除并记录日志 (可能已被其他工作进程领取)。
+    """
+
+    def __init__(self, queue, worker_id, interval=LEASE_SECONDS / 3):
+        """
+        Args:
+            queue: WorkQueue 或 RemoteWorkQueue
+            worker_id: 工作进程标识
+            interval: 续约间隔 (秒)，应明显小于租约时长
+        """
+        self.queue = queue
+        self.worker_id = worker_id
+        self.interval = interval
+        self._held = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def hold(self, item_id):
+        with self._lock:
+            self._held.add(item_id)
+
+    def drop(self, item_id):
+        with self._lock:
+            self._held.discard(item_id)
+
+    def held(self):
+        with self._lock:
+            return list(self._held)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="work-queue-heartbeat", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            held = self.held()
+            try:
+                lost = self.queue.heartbeat(held, self.worker_id)
+            except Exception as e:
+                logger.warning(f"续约失败: {str(e)}")
+                continue
+            for item_id in lost:
+                logger.warning(f"工作项 #{item_id} 的租约已失效，可能已被其他工作进程领取")
+                self.drop(item_id)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def finish_item(queue, worker_id, item, entry):
+    """根据清单条目把工作项标记为完成或失败，返回日志用的状态描述"""
+    if entry["error"]:
+        state = queue.fail(item["id"], worker_id, entry["error"], retry=entry["error"] not in PERMANENT_ERRORS)
+        return {PENDING: "稍后重试", DEAD: "进入死信", None: "租约已失效"}[state]
+    result = {name: entry.get(name) for name in ("output_file", "comment_count", "total_comments", "seconds")}
+    return "完成" if queue.complete(item["id"], worker_id, result) else "完成 (租约已被其他工作进程领取)"
+
+
+def main(argv=None, prog=None):
+    """队列管理命令"""
+    parser = argparse.ArgumentParser(prog=prog, description="多节点共享的视频抓取队列")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="COMMAND")
+
+    add = commands.add_parser("add", help="添加视频 (已在队列中的视频会被忽略)")
+    add.add_argument("queue", help="队列文件路径或协调进程地址")
+    add.add_argument("platform", choices=PLATFORMS)
+    add.add_argument("file", help="视频列表文件 (每行一个，- 表示标准输入)")
+
+    stats = commands.add_parser("stats", help="显示各平台各状态的工作项数量")
+    stats.add_argument("queue")
+
+    items = commands.add_parser("list", help="列出工作项")
+    items.add_argument("queue")
+    items.add_argument("--state", choices=STATES, default=None)
+    items.add_argument("--platform", choices=PLATFORMS, default=None)
+    items.add_argument("--limit", type=int, default=100)
+
+    cap = commands.add_parser("cap", help="设置平台的并发上限 (所有节点同时抓取的视频数，0 表示不限)")
+    cap.add_argument("queue")
+    cap.add_argument("platform", choices=PLATFORMS)
+    cap.add_argument("max_leases", type=int)
+
+    requeue = commands.add_parser("requeue", help="把死信工作项重新排队")
+    requeue.add_argument("queue")
+    requeue.add_argument("platform", nargs="?", choices=PLATFORMS, default=None)
+
+    serve = commands.add_parser("serve", help="运行协调进程，通过 HTTP 提供队列")
+    serve.add_argument("queue", help="队列文件路径")
+    serve.add_argument("--host", default="0.0.0.0", help="监听地址")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT, help="监听端口")
+    serve.add_argument("--lease-seconds", type=float, default=LEASE_SECONDS, help="租约时长 (秒)")
+    serve.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS, help="最大尝试次数")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == "serve":
+        queue = WorkQueue(args.queue, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+        server = QueueServer(queue, args.host, args.port)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logger.info("协调服务已退出")
+        finally:
+            server.stop()
+            queue.close()
+        return 0
+
+    with open_queue(args.queue) as queue:
+        if args.command == "add":
+            from batch_utils import read_video_list
+
+            videos = read_video_list(args.file)
+            added = queue.enqueue(args.platform, videos)
+            logger.info(f"添加 {added} 个视频 ({len(videos) - added} 个已在队列中)")
+        elif args.command == "cap":
+            queue.set_cap(args.platform, args.max_leases or None)
+        elif args.command == "requeue":
+            logger.info(f"重新排队 {queue.requeue_dead(args.platform)} 个死信工作项")
+        elif args.command == "stats":
+            print(json.dumps(queue.stats(), ensure_ascii=False, indent=2))
+        elif args.command == "list":
+            print(json.dumps(queue.items(args.state, args.platform, args.limit), ensure_ascii=False, indent=2))
+    return 0
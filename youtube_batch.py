@@ -0,0 +1,243 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import config
+import youtube_comments_scraper as scraper
+from batch_utils import write_manifest
+from rate_limiter import RateLimiter
+from youtube_key_pool import ApiKeyPool, QuotaExhausted, plan_batch
+from youtube_videos import VideoInfoCache, fetch_video_info, skip_reason
+
+logger = logging.getLogger(__name__)
+
+# 批量模式默认并发抓取的视频数
+BATCH_WORKERS = 4
+
+# 批量模式所有视频共享的默认请求速率 (次/秒)
+BATCH_RATE = 20.0
+
+
+def crawl_video(video_url, key_pool, limiter, video_info=None, **kwargs):
+    """在工作线程中抓取单个视频，返回清单条目"""
+    stats = {}
+    started = time.monotonic()
+    try:
+        scraper.get_comments(video_url, key_pool=key_pool, limiter=limiter, stats=stats,
+                             video_info=video_info, keep_records=False, **kwargs)
+    except Exception as e:
+        stats["error"] = str(e)
+    return {
+        "input": video_url,
+        "video_id": scraper.get_video_id_from_url(video_url),
+        "output_file": stats.get("output_file"),
+        "comment_count": stats.get("comment_count", 0),
+        "total_comments": stats.get("total_comments", 0),
+        "seconds": round(time.monotonic() - started, 3),
+        "error": stats.get("error"),
+    }
+
+
+def run_batch(videos, key_pool=None, workers=BATCH_WORKERS, rate=BATCH_RATE, manifest_path=None, adaptive=True,
+              **kwargs):
+    """
+    使用有界线程池批量抓取多个视频的评论
+
+    所有视频共享同一个密钥池 (API 客户端和配额计数) 和同一个 RateLimiter，
+    每个视频写入自己的输出文件，全部结束后 (以及每完成一个视频时) 更新汇总清单。
+    开始前每 50 个视频合并一次 videos.list 请求，跳过不存在或禁用评论的视频 (记录在清单的 skipped 中)，
+    再根据剩余配额和已知的评论数筛选视频，预计超出配额的视频记录在清单的 deferred 中。
+    某一组 videos.list 请求失败时这些视频照常抓取；查询时配额已经用完则全部视频记录在 deferred 中并保存配额计数。
+
+    Args:
+        videos: 视频 URL 或 ID 列表
+        key_pool: 共享的 ApiKeyPool，为 None 时按配置新建
+        workers: 同时抓取的视频数
+        rate: 所有视频共享的请求速率上限 (次/秒)，<= 0 表示不限速
+        manifest_path: 清单文件路径，为 None 时自动生成
+        adaptive: 是否根据服务器响应自适应调整共享的请求速率 (不超过 rate)
+        kwargs: 传给 get_comments 的其他参数 (count, include_replies, sort_by 等)
+
+    Returns:
+        清单字典
+    """
+    if manifest_path is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        manifest_path = os.path.join(scraper.SAVE_DIR, f"batch_{timestamp}_manifest.json")
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+
+    if key_pool is None:
+        key_pool = ApiKeyPool(config.YOUTUBE_API_KEYS, config.YOUTUBE_DAILY_QUOTA)
+    if adaptive:
+        limiter = RateLimiter.adaptive("youtube", max_rate=rate, burst=max(1, workers))
+    else:
+        limiter = RateLimiter(rate, burst=max(1, workers))
+
+    # 批量查询视频信息，提前跳过不存在或禁用评论的视频；
+    # 某一组查询失败时这些视频照常抓取 (由 get_comments 单独查询)，配额用完时整批推迟
+    video_ids = {video: scraper.get_video_id_from_url(video) for video in videos}
+    try:
+        video_info = fetch_video_info([video_id for video_id in video_ids.values() if video_id], key_pool,
+                                      VideoInfoCache(), limiter, scraper.execute_with_retry, skip_failed=True)
+    except QuotaExhausted as e:
+        logger.error(f"{str(e)}，{len(videos)} 个视频全部推迟到下次抓取")
+        key_pool.flush()
+        limiter.save()
+        manifest = {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "videos": [],
+            "deferred": list(videos),
+            "skipped": [],
+            "quota": key_pool.report(),
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        write_manifest(manifest_path, manifest)
+        return manifest
+    skipped = []
+    candidates = []
+    comment_counts = {}
+    for video in videos:
+        info = video_info.get(video_ids[video])
+        reason = skip_reason(info) if video_ids[video] else "invalid_url"
+        if reason:
+            skipped.append({"input": video, "video_id": video_ids[video], "reason": reason})
+            continue
+        candidates.append(video)
+        if info is not None:
+            comment_counts[video] = info["comment_count"]
+    if skipped:
+        logger.info(f"跳过 {len(skipped)} 个不存在或禁用评论的视频")
+
+    # 根据剩余配额决定本次抓取哪些视频
+    videos, deferred = plan_batch(candidates, key_pool, kwargs.get("count", 100),
+                                  kwargs.get("include_replies", True), comment_counts)
+
+    if limiter.is_adaptive:
+        logger.info(f"批量抓取 {len(videos)} 个视频，并发数 {workers}，"
+                    f"共享速率自适应调整 (当前 {limiter.bucket.rate:.1f} 次/秒，上限 {limiter.bucket.max_rate} 次/秒)")
+    else:
+        logger.info(f"批量抓取 {len(videos)} 个视频，并发数 {workers}，共享速率 {rate} 次/秒")
+    logger.info(f"剩余配额 {key_pool.remaining()} 单位 ({len(key_pool)} 个密钥)")
+    logger.info(f"清单将保存到: {manifest_path}")
+
+    started = time.monotonic()
+    results = [None] * len(videos)
+    manifest = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "videos": results,
+        "deferred": deferred,
+        "skipped": skipped,
+    }
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(crawl_video, video, key_pool, limiter,
+                            video_info.get(video_ids[video]), **kwargs): index
+            for index, video in enumerate(videos)
+        }
+        done = 0
+        for future in as_completed(futures):
+            entry = future.result()
+            results[futures[future]] = entry
+            done += 1
+            if entry["error"]:
+                logger.warning(f"[{done}/{len(videos)}] {entry['input']} 失败: {entry['error']}")
+            else:
+                logger.info(f"[{done}/{len(videos)}] {entry['input']} 完成: {entry['total_comments']} 条评论, {entry['seconds']} 秒")
+            manifest.update(
+                elapsed_seconds=round(time.monotonic() - started, 3),
+                requests=limiter.request_count,
+                throttled_seconds=round(limiter.slept_seconds, 3),
+                request_rate=round(limiter.bucket.rate, 3),
+                quota=key_pool.report(),
+            )
+            write_manifest(manifest_path, manifest)
+
+    key_pool.flush()
+    limiter.save()
+    manifest["quota"] = key_pool.report()
+    manifest["finished_at"] = datetime.now().isoformat(timespec="seconds")
+    write_manifest(manifest_path, manifest)
+
+    failed = sum(1 for entry in results if entry["error"])
+    total = sum(entry["total_comments"] for entry in results)
+    logger.info(f"✅ 批量抓取完成 - {len(videos) - failed} 个成功, {failed} 个失败, 共 {total} 条评论")
+    return manifest
+
+
+def run_queue_worker(queue, worker_id=None, key_pool=None, workers=BATCH_WORKERS, rate=BATCH_RATE, adaptive=True,
+                     idle_exit=True, poll_interval=10, **kwargs):
+    """
+    从共享队列中领取 YouTube 视频并抓取 (多台机器可以同时运行，共享同一个队列)
+
+    最多同时持有 workers 个租约，后台线程定期为持有的工作项续约。抓取成功的视频标记为完成，
+    失败的视频由队列按指数退避重试或放入死信。
+
+    Args:
+        queue: WorkQueue 或 RemoteWorkQueue
+        worker_id: 工作进程标识，为 None 时使用 主机名:进程号
+        key_pool: 共享的 ApiKeyPool，为 None 时按配置新建
+        workers: 同时抓取的视频数
+        rate: 本进程的请求速率上限 (次/秒)
+        adaptive: 是否根据服务器响应自适应调整请求速率
+        idle_exit: 队列中没有未完成的 YouTube 视频时是否退出 (为 False 时持续等待新的视频)
+        poll_interval: 没有可领取的视频时的等待间隔 (秒)
+        kwargs: 传给 get_comments 的其他参数 (count, include_replies, sort_by 等)
+
+    Returns:
+        本进程处理的视频数
+    """
+    from work_queue import LEASE_SECONDS, LeaseKeeper, default_worker_id, finish_item
+
+    worker_id = worker_id or default_worker_id()
+    if key_pool is None:
+        key_pool = ApiKeyPool(config.YOUTUBE_API_KEYS, config.YOUTUBE_DAILY_QUOTA)
+    if adaptive:
+        limiter = RateLimiter.adaptive("youtube", max_rate=rate, burst=max(1, workers))
+    else:
+        limiter = RateLimiter(rate, burst=max(1, workers))
+    lease_seconds = queue.stats().get("lease_seconds", LEASE_SECONDS)
+    logger.info(f"队列工作进程 {worker_id} 已启动，并发数 {workers}")
+
+    processed = 0
+    running = {}
+    with LeaseKeeper(queue, worker_id, lease_seconds / 3) as keeper, \
+            ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        try:
+            while True:
+                # 配额用完后不再领取新的视频，留给其他密钥还有配额的节点
+                exhausted = key_pool.remaining() <= 0
+                if len(running) < workers and not exhausted:
+                    for item in queue.lease(worker_id, "youtube", workers - len(running)):
+                        keeper.hold(item["id"])
+                        running[executor.submit(crawl_video, item["video"], key_pool, limiter, **kwargs)] = item
+                if not running:
+                    if exhausted:
+                        logger.warning("API 配额已用完，停止领取新的视频")
+                        break
+                    if idle_exit and not queue.pending("youtube"):
+                        break
+                    time.sleep(poll_interval)
+                    continue
+                future = next(as_completed(running))
+                item = running.pop(future)
+                entry = future.result()
+                keeper.drop(item["id"])
+                if entry["error"] == "quota_exhausted":
+                    queue.release([item["id"]], worker_id)
+                    logger.info(f"[#{item['id']}] {item['video']} 配额不足，已归还队列")
+                    continue
+                processed += 1
+                logger.info(f"[#{item['id']}] {item['video']} {finish_item(queue, worker_id, item, entry)}: "
+                            f"{entry['total_comments']} 条评论, {entry['seconds']} 秒")
+        finally:
+            # 中断时归还还在抓取的视频 (不计入尝试次数)
+            if running:
+                queue.release([item["id"] for item in running.values()], worker_id)
+            key_pool.flush()
+            limiter.save()
+
+    logger.info(f"✅ 队列工作进程退出 - 处理了 {processed} 个视频")
+    return processed
@@ -0,0 +1,144 @@
+import logging
+import threading
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# YouTube Data API v3 地址
+API_BASE = "https://www.googleapis.com/youtube/v3"
+
+# 连接池大小 (应不小于同时发出请求的线程数)
+POOL_SIZE = 32
+
+# 单次HTTP请求超时 (秒)
+REQUEST_TIMEOUT = 30
+
+# 各个方法默认只请求用到的字段 (partial response)，减少传输的字节数
+DEFAULT_FIELDS = {
+    "commentThreads.list": (
+        "nextPageToken,"
+        "items(id,snippet(totalReplyCount,topLevelComment(id,snippet(textDisplay,likeCount,publishedAt))),"
+        "replies(comments(id,snippet(textDisplay,likeCount,parentId,publishedAt))))"
+    ),
+    "comments.list": "nextPageToken,items(id,snippet(textDisplay,likeCount,parentId,publishedAt))",
+    "videos.list": "items(id,statistics(commentCount))",
+}
+
+# Google API 只有在 User-Agent 中包含 gzip 时才会压缩响应
+USER_AGENT = "comment-scraper (gzip)"
+
+
+class YouTubeApiError(Exception):
+    """YouTube API 返回的错误响应"""
+
+    def __init__(self, status, reason=None, message=None, content=b""):
+        self.status = status
+        self.reason = reason
+        self.message = message
+        self.content = content
+        super().__init__(f"HTTP {status} {reason or ''}: {message or ''}".strip())
+
+    @classmethod
+    def from_response(cls, response):
+        """从错误响应中解析出错误原因 (如 quotaExceeded、commentsDisabled)"""
+        reason = None
+        message = response.reason
+        try:
+            error = response.json().get("error", {})
+            message = error.get("message", message)
+            errors = error.get("errors") or []
+            if errors:
+                reason = errors[0].get("reason")
+        except ValueError:
+            pass
+        return cls(response.status_code, reason, message, response.content)
+
+
+class YouTubeClient:
+    """
+    精简的 YouTube Data API 客户端
+
+    只实现 commentThreads.list、comments.list 和 videos.list。
+    所有线程共享一个带连接池的 requests.Session (长连接 + gzip)，
+    不需要加载 discovery 文档。API 密钥在每次请求时传入，方便密钥池轮换。
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, timeout=REQUEST_TIMEOUT, api_base=API_BASE):
+        """
+        Args:
+            pool_size: 连接池大小
+            timeout: 单次请求超时 (秒)
+            api_base: API 地址 (基准测试时指向本地的模拟服务器)
+        """
+        self.timeout = timeout
+        self.api_base = api_base.rstrip("/")
+        # 只有真正发出请求时才导入 requests (查看帮助等无需联网的操作不加载)
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Accept-Encoding": "gzip", "User-Agent": USER_AGENT})
+        self.request_count = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+
+    def request(self, method, key, **params):
+        """
+        调用一个 list 方法
+
+        Args:
+            method: API 方法名 (如 "commentThreads.list")
+            key: API 密钥
+            params: 查询参数，未指定 fields 时使用 DEFAULT_FIELDS 中的默认字段
+
+        Returns:
+            解析后的 JSON 响应
+        """
+        resource = method.split(".")[0]
+        if "fields" not in params and method in DEFAULT_FIELDS:
+            params["fields"] = DEFAULT_FIELDS[method]
+        params = {name: value for name, value in params.items() if value is not None}
+        params["key"] = key
+
+        started = time.perf_counter()
+        response = self.session.get(f"{self.api_base}/{resource}", params=params, timeout=self.timeout)
+        # 压缩后的字节数 (未压缩时为正文长度)
+        size = int(response.headers.get("Content-Length") or len(response.content))
+        with self._lock:
+            self.request_count += 1
+            self.bytes_received += size
+        metrics.observe_request("youtube", resource, time.perf_counter() - started, str(response.status_code))
+        metrics.record_bytes("youtube", size)
+        if response.status_code != 200:
+            raise YouTubeApiError.from_response(response)
+        return response.json()
+
+    def comment_threads(self, key, **params):
+        return self.request("commentThreads.list", key, **params)
+
+    def comments(self, key, **params):
+        return self.request("comments.list", key, **params)
+
+    def videos(self, key, **params):
+        return self.request("videos.list", key, **params)
+
+    def close(self):
+        self.session.close()
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def default_client():
+    """进程内共享的客户端 (所有密钥池和视频验证共用一个连接池)"""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = YouTubeClient()
+        return _default_client
@@ -3,29 +3,40 @@ import json
 import argparse
 import logging
 import time
-import random
 import re
 import socket
 from datetime import datetime
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-import requests
 import ssl
 
+import config
+import metrics
+from metrics import METRICS_INTERVAL, MetricsExporter
+from checkpoint import find_checkpoint, load_checkpoint, save_checkpoint, truncate_output
+from comment_filter import load_comment_filter
+from comment_stream import YouTubeThreadReader
+from comment_writer import (OUTPUT_FORMATS, JsonlCommentWriter, export_pretty_json, open_comment_writer,
+                            output_path_for)
+from youtube_client import YouTubeApiError
+from rate_limiter import RateLimiter
+from youtube_key_pool import ApiKeyPool, QuotaExhausted, is_rate_limit_error
+from youtube_videos import VideoInfoCache, fetch_video_info, skip_reason
+
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# 设置API密钥
-from config import YOUTUBE_API_KEY
-
-
 # 最大重试次数
 MAX_RETRIES = 3
 
 # 保存目录
 SAVE_DIR = os.path.join("data", "youtube")
 
+# 并发获取回复的默认线程数
+REPLY_WORKERS = 8
+
+# 单次HTTP请求超时 (秒)
+REQUEST_TIMEOUT = 30
+
 def get_video_id_from_url(url):
     """从YouTube URL中提取视频ID"""
     # 检查是否直接是视频ID (通常是11个字符的字母数字组合)
@@ -49,39 +60,61 @@ def get_video_id_from_url(url):
     return None
 
 def validate_video_id(video_id):
-    """验证视频ID是否有效"""
+    """检查视频ID格式是否有效 (视频是否存在由 videos.list 查询)"""
     if not video_id:
         return False
     
     # 检查格式是否符合YouTube视频ID (通常11个字符)
-    if not re.match(r'^[A-Za-z0-9_-]{11}$', video_id):
-        return False
-    
-    # 尝试访问YouTube API验证视频是否存在
+    return re.match(r'^[A-Za-z0-9_-]{11}$', video_id) is not None
+
+def get_video_info(video_id, key_pool, limiter=None):
+    """
+    查询单个视频的信息 (优先使用磁盘缓存)
+
+    Returns:
+        视频信息字典，查询失败时返回 None (按视频存在处理)
+    """
     try:
-        response = requests.get(f"https://www.youtube.com/oembed?url=http://www.youtube.com/watch?v={video_id}&format=json")
-        return response.status_code == 200
-    except:
+        return fetch_video_info([video_id], key_pool, VideoInfoCache(), limiter, execute_with_retry).get(video_id)
+    except QuotaExhausted:
+        raise
+    except Exception as e:
         # 请求失败但不一定意味着视频不存在，可能是网络问题
-        return True
+        logger.warning(f"查询视频信息失败: {str(e)}")
+        return None
+
+def save_comments_to_file(writer, is_final=False, pretty_json=False):
+    """
+    将已追加写入的评论落盘
 
-def save_comments_to_file(comments, file_path, is_final=False):
-    """保存评论到文件"""
+    Args:
+        writer: JsonlCommentWriter 或 ColumnarCommentWriter 实例
+        is_final: 是否为最终保存 (会关闭文件)
+        pretty_json: 最终保存时是否额外导出带缩进的 JSON 文件
+    """
+    if writer is None or writer.closed:
+        return
     try:
-        # 确保目录存在
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(comments, f, ensure_ascii=False, indent=2)
+        flushed = writer.flush()
         if is_final:
-            logger.info(f"✅ 成功保存 {len(comments)} 条评论到 {file_path}")
+            writer.close()
+            logger.info(f"✅ 成功保存 {writer.count} 条评论到 {writer.file_path}")
+            if pretty_json and isinstance(writer, JsonlCommentWriter):
+                json_path, exported = export_pretty_json(writer.file_path)
+                logger.info(f"已导出 {exported} 条评论到 {json_path}")
         else:
-            logger.debug(f"已将 {len(comments)} 条评论增量保存到 {file_path}")
+            logger.debug(f"已将 {flushed} 条评论增量保存到 {writer.file_path}")
     except Exception as e:
         logger.error(f"保存评论到文件失败: {str(e)}")
 
-def execute_with_retry(func, *args, **kwargs):
-    """执行函数并在失败时重试"""
+def execute_with_retry(func, *args, endpoint=None, **kwargs):
+    """
+    执行函数并在网络错误时重试
+
+    Args:
+        func: 要执行的函数，其余参数原样传给它
+        endpoint: 重试指标中的接口名称 (与请求指标相同，如 "commentThreads")
+    """
     retries = 0
     while retries < MAX_RETRIES:
         try:
@@ -90,6 +123,8 @@ def execute_with_retry(func, *args, **kwargs):
             retries += 1
             wait_time = 2 ** retries  # 指数退避策略
             logger.warning(f"网络错误: {str(e)}, 第{retries}次重试, 等待{wait_time}秒...")
+            metrics.record_retry("youtube", endpoint or "unknown")
+            metrics.record_sleep("youtube", "backoff", wait_time)
             time.sleep(wait_time)
         except Exception as e:
             # 其他非网络错误，直接抛出
@@ -98,8 +133,101 @@ def execute_with_retry(func, *args, **kwargs):
     # 所有重试都失败
     raise Exception(f"在{MAX_RETRIES}次尝试后仍然失败")
 
+def call_api(key_pool, method, func, kwargs, limiter=None):
+    """
+    发出一次 API 请求 (限速、密钥轮换、网络错误重试)
+
+    被限流 (HTTP 429 或 403 rateLimitExceeded) 时通知限速器降速，等待后重试，最多 MAX_RETRIES 次；
+    请求成功时通知限速器，自适应限速器据此逐步提速。
+
+    Args:
+        key_pool: ApiKeyPool
+        method: API 方法名 (如 "commentThreads.list")，用于配额计数
+        func: 客户端方法 (如 key_pool.client.comment_threads)
+        kwargs: 查询参数
+        limiter: 共享的 RateLimiter
+    """
+    endpoint = method.split(".")[0]
+    throttled = 0
+    while True:
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            response = key_pool.execute(method, lambda key: execute_with_retry(func, key, endpoint=endpoint,
+                                                                              **kwargs))
+        except YouTubeApiError as e:
+            if not is_rate_limit_error(e) or throttled >= MAX_RETRIES:
+                raise
+            throttled += 1
+            reason = e.reason or f"http_{e.status}"
+            if limiter is not None and limiter.is_adaptive:
+                # 自适应限速器会暂停之后的请求，下一次 acquire 时等待
+                limiter.on_throttle(reason)
+            else:
+                wait_time = 2 ** throttled
+                logger.warning(f"请求被限流 ({reason}), 第{throttled}次重试, 等待{wait_time}秒...")
+                metrics.record_sleep("youtube", "backoff", wait_time)
+                time.sleep(wait_time)
+            continue
+        if limiter is not None:
+            limiter.on_success()
+        return response
+
+def fetch_comment_threads(key_pool, comment_kwargs, page_token=None, limiter=None):
+    """获取一页评论线程 (可在工作线程中调用)"""
+    kwargs = dict(comment_kwargs)
+    if page_token:
+        kwargs['pageToken'] = page_token
+    return call_api(key_pool, "commentThreads.list", key_pool.client.comment_threads, kwargs, limiter)
+
+def fetch_replies(key_pool, parent_id, limiter=None):
+    """
+    获取评论线程的全部回复 (可在工作线程中调用)
+
+    跟随 nextPageToken 翻页，回复超过100条的评论线程也不会被截断。
+
+    Returns:
+        回复条目列表 (comments.list 返回的 items)
+    """
+    replies = []
+    kwargs = {
+        'part': 'snippet',
+        'parentId': parent_id,
+        'maxResults': 100,  # YouTube API一次最多返回100条
+        'textFormat': 'plainText'
+    }
+    while True:
+        response = call_api(key_pool, "comments.list", key_pool.client.comments, kwargs, limiter)
+        replies.extend(response.get('items', []))
+        
+        next_page_token = response.get('nextPageToken')
+        if not next_page_token:
+            return replies
+        kwargs['pageToken'] = next_page_token
+
+def thread_comment_id(item):
+    """评论线程中主评论的ID (通常与线程ID相同)"""
+    return item['snippet']['topLevelComment'].get('id', item['id'])
+
+def get_inline_replies(item):
+    """
+    返回 commentThreads 响应中内联的回复
+
+    请求 part='snippet,replies' 时，每个线程最多内联5条回复。
+    只有内联回复数量等于 totalReplyCount (即回复已经完整) 时才返回列表，否则返回 None。
+    """
+    total_reply_count = item['snippet']['totalReplyCount']
+    inline_replies = item.get('replies', {}).get('comments', [])
+    if len(inline_replies) >= total_reply_count:
+        return inline_replies
+    return None
+
 def get_comments(video_url, count=100, output_filename=None, include_replies=True,
-                sort_by="relevance", debug_mode=False):
+                sort_by="relevance", debug_mode=False, pretty_json=False,
+                reply_workers=REPLY_WORKERS, resume=False, key_pool=None, limiter=None,
+                stats=None, store=None, incremental=False, video_info=None, output_format="jsonl",
+                adaptive=True, shard_size=None, shard_records=None, comment_filter=None, max_matches=None,
+                keep_records=True):
     """
     获取YouTube视频的评论
     
@@ -110,12 +238,45 @@ def get_comments(video_url, count=100, output_filename=None, include_replies=Tru
         include_replies: 是否包含回复评论
         sort_by: 排序方式 ('relevance' 或 'time')
         debug_mode: 是否开启调试模式
+        pretty_json: 获取结束后是否额外导出带缩进的 JSON 文件
+        reply_workers: 并发获取回复的线程数
+        resume: 是否从检查点继续上次中断的抓取 (追加到原输出文件)
+        key_pool: 共享的 ApiKeyPool (持有每个密钥的 API 客户端和配额计数)，为 None 时按配置新建
+        limiter: 共享的 RateLimiter，所有 API 请求发出前都会先获取令牌，为 None 时按 adaptive 创建
+        stats: 可选字典，用于返回输出文件、评论数和错误信息 (批量模式生成清单时使用)
+        store: 可选的 CommentStore，评论按ID去重后写入数据库
+        incremental: 增量模式，按时间倒序抓取，遇到数据库中已有的评论线程即停止 (需要 store)
+        video_info: 预先查询的视频信息 (批量模式使用)，为 None 时在抓取前查询
+        output_format: 输出格式 ("jsonl"、"parquet"、"arrow"、"jsonl.gz" 或 "jsonl.zst")，只有 jsonl 支持断点续抓
+        adaptive: 未指定 limiter 时是否使用根据服务器响应自适应调整的限速器 (否则不限速)
+        shard_size: 压缩分片格式 (jsonl.gz/jsonl.zst) 每个分片压缩后的大小上限 (字节)
+        shard_records: 压缩分片格式每个分片的记录数上限
+        comment_filter: 可选的 CommentFilter，只写出文本匹配的评论和回复 (有回复匹配时主评论作为上下文一起写出，
+            count 仍按检查过的主评论计算)
+        max_matches: 匹配过滤条件的评论 (包含回复) 达到该数量后停止抓取 (每写完一个线程检查一次)
+        keep_records: 是否在内存中保留写出的评论并返回 (命令行和批量模式只写文件，传入 False)
+
+    Returns:
+        写出的评论列表 (keep_records 为 False 时为空列表)
     """
     if debug_mode:
         logger.setLevel(logging.DEBUG)
+    
+    if incremental:
+        if store is None:
+            raise ValueError("增量模式需要指定评论数据库 (store)")
+        # 只有按时间排序时，遇到已存储的评论才说明之后的评论都已抓取过
+        sort_by = "time"
+    
+    if resume and output_format != "jsonl":
+        raise ValueError(f"{output_format} 格式不支持断点续抓")
         
     # 评论列表
     comment_list = []
+    writer = None
+    if stats is None:
+        stats = {}
+    stats.update(output_file=None, comment_count=0, total_comments=0, error=None)
     
     try:
         # 如果未指定输出文件名，根据时间和视频ID生成一个
@@ -123,204 +284,434 @@ def get_comments(video_url, count=100, output_filename=None, include_replies=Tru
         
         if not video_id:
             logger.error("无法获取有效的视频ID，请检查URL格式")
+            stats["error"] = "invalid_url"
             return comment_list
         
+        checkpoint = None
         if output_filename is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_filename = os.path.join(SAVE_DIR, f"youtube_{video_id}_{timestamp}.json")
+            if resume:
+                # 未指定输出文件时，查找该视频最近的检查点
+                checkpoint = find_checkpoint(SAVE_DIR, "youtube", video_id)
+            if checkpoint:
+                output_filename = checkpoint["output_file"]
+            else:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                output_filename = output_path_for(os.path.join(SAVE_DIR, f"youtube_{video_id}_{timestamp}"), output_format)
         else:
             # 确保输出路径在指定目录内
             if not output_filename.startswith(SAVE_DIR):
                 output_filename = os.path.join(SAVE_DIR, os.path.basename(output_filename))
+            output_filename = output_path_for(output_filename, output_format)
+            if resume:
+                checkpoint = load_checkpoint(output_filename)
+        
+        if resume and not checkpoint:
+            logger.warning(f"未找到视频 {video_id} 的检查点，将从头开始抓取")
+        elif checkpoint and checkpoint.get("completed"):
+            logger.info(f"视频 {video_id} 已抓取完成 ({checkpoint['total_comments']} 条评论)，无需继续: {output_filename}")
+            stats.update(output_file=output_filename, comment_count=checkpoint["comment_count"],
+                         total_comments=checkpoint["total_comments"])
+            return comment_list
         
-        # 创建一个空的JSON文件，确保文件存在且可写
-        save_comments_to_file([], output_filename)
-            
         # 验证视频ID
         if not validate_video_id(video_id):
-            logger.error(f"视频ID无效或视频不存在: {video_id}")
+            logger.error(f"视频ID无效: {video_id}")
+            stats["error"] = "video_not_found"
             return comment_list
+        
+        # 密钥池持有YouTube API客户端 (所有工作线程共享同一个连接池)
+        if key_pool is None:
+            key_pool = ApiKeyPool(config.YOUTUBE_API_KEYS, config.YOUTUBE_DAILY_QUOTA)
+        if limiter is None and adaptive:
+            limiter = RateLimiter.adaptive("youtube")
+        
+        # 查询视频是否存在、评论是否被禁用以及评论总数
+        if video_info is None:
+            video_info = get_video_info(video_id, key_pool, limiter)
+        reason = skip_reason(video_info)
+        if reason == "video_not_found":
+            logger.error(f"视频不存在或无法访问: {video_id}")
+        elif reason == "comments_disabled":
+            logger.error("该视频已禁用评论功能")
+        if reason:
+            stats["error"] = reason
+            return comment_list
+        known_total = video_info["comment_count"] if video_info else None
+        if known_total == 0:
+            logger.info("该视频没有评论")
+            return comment_list
+        stats["output_file"] = output_filename
+        
+        if checkpoint:
+            # 丢弃检查点之后写入的不完整分页，然后追加写入
+            truncate_output(output_filename, checkpoint["output_offset"])
+            writer = JsonlCommentWriter(output_filename, append=True)
+            logger.info(f"从检查点继续抓取: 已有 {checkpoint['comment_count']} 条主评论 (总计 {checkpoint['total_comments']} 条)")
+        else:
+            # 创建输出文件，确保文件存在且可写
+            writer = open_comment_writer(output_filename, output_format, shard_size=shard_size,
+                                         shard_records=shard_records)
             
         logger.info(f"开始获取YouTube视频评论: {video_id}")
         logger.info(f"计划获取约 {count} 条评论" + (" (包含回复)" if include_replies else ""))
+        if known_total is not None:
+            # 视频的评论数 (包含回复) 已知时，据此估算需要请求的页数
+            planned = min(count, known_total)
+            logger.info(f"该视频共有 {known_total} 条评论，预计请求 {-(-planned // 100)} 页评论线程")
         
-        # 创建YouTube API客户端，设置超时
-        youtube = build('youtube', 'v3', developerKey=API_KEY, cache_discovery=False)
+        # 获取评论线程
+        comment_count = checkpoint["comment_count"] if checkpoint else 0
+        total_comments = checkpoint["total_comments"] if checkpoint else 0
+        page_token = checkpoint["cursor"] if checkpoint else None
+        # 匹配过滤条件的评论数 (作为上下文写出的主评论不计入)，用于 --max-matches
+        matched_comments = checkpoint.get("matched_comments", total_comments) if checkpoint else 0
+        reached_matches = False
         
-        # 评论请求参数
-        comment_kwargs = {
-            'part': 'snippet',
-            'videoId': video_id,
-            'maxResults': min(100, count),  # YouTube API一次最多返回100条
-            'order': sort_by,  # 'relevance' 或 'time'
-            'textFormat': 'plainText'
-        }
+        # 已计入指标的评论数
+        reported_total = total_comments
         
-        # 获取评论线程
-        next_page_token = None
-        comment_count = 0
-        total_comments = 0
-        last_save_count = 0
+        # 每处理完一页就保存检查点，记录下一页的游标和输出文件位置
+        def save_page_checkpoint(cursor, completed=False):
+            nonlocal reported_total
+            metrics.record_comments("youtube", total_comments - reported_total)
+            reported_total = total_comments
+            save_comments_to_file(writer)
+            if store is not None:
+                store.flush()
+            save_checkpoint(output_filename, "youtube", video_id, cursor, comment_count,
+                            total_comments, writer.offset, completed=completed,
+                            count=count, sort_by=sort_by, matched_comments=matched_comments)
         
-        while comment_count < count:
-            # 添加分页token（如果有）
-            if next_page_token:
-                comment_kwargs['pageToken'] = next_page_token
-                
-            # 获取评论线程
-            try:
-                # 使用重试机制执行API请求
-                response = execute_with_retry(
-                    lambda: youtube.commentThreads().list(**comment_kwargs).execute()
-                )
-                
-                # 检查是否有评论
-                if 'items' not in response or len(response['items']) == 0:
-                    logger.info("该视频没有评论或评论已被禁用")
-                    break
-                    
-            except HttpError as e:
-                if "videoNotFound" in str(e) or "404" in str(e):
-                    logger.error(f"视频不存在或无法访问: {video_id}")
-                elif "commentsDisabled" in str(e):
-                    logger.error("该视频已禁用评论功能")
-                else:
-                    logger.error(f"YouTube API错误: {e}")
-                break
-                
-            # 处理评论
-            for item in response['items']:
-                # 避免超过要求的评论数
-                if comment_count >= count:
-                    break
-                    
-                # 随机延迟，防止请求过于频繁
-                if random.random() < 0.2:  # 20%的概率添加延迟
-                    micro_delay = random.uniform(0.1, 0.5)
-                    time.sleep(micro_delay)
-                
-                try:
-                    # 获取评论信息
-                    comment_info = item['snippet']['topLevelComment']['snippet']
-                    
-                    # 创建精简的评论数据
-                    comment_data = {
-                        "text": comment_info['textDisplay'],
-                        "like_count": comment_info['likeCount'],
-                        "platform": "youtube"
-                    }
-                    
-                    # 获取回复评论
-                    if include_replies and item['snippet']['totalReplyCount'] > 0:
-                        try:
-                            # 使用重试机制获取回复
-                            replies_response = execute_with_retry(
-                                lambda: youtube.comments().list(
-                                    part='snippet',
-                                    parentId=item['id'],
-                                    maxResults=100  # 最多获取100条回复
-                                ).execute()
-                            )
-                            
-                            for reply_item in replies_response.get('items', []):
-                                reply_info = reply_item['snippet']
-                                
-                                # 创建精简的回复数据
-                                reply_data = {
-                                    "text": reply_info['textDisplay'],
-                                    "like_count": reply_info['likeCount'],
-                                    "platform": "youtube"
-                                }
-                                
-                                comment_list.append(reply_data)
-                                total_comments += 1
-                                
-                            if len(replies_response.get('items', [])) > 0:
-                                logger.info(f"评论 #{comment_count + 1} 获取到 {len(replies_response.get('items', []))} 条回复")
-                        
-                        except Exception as e:
-                            logger.warning(f"获取评论回复时出错: {str(e)}")
+        # 分页、回复请求、增量截断和过滤都由 YouTubeThreadReader 完成 (与 comment_stream 的流式接口共用)，
+        # 这里只负责按原始顺序写出并保存检查点
+        reader = YouTubeThreadReader(
+            video_id, key_pool, limiter, count - comment_count, include_replies, sort_by, reply_workers,
+            comment_filter,
+            known_ids=(lambda ids: store.known_ids("youtube", ids)) if incremental else None,
+            max_results=min(100, count, known_total or 100)
+        )
+        pages = reader.pages(page_token)
+        completed = False
+        
+        try:
+            for page in pages:
+                for thread in page:
+                    try:
+                        # 先写主评论，回复紧跟在后面，同一线程在输出文件中连续存放
+                        for record, published in thread.records:
+                            if keep_records:
+                                comment_list.append(record)
+                            writer.write(record)
+                            if store is not None:
+                                store.add("youtube", video_id, record, published)
+                            total_comments += 1
+                        matched_comments += thread.matches
+                        if thread.reply_count:
+                            logger.info(f"评论 #{comment_count + 1} 获取到 {thread.reply_count} 条回复")
+                    except QuotaExhausted:
+                        raise
+                    except Exception as e:
+                        logger.warning(f"处理评论时出错: {str(e)}")
                     
-                    comment_list.append(comment_data)
                     comment_count += 1
-                    total_comments += 1
                     
                     # 每获取10条评论保存一次
                     if comment_count % 10 == 0:
                         logger.info(f"已获取 {comment_count} 条主评论 (总计 {total_comments} 条包含回复)...")
                         # 保存当前评论到文件
-                        save_comments_to_file(comment_list, output_filename)
-                        last_save_count = comment_count
-                        
-                        # 增加随机休眠
-                        rest_time = random.uniform(1.0, 2.0)
-                        logger.debug(f"休息 {rest_time:.2f} 秒...")
-                        time.sleep(rest_time)
-                        
-                except Exception as e:
-                    logger.warning(f"处理评论时出错: {str(e)}")
-                    continue
-            
-            # 检查是否有下一页
-            next_page_token = response.get('nextPageToken')
-            if not next_page_token:
-                break
+                        save_comments_to_file(writer)
+                    
+                    # 每写完一个线程就检查匹配数，够数后不再提交本页剩下的回复请求，也不再请求下一页
+                    if max_matches and matched_comments >= max_matches:
+                        logger.info(f"已写出 {matched_comments} 条匹配的评论，达到 --max-matches 上限，停止抓取")
+                        reader.stop()
+                        reached_matches = True
+                        break
+                
+                # 本页全部写出后保存检查点 (达到匹配上限时视为抓取完成)
+                completed = page.last or reached_matches
+                save_page_checkpoint(None if reached_matches else page.cursor, completed=completed)
+                if reached_matches:
+                    break
+            else:
+                completed = True
+        except YouTubeApiError as e:
+            if e.reason == "videoNotFound" or e.status == 404:
+                logger.error(f"视频不存在或无法访问: {video_id}")
+            elif e.reason == "commentsDisabled":
+                logger.error("该视频已禁用评论功能")
+            else:
+                logger.error(f"YouTube API错误: {e}")
+            stats["error"] = str(e)
+        finally:
+            # 关闭读取器时取消尚未开始的请求，避免中断后继续消耗配额
+            pages.close()
+            key_pool.flush()
+            if limiter is not None:
+                limiter.save()
+            if store is not None:
+                store.flush()
         
-        # 保存最终评论到文件（如果有新增评论）
-        if comment_count > last_save_count:
-            save_comments_to_file(comment_list, output_filename, is_final=True)
+        stats.update(comment_count=comment_count, total_comments=total_comments)
+        
+        # 保存最终评论到文件
+        if completed:
+            save_page_checkpoint(None, completed=True)
+        save_comments_to_file(writer, is_final=True, pretty_json=pretty_json)
         
         logger.info(f"✅ 评论获取完成 - {comment_count} 条主评论 (总计 {total_comments} 条包含回复)")
+        if reader.inline_threads:
+            logger.debug(f"{reader.inline_threads} 个评论线程使用内联回复，未单独请求 comments.list")
+        if reader.skipped_threads:
+            logger.info(f"{reader.skipped_threads} 个评论线程的主评论不匹配过滤条件，未请求回复")
         return comment_list
         
     except KeyboardInterrupt:
         # 用户中断时保存已获取的评论
         logger.info("用户中断了操作，正在保存已获取的评论...")
-        if comment_list:
-            save_comments_to_file(comment_list, output_filename, is_final=True)
-        logger.info(f"已保存 {len(comment_list)} 条评论到 {output_filename}")
+        save_comments_to_file(writer, is_final=True, pretty_json=pretty_json)
+        if writer is not None:
+            logger.info(f"已保存 {writer.count} 条评论到 {output_filename}")
+        return comment_list
+        
+    except QuotaExhausted as e:
+        # 配额用完时保留检查点，次日可以使用 --resume 继续
+        logger.error(f"{str(e)}，已停止抓取，可在配额重置后使用 --resume 继续")
+        stats["error"] = "quota_exhausted"
+        save_comments_to_file(writer, is_final=True, pretty_json=pretty_json)
         return comment_list
         
     except Exception as e:
         # 发生异常时尝试保存已获取的评论
         logger.error(f"获取评论失败: {str(e)}")
-        if comment_list:
+        stats["error"] = str(e)
+        if writer is not None and writer.count:
             logger.info("尝试保存已获取的评论...")
-            save_comments_to_file(comment_list, output_filename, is_final=True)
+        save_comments_to_file(writer, is_final=True, pretty_json=pretty_json)
         return comment_list
 
-def main():
+def main(argv=None, prog=None):
     """处理命令行参数并运行程序"""
-    parser = argparse.ArgumentParser(description="YouTube 视频评论获取工具")
-    parser.add_argument("--url", type=str, required=True, help="YouTube 视频 URL 或 ID")
+    parser = argparse.ArgumentParser(prog=prog, description="YouTube 视频评论获取工具")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--url", type=str, help="YouTube 视频 URL 或 ID")
+    source.add_argument("--queue", type=str, metavar="QUEUE",
+                        help="队列模式: 从共享队列 (队列文件路径或协调进程地址) 领取视频，见 scrape.py queue")
+    source.add_argument("--batch", type=str, metavar="FILE",
+                        help="批量模式: 包含视频 URL 或 ID 的文件 (每行一个，- 表示标准输入)")
+    source.add_argument("--watch", type=str, metavar="FILE",
+                        help="监视模式: 持续轮询文件中的视频，只抓取新评论 (每行一个，- 表示标准输入)")
     parser.add_argument("--count", type=int, help="要获取的评论数量", default=100)
     parser.add_argument("--output", type=str, help="输出文件名", default=None)
     parser.add_argument("--no-replies", action="store_true", help="不包含回复评论")
     parser.add_argument("--sort", choices=["relevance", "time"], default="relevance", 
                         help="评论排序方式 (relevance: 相关性, time: 时间)")
     parser.add_argument("--debug", action="store_true", help="启用调试模式")
+    parser.add_argument("--pretty-json", action="store_true", help="获取结束后额外导出带缩进的 JSON 文件")
+    parser.add_argument("--reply-workers", type=int, default=REPLY_WORKERS,
+                        help="并发获取回复的线程数")
+    parser.add_argument("--resume", action="store_true",
+                        help="从检查点继续上次中断的抓取 (不指定 --output 时自动查找该视频最近的检查点)")
+    parser.add_argument("--workers", type=int, default=4, help="批量/队列模式下同时抓取的视频数")
+    parser.add_argument("--rate", type=float, default=20.0,
+                        help="批量模式下所有视频共享的请求速率上限 (次/秒)，自适应调整时不会超过该速率")
+    parser.add_argument("--manifest", type=str, default=None, help="批量模式的清单文件路径")
+    parser.add_argument("--worker-id", type=str, default=None, help="队列模式的工作进程标识 (默认为 主机名:进程号)")
+    parser.add_argument("--keep-running", action="store_true", help="队列模式下队列为空时继续等待新的视频")
+    parser.add_argument("--daily-quota", type=int, default=None,
+                        help="每个 API 密钥的每日配额单位 (默认读取环境变量 YOUTUBE_DAILY_QUOTA，未设置时为 10000)")
+    parser.add_argument("--store", type=str, default=None, metavar="DB",
+                        help="同时将评论按ID去重写入 SQLite 数据库")
+    parser.add_argument("--incremental", action="store_true",
+                        help="增量模式: 按时间倒序抓取，遇到数据库中已有的评论即停止 (需要 --store)")
+    parser.add_argument("--format", choices=list(OUTPUT_FORMATS), default="jsonl",
+                        help="输出格式 (parquet/arrow 需要安装 pyarrow，jsonl.zst 需要安装 zstandard，"
+                             "只有 jsonl 支持 --resume)")
+    parser.add_argument("--shard-size", type=float, default=None, metavar="MB",
+                        help="jsonl.gz/jsonl.zst 格式每个分片压缩后的大小上限 (MB，默认 256)")
+    parser.add_argument("--shard-records", type=int, default=None,
+                        help="jsonl.gz/jsonl.zst 格式每个分片的记录数上限 (默认不限)")
+    parser.add_argument("--keyword", action="append", default=[], metavar="WORD",
+                        help="只保存包含该关键词的评论和回复 (可重复，任一关键词匹配即保存)")
+    parser.add_argument("--keywords-file", type=str, default=None, metavar="FILE",
+                        help="关键词文件 (每行一个，re: 开头的行是正则表达式)")
+    parser.add_argument("--pattern", action="append", default=[], metavar="REGEX",
+                        help="只保存匹配该正则表达式的评论和回复 (可重复)")
+    parser.add_argument("--case-sensitive", action="store_true", help="关键词和正则表达式区分大小写")
+    parser.add_argument("--skip-unmatched-replies", action="store_true",
+                        help="主评论不匹配时不请求该线程的回复 (节省请求和配额，可能漏掉匹配的回复)")
+    parser.add_argument("--max-matches", type=int, default=None,
+                        help="每个视频匹配的评论 (包含回复) 达到该数量后停止抓取")
+    parser.add_argument("--no-adaptive", action="store_true",
+                        help="不根据服务器响应自适应调整请求速率 (批量模式使用 --rate 的固定速率，单个视频不限速)")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="监视模式的请求预算 (次/小时，默认把所有密钥的每日配额平均分到每小时)")
+    parser.add_argument("--watch-state", type=str, default=None,
+                        help="监视模式的状态文件 (每个视频的高水位和轮询间隔，默认 data/youtube/watch_state.json)")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="监视模式的运行时长 (秒，默认一直运行到被中断)")
+    parser.add_argument("--min-interval", type=float, default=None,
+                        help="监视模式每个视频的最短轮询间隔 (秒，默认 60)")
+    parser.add_argument("--max-interval", type=float, default=None,
+                        help="监视模式每个视频的最长轮询间隔 (秒，默认 21600)")
+    parser.add_argument("--metrics-file", type=str, default=None,
+                        help="定期将运行指标 (请求延迟、重试、休眠/网络/序列化耗时、配额) 以 JSON 写入该文件")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="在本地端口上提供 Prometheus 格式的指标 (GET /metrics)")
+    parser.add_argument("--metrics-interval", type=float, default=METRICS_INTERVAL,
+                        help="写入指标文件的间隔 (秒)")
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
-    if not API_KEY or API_KEY == "YOUR_API_KEY_HERE":
+    api_keys = config.YOUTUBE_API_KEYS
+    daily_quota = args.daily_quota or config.YOUTUBE_DAILY_QUOTA
+    if not api_keys or api_keys == ["YOUR_API_KEY_HERE"]:
         logger.error("请设置您的YouTube API密钥")
         logger.info("您可以通过环境变量设置: export YOUTUBE_API_KEY='您的API密钥'")
-        logger.info("或者在脚本中直接修改API_KEY变量")
+        logger.info("使用多个密钥时设置: export YOUTUBE_API_KEYS='密钥1,密钥2'")
         return
     
+    if args.incremental and not args.store:
+        parser.error("--incremental 需要同时指定 --store")
+    if args.resume and args.format != "jsonl":
+        parser.error(f"{args.format} 格式不支持 --resume")
+    try:
+        comment_filter = load_comment_filter(args.keyword, args.pattern, args.keywords_file,
+                                             ignore_case=not args.case_sensitive,
+                                             skip_unmatched_replies=args.skip_unmatched_replies)
+    except (OSError, ValueError) as e:
+        parser.error(f"无法加载过滤条件: {str(e)}")
+    if args.watch and (comment_filter is not None or args.max_matches):
+        parser.error("监视模式不支持关键词过滤和 --max-matches")
+    store = None
+    if args.store:
+        # 只有写入数据库时才导入 sqlite3
+        from comment_store import CommentStore
+        store = CommentStore(args.store)
+    shard_size = int(args.shard_size * 1024 * 1024) if args.shard_size else None
+    exporter = MetricsExporter(args.metrics_file, args.metrics_port, args.metrics_interval).start()
+    
     try:
+        if args.watch:
+            from batch_utils import read_video_list
+            from youtube_watch import MAX_INTERVAL, MIN_INTERVAL, WATCH_STATE_FILE, run_watch
+
+            videos = read_video_list(args.watch)
+            if not videos:
+                logger.warning("视频列表为空，没有需要监视的视频")
+                return
+            run_watch(
+                videos,
+                key_pool=ApiKeyPool(api_keys, daily_quota),
+                budget=args.budget / 3600 if args.budget else None,
+                workers=args.workers,
+                state_file=args.watch_state or WATCH_STATE_FILE,
+                output_filename=args.output,
+                output_format=args.format,
+                include_replies=not args.no_replies,
+                store=store,
+                duration=args.duration,
+                min_interval=args.min_interval or MIN_INTERVAL,
+                max_interval=args.max_interval or MAX_INTERVAL,
+                shard_size=shard_size,
+                shard_records=args.shard_records
+            )
+            return
+
+        if args.queue:
+            from work_queue import open_queue
+            from youtube_batch import run_queue_worker
+
+            with open_queue(args.queue) as queue:
+                run_queue_worker(
+                    queue,
+                    worker_id=args.worker_id,
+                    key_pool=ApiKeyPool(api_keys, daily_quota),
+                    workers=args.workers,
+                    rate=args.rate,
+                    adaptive=not args.no_adaptive,
+                    idle_exit=not args.keep_running,
+                    count=args.count,
+                    include_replies=not args.no_replies,
+                    sort_by=args.sort,
+                    debug_mode=args.debug,
+                    pretty_json=args.pretty_json,
+                    reply_workers=args.reply_workers,
+                    resume=args.resume,
+                    store=store,
+                    incremental=args.incremental,
+                    output_format=args.format,
+                    shard_size=shard_size,
+                    shard_records=args.shard_records,
+                    comment_filter=comment_filter,
+                    max_matches=args.max_matches
+                )
+            return
+
+        if args.batch:
+            from batch_utils import read_video_list
+            from youtube_batch import run_batch
+            
+            if args.output:
+                logger.warning("批量模式下忽略 --output，每个视频使用自动生成的文件名")
+            videos = read_video_list(args.batch)
+            if not videos:
+                # 空列表直接返回，不启动浏览器/创建客户端
+                logger.warning("视频列表为空，没有需要抓取的视频")
+                return
+            run_batch(
+                videos,
+                key_pool=ApiKeyPool(api_keys, daily_quota),
+                workers=args.workers,
+                rate=args.rate,
+                manifest_path=args.manifest,
+                count=args.count,
+                include_replies=not args.no_replies,
+                sort_by=args.sort,
+                debug_mode=args.debug,
+                pretty_json=args.pretty_json,
+                reply_workers=args.reply_workers,
+                resume=args.resume,
+                store=store,
+                incremental=args.incremental,
+                output_format=args.format,
+                shard_size=shard_size,
+                shard_records=args.shard_records,
+                adaptive=not args.no_adaptive,
+                comment_filter=comment_filter,
+                max_matches=args.max_matches
+            )
+            return
+        
         get_comments(
             args.url,
             args.count,
             args.output,
             not args.no_replies,
             args.sort,
-            args.debug
+            args.debug,
+            args.pretty_json,
+            args.reply_workers,
+            args.resume,
+            ApiKeyPool(api_keys, daily_quota),
+            store=store,
+            incremental=args.incremental,
+            output_format=args.format,
+            shard_size=shard_size,
+            shard_records=args.shard_records,
+            adaptive=not args.no_adaptive,
+            comment_filter=comment_filter,
+            max_matches=args.max_matches,
+            keep_records=False
         )
     except KeyboardInterrupt:
         logger.info("程序已退出")
     except Exception as e:
         logger.error(f"发生错误: {str(e)}")
+    finally:
+        if store is not None:
+            store.close()
+        exporter.stop()
 
 if __name__ == "__main__":
     main()
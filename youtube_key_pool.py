@@ -0,0 +1,317 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import metrics
+from youtube_client import YouTubeApiError, default_client
+
+logger = logging.getLogger(__name__)
+
+# 各个 API 方法消耗的配额单位 (YouTube Data API v3)
+QUOTA_COSTS = {
+    "commentThreads.list": 1,
+    "comments.list": 1,
+    "videos.list": 1,
+}
+
+# 每个密钥的默认每日配额
+DAILY_QUOTA = 10000
+
+# 配额计数持久化文件
+QUOTA_STATE_FILE = os.path.join("data", "youtube", "quota_state.json")
+
+# 每消耗多少次请求保存一次计数
+SAVE_EVERY = 20
+
+# 表示配额耗尽的错误原因
+QUOTA_ERROR_REASONS = ("quotaExceeded", "dailyLimitExceeded")
+
+# 表示请求过于频繁 (短时间限流，稍后可重试) 的错误原因
+RATE_LIMIT_ERROR_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+
+try:
+    from zoneinfo import ZoneInfo
+    QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+except Exception:
+    # YouTube 配额按太平洋时间零点重置，缺少时区数据时近似使用 UTC-8
+    QUOTA_TIMEZONE = timezone(timedelta(hours=-8))
+
+
+class QuotaExhausted(Exception):
+    """所有 API 密钥的当日配额都已用完"""
+
+
+def is_quota_error(error):
+    """判断 YouTubeApiError 是否为配额耗尽"""
+    if not isinstance(error, YouTubeApiError):
+        return False
+    return error.reason in QUOTA_ERROR_REASONS
+
+
+def is_rate_limit_error(error):
+    """判断 YouTubeApiError 是否为限流 (HTTP 429 或 403 rateLimitExceeded)"""
+    if not isinstance(error, YouTubeApiError):
+        return False
+    return error.status == 429 or error.reason in RATE_LIMIT_ERROR_REASONS
+
+
+def key_fingerprint(key):
+    """密钥的指纹 (持久化时不保存明文密钥)"""
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:12]
+
+
+def quota_day():
+    """当前配额日 (太平洋时间的日期)"""
+    return datetime.now(QUOTA_TIMEZONE).strftime("%Y-%m-%d")
+
+
+@contextmanager
+def _file_lock(path):
+    """在 path + ".lock" 上加跨进程的排他锁 (没有 fcntl 的平台上不加锁)"""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(path + ".lock", "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class ApiKeyPool:
+    """
+    YouTube API 密钥池
+
+    记录每个密钥当日消耗的配额单位，并持久化到磁盘；当前密钥返回 quotaExceeded 时
+    自动切换到下一个密钥。所有密钥都用完时抛出 QuotaExhausted。线程安全。
+
+    多个进程 (批量抓取、队列工作进程) 可以共享同一个状态文件: 保存时加文件锁，把本进程上次保存之后
+    新增的用量累加到文件中的计数上，同时读回其他进程的用量，不会互相覆盖。
+    """
+
+    def __init__(self, keys, daily_budget=DAILY_QUOTA, state_file=QUOTA_STATE_FILE, client=None):
+        """
+        Args:
+            keys: API 密钥列表
+            daily_budget: 每个密钥每日可用的配额单位
+            state_file: 配额计数持久化文件，为 None 时不持久化
+            client: YouTubeClient，为 None 时使用进程内共享的客户端
+        """
+        self.keys = [key for key in keys if key]
+        self.daily_budget = daily_budget
+        self.state_file = state_file
+        self.client = client or default_client()
+
+        self._lock = threading.Lock()
+        self._day = None
+        self._used = {}
+        self._delta = {}  # 上次保存之后本进程新增的用量
+        self._unsaved = 0
+        self._load()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _read_state(self):
+        """读取状态文件，返回 (配额日, {密钥指纹: 用量})，不存在时返回 (None, {})"""
+        if not os.path.exists(self.state_file):
+            return None, {}
+        with open(self.state_file, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        return state.get("date"), dict(state.get("used", {}))
+
+    def _load(self):
+        """读取持久化的配额计数 (只保留当天的计数)"""
+        self._day = quota_day()
+        self._used = {}
+        self._delta = {}
+        if not self.state_file:
+            return
+        try:
+            day, used = self._read_state()
+            if day == self._day:
+                self._used = used
+        except Exception as e:
+            logger.warning(f"读取配额计数失败: {str(e)}")
+
+    def _save(self):
+        """
+        持久化配额计数 (调用方需持有锁)
+
+        在文件锁内读取文件中同一配额日的计数，每个密钥取 文件中的计数 + 本进程新增的用量
+        与本进程的计数中较大的一个 (mark_exhausted 直接记满)，写回后作为本进程的计数。
+        """
+        self._unsaved = 0
+        if not self.state_file:
+            self._delta = {}
+            return
+        try:
+            os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+            with _file_lock(self.state_file):
+                try:
+                    day, used = self._read_state()
+                except ValueError as e:
+                    logger.warning(f"配额计数文件已损坏，将被覆盖: {str(e)}")
+                    day, used = None, {}
+                if day is not None and day > self._day:
+                    # 其他进程已经进入下一个配额日，本进程的计数已过期
+                    return
+                if day != self._day:
+                    used = {}
+                for fingerprint in set(used) | set(self._used):
+                    used[fingerprint] = max(used.get(fingerprint, 0) + self._delta.get(fingerprint, 0),
+                                            self._used.get(fingerprint, 0))
+                tmp_path = self.state_file + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"date": self._day, "used": used}, f, indent=2)
+                os.replace(tmp_path, self.state_file)
+            self._used = used
+            self._delta = {}
+        except Exception as e:
+            logger.warning(f"保存配额计数失败: {str(e)}")
+
+    def _roll_day(self):
+        """跨过配额日时清零计数 (调用方需持有锁)"""
+        today = quota_day()
+        if today != self._day:
+            self._day = today
+            self._used = {}
+            self._delta = {}
+            self._save()
+
+    def used(self, key):
+        with self._lock:
+            self._roll_day()
+            return self._used.get(key_fingerprint(key), 0)
+
+    def remaining(self, key=None):
+        """指定密钥 (或全部密钥合计) 当日剩余的配额单位"""
+        with self._lock:
+            self._roll_day()
+            keys = [key] if key else self.keys
+            return sum(max(0, self.daily_budget - self._used.get(key_fingerprint(k), 0)) for k in keys)
+
+    def current_key(self, cost=1):
+        """返回第一个剩余配额足够的密钥，全部用完时抛出 QuotaExhausted"""
+        with self._lock:
+            self._roll_day()
+            for key in self.keys:
+                if self._used.get(key_fingerprint(key), 0) + cost <= self.daily_budget:
+                    return key
+        raise QuotaExhausted("所有 API 密钥的当日配额都已用完")
+
+    def charge(self, key, method):
+        """记录一次请求消耗的配额"""
+        cost = QUOTA_COSTS.get(method, 1)
+        with self._lock:
+            self._roll_day()
+            fingerprint = key_fingerprint(key)
+            self._used[fingerprint] = self._used.get(fingerprint, 0) + cost
+            self._delta[fingerprint] = self._delta.get(fingerprint, 0) + cost
+            self._unsaved += 1
+            if self._unsaved >= SAVE_EVERY:
+                self._save()
+        metrics.record_quota(method, cost)
+
+    def mark_exhausted(self, key):
+        """服务器返回 quotaExceeded 时，将该密钥标记为当日已用完"""
+        with self._lock:
+            self._used[key_fingerprint(key)] = self.daily_budget
+            self._save()
+
+    def flush(self):
+        """立即保存配额计数"""
+        with self._lock:
+            self._save()
+
+    def execute(self, method, call):
+        """
+        使用当前密钥执行一次 API 请求，配额耗尽时切换密钥重试
+
+        Args:
+            method: API 方法名 (如 "commentThreads.list")，用于计算配额
+            call: 接收 API 密钥并返回响应的函数
+
+        Returns:
+            API 响应
+        """
+        cost = QUOTA_COSTS.get(method, 1)
+        while True:
+            key = self.current_key(cost)
+            try:
+                response = call(key)
+            except YouTubeApiError as e:
+                # 失败的请求同样消耗配额
+                self.charge(key, method)
+                if not is_quota_error(e):
+                    raise
+                self.mark_exhausted(key)
+                logger.warning(f"API 密钥 {key_fingerprint(key)} 配额已用完，切换到下一个密钥")
+                continue
+            self.charge(key, method)
+            return response
+
+    def report(self):
+        """返回每个密钥的配额使用情况"""
+        with self._lock:
+            self._roll_day()
+            return {
+                "date": self._day,
+                "daily_budget": self.daily_budget,
+                "keys": [
+                    {"key": key_fingerprint(key), "used": self._used.get(key_fingerprint(key), 0)}
+                    for key in self.keys
+                ],
+            }
+
+
+def estimate_video_cost(count, include_replies=True, reply_call_ratio=0.1):
+    """
+    估算抓取一个视频需要消耗的配额单位
+
+    Args:
+        count: 计划抓取的主评论数
+        include_replies: 是否获取回复
+        reply_call_ratio: 平均每个评论线程需要单独请求回复的比例 (回复较少的线程使用内联回复)
+    """
+    cost = math.ceil(max(1, count) / 100) * QUOTA_COSTS["commentThreads.list"]
+    if include_replies:
+        cost += math.ceil(count * reply_call_ratio) * QUOTA_COSTS["comments.list"]
+    return cost
+
+
+def plan_batch(videos, key_pool, count, include_replies=True, comment_counts=None):
+    """
+    根据剩余配额决定本次要抓取哪些视频
+
+    按输入顺序依次分配预估配额，超出剩余配额的视频推迟到下次运行。
+
+    Args:
+        comment_counts: 可选的 {视频: 评论总数} 字典，已知评论数的视频按实际评论数估算配额
+
+    Returns:
+        (本次抓取的视频列表, 推迟的视频列表)
+    """
+    budget = key_pool.remaining()
+    comment_counts = comment_counts or {}
+    selected = []
+    deferred = []
+    for video in videos:
+        known = comment_counts.get(video)
+        cost = estimate_video_cost(count if known is None else min(count, known), include_replies)
+        if cost <= budget:
+            selected.append(video)
+            budget -= cost
+        else:
+            deferred.append(video)
+    if deferred:
+        logger.warning(f"剩余配额约 {key_pool.remaining()} 单位，{len(deferred)} 个视频推迟到下次抓取")
+    return selected, deferred
@@ -0,0 +1,172 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from youtube_key_pool import QuotaExhausted
+
+logger = logging.getLogger(__name__)
+
+# 每次 videos.list 请求最多查询的视频数 (API 上限)
+VIDEOS_PER_CALL = 50
+
+# 视频信息缓存文件
+VIDEO_CACHE_FILE = os.path.join("data", "youtube", "video_cache.json")
+
+# 缓存有效期 (秒)，评论数会随时间变化，过期后重新查询
+CACHE_TTL = 6 * 3600
+
+
+def make_video_info(video_id, item=None):
+    """
+    根据 videos.list 返回的条目生成视频信息
+
+    视频不存在 (或无权访问) 时 API 不返回该条目；
+    评论被禁用时 statistics 中没有 commentCount 字段。
+    """
+    info = {
+        "video_id": video_id,
+        "exists": item is not None,
+        "comment_count": None,
+        "comments_disabled": False,
+        "checked_at": time.time(),
+    }
+    if item is not None:
+        comment_count = item.get("statistics", {}).get("commentCount")
+        if comment_count is None:
+            info["comments_disabled"] = True
+        else:
+            info["comment_count"] = int(comment_count)
+    return info
+
+
+class VideoInfoCache:
+    """带过期时间的视频信息磁盘缓存，线程安全"""
+
+    def __init__(self, path=VIDEO_CACHE_FILE, ttl=CACHE_TTL):
+        """
+        Args:
+            path: 缓存文件路径，为 None 时只在内存中缓存
+            ttl: 缓存有效期 (秒)
+        """
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except Exception as e:
+            logger.warning(f"读取视频信息缓存失败: {str(e)}")
+
+    def get(self, video_id):
+        """返回未过期的缓存条目，没有时返回 None"""
+        with self._lock:
+            info = self._entries.get(video_id)
+        if info is None or time.time() - info.get("checked_at", 0) > self.ttl:
+            return None
+        return info
+
+    def put(self, info):
+        with self._lock:
+            self._entries[info["video_id"]] = info
+
+    def save(self):
+        """原子地写入缓存文件，同时丢弃过期的条目"""
+        if not self.path:
+            return
+        now = time.time()
+        with self._lock:
+            self._entries = {
+                video_id: info for video_id, info in self._entries.items()
+                if now - info.get("checked_at", 0) <= self.ttl
+            }
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self._entries, f)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                logger.warning(f"保存视频信息缓存失败: {str(e)}")
+
+
+def fetch_video_info(video_ids, key_pool, cache=None, limiter=None, retry=None, skip_failed=False):
+    """
+    批量查询视频是否存在、评论数和评论是否被禁用
+
+    未命中缓存的视频每 50 个合并成一次 videos.list 请求 (每次消耗 1 个配额单位)。
+    配额用完时抛出 QuotaExhausted (已查询到的信息仍会写入缓存)。
+
+    Args:
+        video_ids: 视频ID列表
+        key_pool: ApiKeyPool
+        cache: VideoInfoCache，为 None 时不使用缓存
+        limiter: 共享的 RateLimiter
+        retry: 包装请求的重试函数 (如 execute_with_retry，需要接受 endpoint 关键字参数)
+        skip_failed: 为 True 时跳过请求失败 (API 错误或网络错误) 的那一组视频，它们不出现在返回的字典中；
+            否则直接抛出异常
+
+    Returns:
+        {视频ID: 视频信息} 字典
+    """
+    results = {}
+    missing = []
+    for video_id in dict.fromkeys(video_ids):
+        info = cache.get(video_id) if cache is not None else None
+        if info is not None:
+            results[video_id] = info
+        else:
+            missing.append(video_id)
+
+    if missing:
+        logger.info(f"查询 {len(missing)} 个视频的信息 ({len(results)} 个命中缓存)")
+
+    try:
+        for start in range(0, len(missing), VIDEOS_PER_CALL):
+            chunk = missing[start:start + VIDEOS_PER_CALL]
+            params = {"part": "statistics", "id": ",".join(chunk)}
+            if limiter is not None:
+                limiter.acquire()
+
+            def call(key):
+                if retry is not None:
+                    return retry(key_pool.client.videos, key, endpoint="videos", **params)
+                return key_pool.client.videos(key, **params)
+
+            try:
+                response = key_pool.execute("videos.list", call)
+            except QuotaExhausted:
+                raise
+            except Exception as e:
+                if not skip_failed:
+                    raise
+                logger.warning(f"查询 {len(chunk)} 个视频的信息失败，跳过这些视频的预查询: {str(e)}")
+                continue
+            items = {item["id"]: item for item in response.get("items", [])}
+            for video_id in chunk:
+                info = make_video_info(video_id, items.get(video_id))
+                results[video_id] = info
+                if cache is not None:
+                    cache.put(info)
+    finally:
+        if cache is not None and missing:
+            cache.save()
+    return results
+
+
+def skip_reason(info):
+    """视频不需要抓取的原因 (不存在或评论被禁用)，可以抓取时返回 None"""
+    if info is None:
+        return None
+    if not info["exists"]:
+        return "video_not_found"
+    if info["comments_disabled"]:
+        return "comments_disabled"
+    return None
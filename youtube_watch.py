@@ -0,0 +1,503 @@
+import heapq
+import json
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+import config
+import metrics
+import youtube_comments_scraper as scraper
+from comment_stream import make_record
+from comment_writer import open_comment_writer, output_path_for
+from rate_limiter import RateLimiter
+from youtube_client import YouTubeApiError
+from youtube_key_pool import ApiKeyPool, QuotaExhausted
+from youtube_videos import VideoInfoCache, fetch_video_info, skip_reason
+
+logger = logging.getLogger(__name__)
+
+# 持续监视的状态文件 (每个视频的高水位和轮询间隔)
+WATCH_STATE_FILE = os.path.join(scraper.SAVE_DIR, "watch_state.json")
+
+# 轮询间隔的上下限 (秒)
+MIN_INTERVAL = 60
+MAX_INTERVAL = 6 * 3600
+
+# 每次轮询期望取到的新评论数 (半页)，间隔 = TARGET_NEW / 评论速度
+TARGET_NEW = 50
+
+# 评论速度和每次轮询请求数的指数滑动平均系数
+VELOCITY_ALPHA = 0.5
+
+# 首次轮询只取最新的几页，不下载历史评论
+INITIAL_PAGES = 1
+
+# 单次轮询最多请求的评论线程页数 (超过时放弃更早的新评论，缩短之后的间隔)
+MAX_PAGES = 10
+
+# 调度时只使用请求预算的这一部分，留出余量给回复翻页和重试
+BUDGET_HEADROOM = 0.9
+
+# 落盘并保存状态的间隔 (秒)
+SAVE_INTERVAL = 30
+
+# 轮询出错时的间隔倍数
+ERROR_BACKOFF = 2
+
+# 视频不存在或禁用评论时停止监视的错误原因
+STOP_REASONS = ("videoNotFound", "commentsDisabled")
+
+
+def parse_time(value):
+    """解析 YouTube 的 publishedAt (如 2024-01-01T12:00:00Z)，返回 Unix 时间戳，无法解析时返回 None"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+class WatchedVideo:
+    """
+    一个被监视视频的状态
+
+    高水位为已抓取的最新主评论的发布时间和该时间上的评论ID (时间精度只到秒，同一秒可能有多条)，
+    按时间倒序翻页时遇到不晚于高水位的评论即说明之后都已抓取过。
+    缺少发布时间的主评论无法与高水位比较，按已抓取过的评论ID (untimed_ids) 去重。
+    """
+
+    __slots__ = ("video_id", "hwm_time", "hwm_ids", "untimed_ids", "velocity", "requests_per_poll", "interval",
+                 "last_poll", "next_poll", "polls", "new_comments", "errors", "stopped")
+
+    def __init__(self, video_id, hwm_time=None, hwm_ids=(), untimed_ids=(), velocity=None, requests_per_poll=1.0,
+                 interval=MIN_INTERVAL, last_poll=None, next_poll=0.0, polls=0, new_comments=0, errors=0,
+                 stopped=None):
+        self.video_id = video_id
+        self.hwm_time = hwm_time
+        self.hwm_ids = list(hwm_ids)
+        self.untimed_ids = list(untimed_ids)
+        self.velocity = velocity  # 评论速度 (条/秒)
+        self.requests_per_poll = requests_per_poll
+        self.interval = interval
+        self.last_poll = last_poll
+        self.next_poll = next_poll
+        self.polls = polls
+        self.new_comments = new_comments
+        self.errors = errors
+        self.stopped = stopped  # 停止监视的原因 (视频不存在、禁用评论)
+
+    def is_seen(self, published, comment_id):
+        """主评论是否已在之前的轮询中抓取过"""
+        if not published:
+            return comment_id in self.untimed_ids
+        if self.hwm_time is None:
+            return False
+        return published < self.hwm_time or (published == self.hwm_time and comment_id in self.hwm_ids)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data[name] for name in cls.__slots__ if name in data})
+
+
+def load_watch_state(state_file=WATCH_STATE_FILE):
+    """读取监视状态，返回 {视频ID: WatchedVideo}"""
+    if not state_file or not os.path.exists(state_file):
+        return {}
+    try:
+        with open(state_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return {video_id: WatchedVideo.from_dict(entry) for video_id, entry in data.get("videos", {}).items()}
+    except Exception as e:
+        logger.warning(f"读取监视状态失败，将重新开始: {str(e)}")
+        return {}
+
+
+def save_watch_state(videos, state_file=WATCH_STATE_FILE):
+    """原子地写入监视状态"""
+    if not state_file:
+        return
+    os.makedirs(os.path.dirname(state_file) or ".", exist_ok=True)
+    tmp_path = state_file + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"updated_at": datetime.now().isoformat(timespec="seconds"),
+                   "videos": {video_id: video.as_dict() for video_id, video in videos.items()}},
+                  f, ensure_ascii=False)
+    os.replace(tmp_path, state_file)
+
+
+def poll_video(video, key_pool, limiter=None, include_replies=True, max_pages=MAX_PAGES):
+    """
+    按时间倒序请求一个视频的评论，直到遇到高水位 (可在工作线程中调用)
+
+    首次轮询只请求 INITIAL_PAGES 页，用于确定高水位。不修改 video，由调度器根据结果更新状态。
+
+    Returns:
+        {"records": 新评论记录 (主评论在前、回复紧随其后), "requests": 请求数, "pages": 评论线程页数,
+         "newest_time"/"newest_ids": 新的高水位, "untimed_ids": 已抓取的缺少发布时间的主评论ID,
+         "oldest_time": 本次最早的新主评论时间,
+         "reached": 是否遇到了高水位 (为 False 且不是首次轮询时可能遗漏了更早的新评论)}
+    """
+    video_id = video.video_id
+    comment_kwargs = {
+        'part': 'snippet,replies',
+        'videoId': video_id,
+        'maxResults': 100,
+        'order': 'time',
+        'textFormat': 'plainText'
+    }
+    page_limit = INITIAL_PAGES if video.hwm_time is None else max_pages
+    result = {"records": [], "requests": 0, "pages": 0, "newest_time": video.hwm_time,
+              "newest_ids": set(video.hwm_ids), "untimed_ids": set(video.untimed_ids), "oldest_time": None,
+              "reached": False}
+    records = result["records"]
+    page_token = None
+    while True:
+        response = scraper.fetch_comment_threads(key_pool, comment_kwargs, page_token, limiter)
+        result["requests"] += 1
+        result["pages"] += 1
+        for item in response.get('items', []):
+            snippet = item['snippet']['topLevelComment']['snippet']
+            comment_id = scraper.thread_comment_id(item)
+            published = snippet.get('publishedAt') or ""
+            if video.is_seen(published, comment_id):
+                if not published:
+                    # 按ID判断为已抓取，不能说明已经到达高水位
+                    continue
+                result["reached"] = True
+                break
+            if not published:
+                result["untimed_ids"].add(comment_id)
+            else:
+                if result["newest_time"] is None or published > result["newest_time"]:
+                    result["newest_time"], result["newest_ids"] = published, {comment_id}
+                elif published == result["newest_time"]:
+                    result["newest_ids"].add(comment_id)
+                result["oldest_time"] = published
+            records.append(make_record("youtube", comment_id, None, video_id, snippet.get('textDisplay'),
+                                       snippet.get('likeCount', 0), published))
+
+            total_reply_count = item['snippet']['totalReplyCount']
+            if not include_replies or not total_reply_count:
+                continue
+            reply_items = scraper.get_inline_replies(item)
+            if reply_items is None:
+                reply_items = scraper.fetch_replies(key_pool, item['id'], limiter)
+                result["requests"] += -(-total_reply_count // 100)
+            for reply_item in reply_items:
+                reply_info = reply_item['snippet']
+                records.append(make_record("youtube", reply_item.get('id'), reply_info.get('parentId', comment_id),
+                                           video_id, reply_info.get('textDisplay'), reply_info.get('likeCount', 0),
+                                           reply_info.get('publishedAt')))
+
+        page_token = response.get('nextPageToken')
+        if result["reached"] or not page_token:
+            # 没有下一页说明已经读到最早的评论，同样不会遗漏
+            result["reached"] = True
+            break
+        if result["pages"] >= page_limit:
+            break
+    result["newest_ids"] = sorted(result["newest_ids"])
+    result["untimed_ids"] = sorted(result["untimed_ids"])
+    return result
+
+
+class WatchScheduler:
+    """
+    按评论速度调整轮询间隔的调度器
+
+    每个视频的间隔为 TARGET_NEW / 评论速度 (限制在上下限之间)，评论越多轮询越频繁，
+    没有新评论时速度的滑动平均逐渐下降，间隔随之拉长。所有视频的预计请求速率
+    (每次轮询的请求数 / 间隔之和) 超过预算时，所有间隔按同一比例拉长，保持相对优先级。
+    到期的视频按到期时间先后从堆中取出，同时到期时评论速度快的优先。
+    """
+
+    def __init__(self, videos, budget, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL,
+                 target_new=TARGET_NEW):
+        """
+        Args:
+            videos: {视频ID: WatchedVideo}，已停止监视的视频不参与调度
+            budget: 请求预算 (次/秒)
+            min_interval: 轮询间隔下限 (秒)
+            max_interval: 轮询间隔上限 (秒)
+            target_new: 每次轮询期望取到的新评论数
+        """
+        self.videos = videos
+        self.budget = budget
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_new = target_new
+        self.demand = 0.0  # 所有视频的预计请求速率 (次/秒)
+        self._heap = []
+        for video in videos.values():
+            if video.stopped is None:
+                self.demand += self._demand_of(video)
+                heapq.heappush(self._heap, self._heap_entry(video))
+
+    def __len__(self):
+        return len(self._heap)
+
+    def _demand_of(self, video):
+        return video.requests_per_poll / max(video.interval, 1)
+
+    def _heap_entry(self, video):
+        return video.next_poll, -(video.velocity or 0.0), video.video_id
+
+    @property
+    def stretch(self):
+        """间隔的拉长比例 (预计请求速率不超过预算时为 1)"""
+        if self.budget <= 0:
+            return 1.0
+        return max(1.0, self.demand / (self.budget * BUDGET_HEADROOM))
+
+    def next_due(self):
+        """最早到期的时间，没有视频时返回 None"""
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now, limit):
+        """取出最多 limit 个已到期的视频 (轮询结束前不在堆中，不会被重复调度)"""
+        due = []
+        while self._heap and len(due) < limit and self._heap[0][0] <= now:
+            due.append(self.videos[heapq.heappop(self._heap)[2]])
+        for video in due:
+            self.demand -= self._demand_of(video)
+        return due
+
+    def interval_for(self, velocity):
+        if not velocity:
+            return self.max_interval
+        return min(self.max_interval, max(self.min_interval, self.target_new / velocity))
+
+    def reschedule(self, video, now, result=None, error=False):
+        """
+        根据轮询结果更新视频的评论速度和下一次轮询时间，并放回堆中
+
+        Args:
+            video: WatchedVideo
+            now: 本次轮询结束的时间 (Unix 时间戳)
+            result: poll_video 的返回值，出错时为 None
+            error: 轮询是否出错 (间隔按 ERROR_BACKOFF 倍拉长)
+        """
+        if error:
+            video.errors += 1
+            video.interval = min(self.max_interval, video.interval * ERROR_BACKOFF)
+        elif result is not None:
+            new_comments = len(result["records"])
+            if video.last_poll is not None:
+                observed = new_comments / max(now - video.last_poll, 1.0)
+            else:
+                # 首次轮询: 用最新一页评论覆盖的时间跨度估算速度
+                oldest = parse_time(result["oldest_time"])
+                observed = new_comments / max(now - oldest, self.min_interval) if oldest else 0.0
+            if video.velocity is None:
+                video.velocity = observed
+            else:
+                video.velocity = VELOCITY_ALPHA * observed + (1 - VELOCITY_ALPHA) * video.velocity
+            video.requests_per_poll = (VELOCITY_ALPHA * result["requests"]
+                                       + (1 - VELOCITY_ALPHA) * video.requests_per_poll)
+            video.interval = self.interval_for(video.velocity)
+            video.hwm_time = result["newest_time"]
+            video.hwm_ids = result["newest_ids"]
+            video.untimed_ids = result["untimed_ids"]
+            video.last_poll = now
+            video.polls += 1
+            video.new_comments += new_comments
+            video.errors = 0
+        if video.stopped is not None:
+            return
+        self.demand += self._demand_of(video)
+        video.next_poll = now + video.interval * self.stretch
+        heapq.heappush(self._heap, self._heap_entry(video))
+
+
+def check_videos(videos, key_pool, limiter):
+    """查询新加入监视的视频，标记不存在或禁用评论的视频 (每 50 个视频一次 videos.list)"""
+    unchecked = [video for video in videos.values() if video.polls == 0 and video.stopped is None]
+    if not unchecked:
+        return
+    video_info = fetch_video_info([video.video_id for video in unchecked], key_pool, VideoInfoCache(), limiter,
+                                  scraper.execute_with_retry, skip_failed=True)
+    for video in unchecked:
+        reason = skip_reason(video_info.get(video.video_id))
+        if reason:
+            video.stopped = reason
+            logger.info(f"跳过视频 {video.video_id}: {reason}")
+
+
+def default_budget(key_pool):
+    """默认的请求预算 (次/秒): 所有密钥的每日配额平均分到一天"""
+    return len(key_pool) * key_pool.daily_budget / 86400
+
+
+def run_watch(videos, key_pool=None, budget=None, workers=4, state_file=WATCH_STATE_FILE, output_filename=None,
+              output_format="jsonl", include_replies=True, store=None, duration=None, max_pages=MAX_PAGES,
+              min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL, target_new=TARGET_NEW, shard_size=None,
+              shard_records=None):
+    """
+    持续监视多个视频的新评论
+
+    每个视频保存一个高水位 (已抓取的最新主评论)，每次轮询按时间倒序请求评论，遇到高水位即停止，
+    只下载新的评论页；首次监视的视频只取最新一页确定高水位，不下载历史评论。
+    轮询间隔按评论速度自适应调整，所有请求共享一个按预算限速的 RateLimiter。
+    新评论追加写入同一个输出文件 (记录中带 video_id)，高水位在输出落盘之后才保存，
+    中断后重新运行会从保存的高水位继续。
+
+    Args:
+        videos: 视频 URL 或 ID 列表 (状态文件中已有的视频保留原来的高水位)
+        key_pool: 共享的 ApiKeyPool，为 None 时按配置新建
+        budget: 请求预算 (次/秒)，为 None 时把所有密钥的每日配额平均分到一天
+        workers: 同时轮询的视频数
+        state_file: 监视状态文件
+        output_filename: 输出文件，为 None 时自动生成
+        output_format: 输出格式
+        include_replies: 是否包含新主评论的回复
+        store: 可选的 CommentStore
+        duration: 运行时长 (秒)，为 None 时一直运行到被中断
+        max_pages: 单次轮询最多请求的评论线程页数
+        min_interval: 轮询间隔下限 (秒)
+        max_interval: 轮询间隔上限 (秒)
+        target_new: 每次轮询期望取到的新评论数
+        shard_size: 压缩分片格式每个分片压缩后的大小上限 (字节)
+        shard_records: 压缩分片格式每个分片的记录数上限
+
+    Returns:
+        汇总字典 (轮询次数、新评论数、请求数等)
+    """
+    if key_pool is None:
+        key_pool = ApiKeyPool(config.YOUTUBE_API_KEYS, config.YOUTUBE_DAILY_QUOTA)
+    if budget is None:
+        budget = default_budget(key_pool)
+    limiter = RateLimiter(budget, burst=max(1, workers))
+
+    watched = load_watch_state(state_file)
+    watch_ids = set()
+    for video_url in videos:
+        video_id = scraper.get_video_id_from_url(video_url)
+        if not scraper.validate_video_id(video_id):
+            logger.warning(f"无法从URL中提取视频ID，已跳过: {video_url}")
+            continue
+        watched.setdefault(video_id, WatchedVideo(video_id, interval=min_interval))
+        watch_ids.add(video_id)
+    # 只调度本次列表中的视频，状态文件中的其他视频原样保留
+    active = {video_id: video for video_id, video in watched.items() if video_id in watch_ids}
+    check_videos(active, key_pool, limiter)
+    scheduler = WatchScheduler(active, budget, min_interval, max_interval, target_new)
+    if not len(scheduler):
+        logger.warning("没有可以监视的视频")
+        save_watch_state(watched, state_file)
+        return {"videos": 0, "polls": 0, "new_comments": 0, "requests": 0}
+
+    if output_filename is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_filename = os.path.join(scraper.SAVE_DIR, f"watch_{timestamp}")
+    output_filename = output_path_for(output_filename, output_format)
+    writer = open_comment_writer(output_filename, output_format, shard_size=shard_size, shard_records=shard_records)
+
+    logger.info(f"监视 {len(scheduler)} 个视频，请求预算 {budget * 3600:.0f} 次/小时，并发数 {workers}")
+    logger.info(f"新评论将追加保存到: {writer.file_path}")
+
+    summary = {"videos": len(scheduler), "polls": 0, "new_comments": 0, "requests": 0, "errors": 0,
+               "output_file": writer.file_path}
+    started = time.time()
+    deadline = started + duration if duration else None
+    last_save = started
+    stopping = False
+    in_flight = {}
+
+    def save():
+        # 先让输出落盘，再保存高水位，中断后不会跳过未落盘的评论
+        writer.flush()
+        if store is not None:
+            store.flush()
+        save_watch_state(watched, state_file)
+        key_pool.flush()
+
+    def handle(video, future, now):
+        nonlocal stopping
+        try:
+            result = future.result()
+        except QuotaExhausted as e:
+            logger.error(f"{str(e)}，停止监视，可在配额重置后重新运行")
+            stopping = True
+            scheduler.reschedule(video, now)
+            return
+        except YouTubeApiError as e:
+            if e.reason in STOP_REASONS or e.status == 404:
+                video.stopped = e.reason or f"http_{e.status}"
+                logger.warning(f"视频 {video.video_id} 停止监视: {video.stopped}")
+            else:
+                logger.warning(f"轮询视频 {video.video_id} 出错: {e}")
+            summary["errors"] += 1
+            scheduler.reschedule(video, now, error=True)
+            return
+        except Exception as e:
+            logger.warning(f"轮询视频 {video.video_id} 出错: {str(e)}")
+            summary["errors"] += 1
+            scheduler.reschedule(video, now, error=True)
+            return
+
+        for record in result["records"]:
+            writer.write(record)
+            if store is not None:
+                store.add("youtube", video.video_id, record)
+        metrics.record_comments("youtube", len(result["records"]))
+        if not result["reached"] and video.hwm_time is not None:
+            logger.warning(f"视频 {video.video_id} 单次轮询达到 {max_pages} 页上限，更早的新评论可能被遗漏")
+        scheduler.reschedule(video, now, result)
+        summary["polls"] += 1
+        summary["requests"] += result["requests"]
+        summary["new_comments"] += len(result["records"])
+        if result["records"]:
+            logger.info(f"视频 {video.video_id}: {len(result['records'])} 条新评论，"
+                        f"下次轮询间隔 {video.interval * scheduler.stretch:.0f} 秒")
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            while in_flight or not stopping:
+                now = time.time()
+                if deadline is not None and now >= deadline:
+                    stopping = True
+                if not in_flight and not len(scheduler) and not stopping:
+                    logger.warning("所有视频都已停止监视")
+                    stopping = True
+                if not stopping:
+                    for video in scheduler.pop_due(now, max(1, workers) - len(in_flight)):
+                        future = executor.submit(poll_video, video, key_pool, limiter, include_replies, max_pages)
+                        in_flight[future] = video
+
+                wake = [last_save + SAVE_INTERVAL]
+                if not stopping:
+                    next_due = scheduler.next_due()
+                    if next_due is not None:
+                        wake.append(next_due)
+                    if deadline is not None:
+                        wake.append(deadline)
+                timeout = max(0.0, min(wake) - time.time())
+                if in_flight:
+                    done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        handle(in_flight.pop(future), future, time.time())
+                elif not stopping:
+                    time.sleep(timeout)
+
+                if time.time() - last_save >= SAVE_INTERVAL:
+                    save()
+                    last_save = time.time()
+    except KeyboardInterrupt:
+        logger.info("已停止监视，正在保存状态...")
+    finally:
+        writer.close()
+        if store is not None:
+            store.flush()
+        save_watch_state(watched, state_file)
+        key_pool.flush()
+
+    summary["seconds"] = round(time.time() - started, 3)
+    logger.info(f"✅ 监视结束 - 轮询 {summary['polls']} 次，{summary['requests']} 次请求，"
+                f"{summary['new_comments']} 条新评论")
+    return summary